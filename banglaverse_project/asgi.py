@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banglaverse_project.settings')
+# Route the evaluation API and exports to their async views (see DEPLOYMENT.md)
+os.environ.setdefault('BANGLAVERSE_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Replay submissions a previous process left in the write-behind journal
+from evaluation.journal import start_replay  # noqa: E402
+
+start_replay()
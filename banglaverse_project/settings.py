@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,17 +42,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'evaluation.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'evaluation.static_assets.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'evaluation.admission.AdmissionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'banglaverse_project.urls'
 
+# Without an explicit 'loaders' option Django wraps the app directories
+# loader in the cached loader, so templates are compiled once per process
+# (under runserver the autoreloader resets it when a template changes).
+# Pages that are the same for everyone are also cached fully rendered
+# (evaluation/page_cache.py).
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -76,10 +85,34 @@ WSGI_APPLICATION = 'banglaverse_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('BANGLAVERSE_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# SQLite production profile (BANGLAVERSE_SQLITE_PROFILE=production): WAL so
+# readers never block the writer, IMMEDIATE transactions so writers queue on
+# busy_timeout instead of failing on lock upgrade, and persistent connections.
+# WAL needs a local disk; keep the basic profile on network file systems.
+SQLITE_PROFILE = os.environ.get('BANGLAVERSE_SQLITE_PROFILE', 'basic')
+
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=20000;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-32000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -112,7 +145,108 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Caches
+# 'shared' is visible to every worker process on the host (used for analytics reports).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('BANGLAVERSE_CACHE_DIR', BASE_DIR / 'var' / 'cache'),
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+# `manage.py collectstatic` copies the assets here with content-hashed names
+# and .gz/.br variants; StaticAssetMiddleware serves them with far-future
+# caching (see evaluation/static_assets.py).
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'evaluation.static_assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
+
+# Evaluation item scheduling
+# 'balanced' hands out the least-rated items first, 'random' samples uniformly.
+
+EVALUATION_ITEM_SELECTION = 'balanced'
+
+# Seconds before items handed out to an evaluator who never submitted are released.
+EVALUATION_RESERVATION_TIMEOUT = 2 * 60 * 60
+
+# Serve the API and export views from evaluation.async_views. asgi.py turns
+# this on; WSGI deployments keep the sync views.
+EVALUATION_ASYNC_VIEWS = os.environ.get('BANGLAVERSE_ASYNC_VIEWS') == '1'
+
+# Queue submissions in a local journal and write them to the database in
+# batches from a background thread (see evaluation/journal.py).
+EVALUATION_WRITE_BEHIND = os.environ.get('BANGLAVERSE_WRITE_BEHIND') == '1'
+EVALUATION_JOURNAL_PATH = os.environ.get('BANGLAVERSE_JOURNAL_PATH', BASE_DIR / 'var' / 'submission_journal.sqlite3')
+
+# Serialize SQLite writes across worker processes with a lock file and retry
+# ones that still fail with "database is locked" (see evaluation/write_lock.py).
+EVALUATION_WRITE_LOCK = os.environ.get('BANGLAVERSE_WRITE_LOCK', '1') == '1'
+EVALUATION_WRITE_LOCK_PATH = os.environ.get('BANGLAVERSE_WRITE_LOCK_PATH', BASE_DIR / 'var' / 'sqlite-write.lock')
+
+# Ready-made session bundles kept per dialect in each worker process (0 builds every bundle on request).
+EVALUATION_BUNDLE_POOL_SIZE = 2
+
+# Per-request metrics (see evaluation/metrics.py), shared by all worker
+# processes through a small SQLite file and served at /metrics.
+EVALUATION_METRICS_PATH = os.environ.get('BANGLAVERSE_METRICS_PATH', BASE_DIR / 'var' / 'metrics.sqlite3')
+
+# SQLite snapshots for analysts (see evaluation/snapshots.py), kept until the
+# data changes and built in a background thread unless this is off.
+EVALUATION_SNAPSHOT_DIR = os.environ.get('BANGLAVERSE_SNAPSHOT_DIR', BASE_DIR / 'var' / 'snapshots')
+EVALUATION_SNAPSHOT_BACKGROUND = True
+
+# Once ratings change, /report/ serves the last computed agreement report and
+# recomputes it in a background thread unless this is off (see evaluation/analytics.py).
+EVALUATION_ANALYTICS_BACKGROUND = True
+
+# Requests slower than this many seconds are logged with their SQL.
+EVALUATION_SLOW_REQUEST_SECONDS = float(os.environ.get('BANGLAVERSE_SLOW_REQUEST_SECONDS', '1.0'))
+
+# Estimated text similarity (0-1) at which items count as near-duplicates
+# (see evaluation/near_duplicates.py).
+EVALUATION_NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Admission control for the API (see evaluation/admission.py).
+# Token buckets per client and scope: (burst, requests per minute). Clients
+# are keyed by user when logged in, otherwise by a client cookie and IP address;
+# all anonymous clients of one IP address together get CLIENTS_PER_IP times the limit.
+EVALUATION_RATE_LIMIT = os.environ.get('BANGLAVERSE_RATE_LIMIT', '1') == '1'
+EVALUATION_RATE_LIMITS = {
+    'items': (20, 30),
+    'submit': (10, 10),
+}
+EVALUATION_RATE_LIMIT_CLIENTS_PER_IP = 50
+EVALUATION_RATE_LIMIT_PATH = os.environ.get('BANGLAVERSE_RATE_LIMIT_PATH', BASE_DIR / 'var' / 'rate_limits.sqlite3')
+# API requests each worker process serves at once before answering 503 (0 for no limit).
+EVALUATION_MAX_IN_FLIGHT = int(os.environ.get('BANGLAVERSE_MAX_IN_FLIGHT', '32'))
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 uses the socket address.
+EVALUATION_TRUSTED_PROXIES = int(os.environ.get('BANGLAVERSE_TRUSTED_PROXIES', '0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'evaluation': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
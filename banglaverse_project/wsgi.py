@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banglaverse_project.settings')
 
 application = get_wsgi_application()
+
+# Replay submissions a previous process left in the write-behind journal
+from evaluation.journal import start_replay  # noqa: E402
+
+start_replay()
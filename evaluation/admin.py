@@ -1,7 +1,18 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
 from django.urls import path
 from django.shortcuts import redirect
-from .models import DialectData, PlausibilityData, DialectEvaluation, PlausibilityEvaluation
+from django.utils.functional import cached_property
+from . import search
+from .exporters import FORMATS, stream_export
+from .item_stats import mean_expression
+from .near_duplicates import default_threshold, dialect_near_duplicates, plausibility_near_duplicates
+from .models import DialectData, PlausibilityData, Submission, DialectEvaluation, PlausibilityEvaluation, SearchDocument
 
 
 class CustomAdminSite(admin.AdminSite):
@@ -17,11 +28,198 @@ class CustomAdminSite(admin.AdminSite):
 admin.site.__class__ = CustomAdminSite
 
 
+# Filtered changelists count at most this many matching rows
+COUNT_LIMIT = 10000
+
+
+def estimated_row_count(model):
+    """
+    Cheap size estimate for a whole table: the planner statistics on PostgreSQL,
+    the highest id elsewhere (an upper bound, off by the rows deleted so far).
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # Statistics can lag behind a young table; small ones are cheap to count exactly
+        if row and row[0] > COUNT_LIMIT:
+            return row[0]
+        return model.objects.count()
+    return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an exact COUNT(*) over a large table.
+    Unfiltered lists use estimated_row_count; filtered ones count up to
+    COUNT_LIMIT rows, or far enough to reach the requested page and the
+    next one, so every page of a large match stays reachable.
+    """
+    requested_page = None
+
+    def count_limit(self):
+        try:
+            page = int(self.requested_page)
+        except (TypeError, ValueError):
+            return COUNT_LIMIT
+        return max(COUNT_LIMIT, (page + 1) * self.per_page + 1)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return estimated_row_count(queryset.model)
+        return queryset.order_by()[:self.count_limit()].count()
+
+    def correct_count(self, count):
+        """
+        Replace the estimate with a known row count.
+        """
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        self.__dict__.pop('page_range', None)
+
+
+class NarrowChangeList(ChangeList):
+    """
+    Changelist that loads only the columns listed in the admin's list_only,
+    and corrects an estimated count that overshoots the rows actually there.
+    """
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return queryset
+
+    def get_results(self, request):
+        super().get_results(request)
+        paginator = self.paginator
+        if not isinstance(paginator, EstimatedCountPaginator) or not self.multi_page or self.show_all:
+            return
+        # The highest id overcounts once rows have been deleted; a short page
+        # tells where the rows end, and a page past the end is counted exactly
+        shown = len(self.result_list)
+        if shown == self.list_per_page:
+            return
+        if shown == 0 and self.page_num > 1:
+            paginator.correct_count(self.queryset.count())
+            self.page_num = paginator.num_pages
+            self.result_list = paginator.page(self.page_num).object_list
+        else:
+            paginator.correct_count((self.page_num - 1) * self.list_per_page + shown)
+        self.result_count = paginator.count
+        self.multi_page = self.result_count > self.list_per_page
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Admin for tables that grow to millions of rows: estimated counts, no
+    second COUNT(*) for the unfiltered total, narrow row loading and a CSV
+    action that streams the selection instead of building it in memory.
+    Subclasses set export_type to one of exporters.EXPORTS, and search_kind
+    to a SearchDocument kind to search through the full-text index.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_csv']
+    export_type = None
+    list_only = None
+    search_kind = None
+
+    def get_changelist(self, request, **kwargs):
+        return NarrowChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        paginator = super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        paginator.requested_page = request.GET.get(PAGE_VAR)
+        return paginator
+    
+    def get_search_results(self, request, queryset, search_term):
+        if self.search_kind is None:
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_queryset(queryset, self.search_kind, search_term), False
+
+    @admin.action(description="Export selected rows as CSV", permissions=['view'])
+    def export_csv(self, request, queryset):
+        response = StreamingHttpResponse(
+            stream_export([self.export_type], 'csv', querysets={self.export_type: queryset}),
+            content_type=FORMATS['csv'],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_type}.csv"'
+        return response
+
+
+# Clusters shown by the near-duplicate action
+MAX_CLUSTERS = 200
+
+
+@admin.action(description="Find near-duplicates of selected items", permissions=['view'])
+def find_near_duplicates(modeladmin, request, queryset):
+    """
+    List the clusters of near-identical items that contain a selected item, using the MinHash index.
+    """
+    clusters = modeladmin.near_duplicates.clusters(queryset.values('pk'))
+    shown = clusters[:MAX_CLUSTERS]
+    items = modeladmin.model.objects.in_bulk({pk for cluster in shown for pk in cluster['item_ids']})
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        'title': f"Near-duplicate {modeladmin.model._meta.verbose_name_plural}",
+        'opts': modeladmin.model._meta,
+        'threshold': default_threshold(),
+        'cluster_count': len(clusters),
+        'clusters': [
+            {'similarity': cluster['similarity'], 'items': [items[pk] for pk in cluster['item_ids'] if pk in items]}
+            for cluster in shown
+        ],
+    }
+    return TemplateResponse(request, 'admin/evaluation/near_duplicates.html', context)
+
+
+ITEM_SEARCH_HELP = "Words or fragments of the texts. Bangla spelling variants (ZWJ/ZWNJ, long and short vowels) match each other."
+
+
+def stats_column(prefix, description):
+    """
+    Changelist column showing "mean ± sd" for a stats field, sortable by the mean.
+    Reads the item's stats row, so no aggregate over the evaluation tables is needed.
+    """
+    @admin.display(description=description, ordering=mean_expression(prefix))
+    def column(self, obj):
+        stats = getattr(obj, 'stats', None)
+        mean = stats.mean(prefix) if stats else None
+        if mean is None:
+            return '-'
+        variance = stats.variance(prefix)
+        if variance is None:
+            return f"{mean:.2f}"
+        return f"{mean:.2f} ± {variance ** 0.5:.2f}"
+    return column
+
+
 @admin.register(DialectData)
-class DialectDataAdmin(admin.ModelAdmin):
-    list_display = ['dialect_name', 'original_text_preview', 'ai_text_preview', 'created_at']
+class DialectDataAdmin(LargeTableAdmin):
+    list_display = ['dialect_name', 'original_text_preview', 'ai_text_preview', 'rating_count', 'accuracy_mean', 'naturalness_mean', 'assigned_count', 'created_at']
     list_filter = ['dialect_name', 'created_at']
+    list_select_related = ['stats']
+    # The model ordering plus id, so pages are read straight off dialectdata_listing_idx
+    ordering = ['dialect_name', 'created_at', 'id']
+    export_type = 'dialect_data'
+    # Looked up in the search index, not scanned
     search_fields = ['original_standard_text', 'ai_generated_dialect_text']
+    search_kind = SearchDocument.KIND_DIALECT
+    search_help_text = ITEM_SEARCH_HELP
+    actions = ['export_csv', find_near_duplicates]
+    near_duplicates = dialect_near_duplicates
+    readonly_fields = ['assigned_count', 'completed_count']
+    
+    accuracy_mean = stats_column('accuracy', "Accuracy")
+    naturalness_mean = stats_column('naturalness', "Naturalness")
+    
+    @admin.display(description="Ratings", ordering='stats__rating_count')
+    def rating_count(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return stats.rating_count if stats else 0
     
     def original_text_preview(self, obj):
         return obj.original_standard_text[:50] + "..." if len(obj.original_standard_text) > 50 else obj.original_standard_text
@@ -33,9 +231,27 @@ class DialectDataAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlausibilityData)
-class PlausibilityDataAdmin(admin.ModelAdmin):
-    list_display = ['question_preview', 'correct_answer_preview', 'created_at']
-    search_fields = ['question', 'correct_answer']
+class PlausibilityDataAdmin(LargeTableAdmin):
+    list_display = ['question_preview', 'correct_answer_preview', 'rating_count', 'option_1_mean', 'option_2_mean', 'option_3_mean', 'assigned_count', 'created_at']
+    list_select_related = ['stats']
+    ordering = ['created_at', 'id']
+    export_type = 'plausibility_data'
+    # Looked up in the search index, not scanned
+    search_fields = ['question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3']
+    search_kind = SearchDocument.KIND_PLAUSIBILITY
+    search_help_text = ITEM_SEARCH_HELP
+    actions = ['export_csv', find_near_duplicates]
+    near_duplicates = plausibility_near_duplicates
+    readonly_fields = ['assigned_count', 'completed_count']
+    
+    option_1_mean = stats_column('option_1', "Option 1 plausibility")
+    option_2_mean = stats_column('option_2', "Option 2 plausibility")
+    option_3_mean = stats_column('option_3', "Option 3 plausibility")
+    
+    @admin.display(description="Ratings", ordering='stats__rating_count')
+    def rating_count(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return stats.rating_count if stats else 0
     
     def question_preview(self, obj):
         return obj.question[:60] + "..." if len(obj.question) > 60 else obj.question
@@ -46,17 +262,72 @@ class PlausibilityDataAdmin(admin.ModelAdmin):
     correct_answer_preview.short_description = "Correct Answer"
 
 
+@admin.register(Submission)
+class SubmissionAdmin(LargeTableAdmin):
+    list_display = ['evaluator_name', 'evaluator_email', 'session_id', 'created_at']
+    list_filter = ['created_at']
+    # Exact email / session id or a name prefix, instead of substring scans
+    search_fields = ['=evaluator_email', '=session_id', '^evaluator_name']
+    search_help_text = "Exact email or session id, or the start of the evaluator name."
+    readonly_fields = ['idempotency_key', 'created_at']
+    export_type = 'submissions'
+
+
+class EvaluationAdmin(LargeTableAdmin):
+    """
+    Shared changelist setup for the evaluation tables.
+    """
+    search_fields = [
+        '=submission__evaluator_email', '=submission__session_id', '^submission__evaluator_name', 'comments',
+    ]
+    search_help_text = "Exact email or session id, the start of the evaluator name, or words from the comments."
+    readonly_fields = ['created_at']
+    
+    @admin.display(description="Evaluator name", ordering='submission__evaluator_name')
+    def evaluator_name(self, obj):
+        return obj.submission.evaluator_name
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match submissions first and select their evaluations by submission id,
+        rather than joining every evaluation row against the search terms;
+        comments are looked up in the search index.
+        """
+        if not search_term:
+            return queryset, False
+        submissions, _ = self.admin_site._registry[Submission].get_search_results(
+            request, Submission.objects.all(), search_term
+        )
+        matches = Q(submission__in=submissions.values('id'))
+        commented = search.object_ids(self.search_kind, search_term)
+        if commented is not None:
+            matches |= Q(pk__in=commented)
+        return queryset.filter(matches), False
+
+
 @admin.register(DialectEvaluation)
-class DialectEvaluationAdmin(admin.ModelAdmin):
+class DialectEvaluationAdmin(EvaluationAdmin):
     list_display = ['dialect_data', 'evaluator_name', 'accuracy_rating', 'naturalness_rating', 'created_at']
     list_filter = ['created_at', 'accuracy_rating', 'naturalness_rating']
-    search_fields = ['evaluator_name', 'evaluator_email', 'comments']
-    readonly_fields = ['created_at']
+    list_select_related = ['dialect_data', 'submission']
+    list_only = [
+        'dialect_data__dialect_name', 'dialect_data__original_standard_text', 'submission__evaluator_name',
+        'accuracy_rating', 'naturalness_rating', 'created_at',
+    ]
+    raw_id_fields = ['dialect_data', 'submission']
+    export_type = 'dialect_evaluations'
+    search_kind = SearchDocument.KIND_DIALECT_COMMENT
 
 
 @admin.register(PlausibilityEvaluation)
-class PlausibilityEvaluationAdmin(admin.ModelAdmin):
+class PlausibilityEvaluationAdmin(EvaluationAdmin):
     list_display = ['plausibility_data', 'evaluator_name', 'option_1_plausibility', 'option_2_plausibility', 'option_3_plausibility', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['evaluator_name', 'evaluator_email', 'comments']
-    readonly_fields = ['created_at']
+    list_filter = ['created_at', 'option_1_plausibility', 'option_2_plausibility', 'option_3_plausibility']
+    list_select_related = ['plausibility_data', 'submission']
+    list_only = [
+        'plausibility_data__question', 'submission__evaluator_name',
+        'option_1_plausibility', 'option_2_plausibility', 'option_3_plausibility', 'created_at',
+    ]
+    raw_id_fields = ['plausibility_data', 'submission']
+    export_type = 'plausibility_evaluations'
+    search_kind = SearchDocument.KIND_PLAUSIBILITY_COMMENT
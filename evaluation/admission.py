@@ -0,0 +1,331 @@
+"""
+Admission control for the evaluation API.
+
+Two checks run before the item and submission views:
+
+- Load shedding: each worker process serves at most
+  EVALUATION_MAX_IN_FLIGHT API requests at once. Beyond that it answers 503
+  right away, so a burst is turned away in microseconds instead of queueing
+  behind slow requests and pushing everyone's latency past the timeout.
+- Rate limiting: a token bucket per client and scope (EVALUATION_RATE_LIMITS).
+  Buckets live in a small WAL-mode SQLite file shared by all worker
+  processes and are updated with one atomic UPSERT per request, so the
+  limit holds across gunicorn workers. Clients are keyed by their user when
+  logged in. Anonymous browsers get a client cookie with their first page
+  and are keyed by that cookie and their IP address, so a classroom behind
+  one NAT address doesn't share a bucket. A second bucket per IP address,
+  EVALUATION_RATE_LIMIT_CLIENTS_PER_IP times as large, caps what one
+  address can get by making up new cookies. Requests without the cookie
+  are keyed by IP address alone.
+
+Rejections carry Retry-After and are counted in /metrics
+(banglaverse_admission_rejected_total). If the bucket file can't be written
+the request is let through: a broken limiter must not take the API down.
+"""
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Rate-limit scope of each API view
+SCOPES = {
+    'evaluation:get_dialect_data': 'items',
+    'evaluation:get_plausibility_data': 'items',
+    'evaluation:session_bundle': 'items',
+    'evaluation:submit_evaluation': 'submit',
+}
+
+# Seconds a shed client is told to wait; the work in flight is usually done by then
+SHED_RETRY_AFTER = 2
+
+# Seconds a request waits for another worker's bucket update before it is let through
+BUSY_TIMEOUT = 0.5
+
+# Seconds between sweeps of buckets that have refilled completely
+PRUNE_INTERVAL = 60
+
+# Anonymous client id, issued with the first response to a browser without one
+CLIENT_COOKIE = 'evaluation_client'
+CLIENT_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+CLIENT_ID_RE = re.compile('[0-9a-f]{32}')
+
+RATE_LIMITED = 'rate_limited'
+SHED = 'shed'
+
+TAKE_SQL = """
+INSERT INTO buckets (key, tokens, allowed, updated_at) VALUES (:key, :capacity - 1, 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = MIN(:capacity, tokens + MAX(:now - updated_at, 0) * :rate)
+             - (MIN(:capacity, tokens + MAX(:now - updated_at, 0) * :rate) >= 1),
+    allowed = MIN(:capacity, tokens + MAX(:now - updated_at, 0) * :rate) >= 1,
+    updated_at = :now
+RETURNING tokens, allowed
+"""
+
+
+def rate_limit_enabled():
+    return getattr(settings, 'EVALUATION_RATE_LIMIT', True)
+
+
+def rate_limits():
+    """
+    (burst, refill per second) per scope.
+    """
+    limits = getattr(settings, 'EVALUATION_RATE_LIMITS', {})
+    return {scope: (burst, per_minute / 60) for scope, (burst, per_minute) in limits.items()}
+
+
+def max_in_flight():
+    return getattr(settings, 'EVALUATION_MAX_IN_FLIGHT', 0)
+
+
+def rate_limit_path():
+    return str(getattr(settings, 'EVALUATION_RATE_LIMIT_PATH', settings.BASE_DIR / 'var' / 'rate_limits.sqlite3'))
+
+
+def client_ip(request):
+    """
+    The client's address: the socket peer, or with EVALUATION_TRUSTED_PROXIES
+    set, the X-Forwarded-For entry added by the outermost trusted proxy.
+    """
+    proxies = getattr(settings, 'EVALUATION_TRUSTED_PROXIES', 0)
+    if proxies:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def clients_per_ip():
+    return getattr(settings, 'EVALUATION_RATE_LIMIT_CLIENTS_PER_IP', 50)
+
+
+def client_id(request):
+    """
+    The anonymous client id from the request's cookie, or None if it has none (or a malformed one).
+    """
+    value = request.COOKIES.get(CLIENT_COOKIE, '')
+    return value if CLIENT_ID_RE.fullmatch(value) else None
+
+
+def issue_client_id(request, response):
+    """
+    Give a client without an id one, so its next API requests get a bucket of their own.
+    """
+    if client_id(request) is None and CLIENT_COOKIE not in response.cookies:
+        response.set_cookie(
+            CLIENT_COOKIE, uuid.uuid4().hex, max_age=CLIENT_COOKIE_MAX_AGE, secure=request.is_secure(),
+            httponly=True, samesite='Lax',
+        )
+    return response
+
+
+def client_buckets(request, user):
+    """
+    (bucket key, limit multiplier) of every bucket a request takes a token from.
+    """
+    if user.is_authenticated:
+        return [(f'user:{user.pk}', 1)]
+    ip = client_ip(request)
+    client = client_id(request)
+    if client is None:
+        return [(f'ip:{ip}', 1)]
+    return [(f'ip:{ip}:client:{client}', 1), (f'net:{ip}', clients_per_ip())]
+
+
+class BucketStore:
+    """
+    Token buckets in a SQLite file shared by the worker processes.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._last_prune = time.monotonic()
+
+    def _connect(self):
+        path = rate_limit_path()
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.path != path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            # Losing the last buckets in a crash only refills them early
+            db.execute('PRAGMA synchronous=OFF')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                'allowed INTEGER NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID'
+            )
+            self._local.db = db
+            self._local.path = path
+        return db
+
+    def take(self, key, capacity, rate):
+        """
+        Take a token from key's bucket. Returns (allowed, seconds until the next token).
+        """
+        now = time.time()
+        db = self._connect()
+        tokens, allowed = db.execute(
+            TAKE_SQL, {'key': key, 'capacity': capacity, 'rate': rate, 'now': now},
+        ).fetchone()
+        if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+            self.prune(now)
+        if allowed:
+            return True, 0
+        return False, (1 - tokens) / rate
+
+    def prune(self, now=None):
+        """
+        Delete buckets idle long enough to be full again; a missing bucket starts full.
+        """
+        self._last_prune = time.monotonic()
+        refill_seconds = max((capacity / rate for capacity, rate in rate_limits().values()), default=0)
+        self._connect().execute('DELETE FROM buckets WHERE updated_at < ?', ((now or time.time()) - refill_seconds,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM buckets')
+
+
+class InFlight:
+    """
+    Number of API requests this process is serving.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def acquire(self, limit):
+        with self._lock:
+            if limit and self.count >= limit:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+
+
+buckets = BucketStore()
+in_flight = InFlight()
+
+
+def admitted_view(request):
+    """
+    Name of the API view request is routed to, or None if admission control doesn't cover it.
+    """
+    try:
+        view = resolve(request.path_info).view_name
+    except Resolver404:
+        return None
+    return view if view in SCOPES else None
+
+
+def rejection(view, reason, message, retry_after):
+    registry.reject(view, reason)
+    response = JsonResponse({'success': False, 'error': message}, status=429 if reason == RATE_LIMITED else 503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class AdmissionMiddleware:
+    """
+    Sheds API requests beyond the in-flight limit (503) and rate-limits them per client (429).
+    Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return issue_client_id(request, self.admit(request))
+
+    async def __acall__(self, request):
+        return issue_client_id(request, await self.aadmit(request))
+
+    def admit(self, request):
+        view = admitted_view(request)
+        if view is None:
+            return self.get_response(request)
+        rejected = self.shed(view)
+        if rejected:
+            return rejected
+        try:
+            if rate_limit_enabled():
+                rejected = self.rate_limit(request, view, request.user)
+                if rejected:
+                    return rejected
+            return self.get_response(request)
+        finally:
+            in_flight.release()
+
+    async def aadmit(self, request):
+        view = admitted_view(request)
+        if view is None:
+            return await self.get_response(request)
+        rejected = self.shed(view)
+        if rejected:
+            return rejected
+        try:
+            if rate_limit_enabled():
+                user = await request.auser()
+                # The bucket update can wait up to BUSY_TIMEOUT on another worker; keep it off the event loop
+                rejected = await sync_to_async(self.rate_limit, thread_sensitive=False)(request, view, user)
+                if rejected:
+                    return rejected
+            return await self.get_response(request)
+        finally:
+            in_flight.release()
+
+    def shed(self, view):
+        """
+        Take an in-flight slot. Returns None if one was free (the caller then
+        owns it), otherwise the 503 response.
+        """
+        if in_flight.acquire(max_in_flight()):
+            return None
+        return rejection(view, SHED, 'The server is busy. Please try again in a moment.', SHED_RETRY_AFTER)
+
+    def rate_limit(self, request, view, user):
+        """
+        Take a token from each of the client's buckets for view's scope. Returns
+        None if the request may go ahead, otherwise the 429 response.
+        """
+        scope = SCOPES[view]
+        limit = rate_limits().get(scope)
+        if limit is None:
+            return None
+        capacity, rate = limit
+        wait = 0
+        try:
+            for key, factor in client_buckets(request, user):
+                allowed, wait = buckets.take(f'{scope}:{key}', capacity * factor, rate * factor)
+                if not allowed:
+                    break
+        except sqlite3.Error:
+            logger.exception('Rate limit store unavailable; letting the request through')
+            return None
+        if allowed:
+            return None
+        retry_after = max(math.ceil(wait), 1)
+        return rejection(view, RATE_LIMITED, f'Too many requests. Please try again in {retry_after} seconds.', retry_after)
@@ -0,0 +1,370 @@
+"""
+Batch analytics over the evaluation tables.
+
+Ratings are loaded once into NumPy arrays and reduced per item with
+bincount, which is all Krippendorff's alpha (interval metric) needs:
+
+    D_o = 1/n * sum_u [ 2 (m_u * S2_u - S1_u^2) / (m_u - 1) ]
+    D_e = 2 (n * S2 - S1^2) / (n (n - 1))
+    alpha = 1 - D_o / D_e
+
+where m_u, S1_u, S2_u are the count, sum and sum of squares of unit u.
+A bootstrap resample of units only needs the totals of those per-unit sums
+over the drawn units, so each resample is an index draw and a sum, done for
+a block of resamples at a time. Independent metrics
+(dialect x rating, MCQ option) are spread over a process pool, and the
+finished report is cached under the current data version.
+
+Once new ratings arrive the last computed report keeps being served, marked
+stale, while a background thread computes the one for the new version, so no
+request waits for a full recomputation except the very first.
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+from .models import DialectData, PlausibilityDataStats, DialectEvaluation, PlausibilityEvaluation
+from .versioning import EVALUATIONS, ITEMS, get_version
+
+DEFAULT_BOOTSTRAP = 1000
+BOOTSTRAP_BLOCK = 200
+# Drawn unit indices per block (resamples x units); bounds the block's memory
+# to a few MB however many items were rated
+BOOTSTRAP_BLOCK_CELLS = 1_000_000
+CONFIDENCE = 0.95
+
+# Distractors need at least this many ratings to be ranked
+MIN_DISTRACTOR_RATINGS = 3
+DISTRACTOR_RANKING_SIZE = 20
+
+CACHE_ALIAS = 'shared'
+LATEST_KEY = 'evaluation:analytics:latest'
+
+# Seconds between background recomputations while ratings keep arriving
+REBUILD_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+def unit_sums(units, values, n_units):
+    """
+    Per-unit count, sum and sum of squares.
+    """
+    counts = np.bincount(units, minlength=n_units).astype(float)
+    sums = np.bincount(units, weights=values, minlength=n_units)
+    squares = np.bincount(units, weights=values * values, minlength=n_units)
+    return counts, sums, squares
+
+
+def within_unit(counts, sums, squares):
+    """
+    Per-unit disagreement term 2 (m_u * S2_u - S1_u^2) / (m_u - 1) of units with two or more ratings.
+    """
+    return 2 * (counts * squares - sums ** 2) / (counts - 1)
+
+
+def alpha_from_totals(n, total, total_sq, within):
+    """
+    Interval Krippendorff's alpha from the totals of the per-unit sums over
+    the pairable units (scalars, or arrays with one entry per resample).
+    NaN where there is no expected disagreement.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed = within / n
+        expected = 2 * (n * total_sq - total ** 2) / (n * (n - 1))
+        alpha = 1 - observed / expected
+    return np.where(expected > 0, alpha, np.nan)
+
+
+def alpha_from_sums(counts, sums, squares):
+    """
+    Interval Krippendorff's alpha from per-unit sums.
+    Units with fewer than two ratings must already be removed.
+    """
+    return alpha_from_totals(counts.sum(), sums.sum(), squares.sum(), within_unit(counts, sums, squares).sum())
+
+
+def resample_totals(rng, columns, n_boot):
+    """
+    Bootstrap totals of per-unit columns: draw the units of each resample
+    with replacement and sum every column over them. columns is (U, C);
+    returns (n_boot, C). Blocks of resamples are drawn as index arrays
+    of at most BOOTSTRAP_BLOCK_CELLS entries, never as (B, U) weights.
+    """
+    n_units = len(columns)
+    block = max(1, min(BOOTSTRAP_BLOCK, BOOTSTRAP_BLOCK_CELLS // n_units))
+    totals = []
+    for start in range(0, n_boot, block):
+        size = min(block, n_boot - start)
+        drawn = rng.integers(0, n_units, size * n_units)
+        offsets = np.arange(0, size * n_units, n_units)
+        totals.append(np.stack(
+            [np.add.reduceat(columns[drawn, column], offsets) for column in range(columns.shape[1])], axis=1,
+        ))
+    return np.concatenate(totals)
+
+
+def _interval(samples):
+    samples = samples[~np.isnan(samples)]
+    if not len(samples):
+        return None, None
+    tail = (1 - CONFIDENCE) / 2 * 100
+    low, high = np.percentile(samples, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def _number(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def analyse_metric(task):
+    """
+    Point estimates and bootstrap intervals for one rating column.
+    Runs in a worker process, so it only touches the arrays it is given.
+    """
+    key, units, values, n_boot, seed = task
+    n_units = int(units.max()) + 1 if len(units) else 0
+    counts, sums, squares = unit_sums(units, values, n_units)
+    result = {
+        'key': key,
+        'ratings': int(len(values)),
+        'items': int((counts > 0).sum()),
+        'mean': _number(values.mean()) if len(values) else None,
+        'mean_ci': (None, None),
+        'alpha': None,
+        'alpha_ci': (None, None),
+    }
+    if not len(values):
+        return result
+
+    rated = counts > 0
+    pairable = counts >= 2
+    result['alpha'] = _number(alpha_from_sums(counts[pairable], sums[pairable], squares[pairable]))
+
+    # Per rated unit: count and sum for the mean, and the same restricted to
+    # pairable units (zero otherwise) with the within-unit term for alpha
+    counts, sums, squares, pairable = counts[rated], sums[rated], squares[rated], pairable[rated]
+    within = np.zeros(len(counts))
+    within[pairable] = within_unit(counts[pairable], sums[pairable], squares[pairable])
+    columns = np.stack([counts, sums, counts * pairable, sums * pairable, squares * pairable, within], axis=1)
+    totals = resample_totals(np.random.default_rng(seed), columns, n_boot)
+    result['mean_ci'] = _interval(totals[:, 1] / totals[:, 0])
+    if pairable.any():
+        result['alpha_ci'] = _interval(alpha_from_totals(*totals[:, 2:].T))
+    return result
+
+
+def _index(ids):
+    """
+    Map arbitrary ids to dense 0..U-1 unit indices.
+    """
+    _, dense = np.unique(ids, return_inverse=True)
+    return dense
+
+
+def load_tasks(n_boot, seed):
+    """
+    Read the evaluation tables into arrays and split them into independent metric tasks.
+    """
+    tasks = []
+    rows = DialectEvaluation.objects.order_by().values_list(
+        'dialect_data__dialect_name', 'dialect_data_id', 'accuracy_rating', 'naturalness_rating',
+    )
+    by_dialect = {}
+    for dialect, item_id, accuracy, naturalness in rows.iterator(chunk_size=10000):
+        by_dialect.setdefault(dialect, []).append((item_id, accuracy, naturalness))
+    for dialect, _ in DialectData.DIALECT_CHOICES:
+        data = np.array(by_dialect.get(dialect, []), dtype=np.int64).reshape(-1, 3)
+        units = _index(data[:, 0])
+        for column, name in ((1, 'accuracy'), (2, 'naturalness')):
+            tasks.append(((dialect, name), units, data[:, column].astype(float), n_boot, seed))
+
+    rows = PlausibilityEvaluation.objects.order_by().values_list(
+        'plausibility_data_id', 'option_1_plausibility', 'option_2_plausibility', 'option_3_plausibility',
+    )
+    data = np.fromiter(rows.iterator(chunk_size=10000), dtype=np.dtype((np.int64, 4))).reshape(-1, 4)
+    units = _index(data[:, 0])
+    for option in (1, 2, 3):
+        tasks.append((('mcq', f'option_{option}'), units, data[:, option].astype(float), n_boot, seed))
+    return tasks
+
+
+def rank_distractors(limit=DISTRACTOR_RANKING_SIZE, min_ratings=MIN_DISTRACTOR_RATINGS):
+    """
+    Rank individual distractors by mean plausibility using the per-item stats table.
+    Returns the most and least plausible distractors with normal-approximation intervals.
+    """
+    rows = list(
+        PlausibilityDataStats.objects.filter(rating_count__gte=min_ratings)
+        .values_list(
+            'plausibility_data_id', 'plausibility_data__question', 'rating_count',
+            'option_1_sum', 'option_1_sum_sq', 'option_2_sum', 'option_2_sum_sq', 'option_3_sum', 'option_3_sum_sq',
+        )
+        .iterator(chunk_size=10000)
+    )
+    if not rows:
+        return {'strongest': [], 'weakest': []}
+    ids = np.array([row[0] for row in rows])
+    stats = np.array([row[2:] for row in rows], dtype=float)
+    n = stats[:, 0:1]
+    sums = stats[:, 1::2]
+    squares = stats[:, 2::2]
+    means = sums / n
+    variances = np.clip((squares - sums ** 2 / n) / np.maximum(n - 1, 1), 0, None)
+    margins = 1.96 * np.sqrt(variances / n)
+
+    flat_means = means.ravel()
+    order = np.argsort(flat_means, kind='stable')
+    questions = {row[0]: row[1] for row in rows}
+
+    def describe(flat):
+        row, option = divmod(int(flat), 3)
+        return {
+            'plausibility_data_id': int(ids[row]),
+            'question': questions[int(ids[row])][:80],
+            'option': option + 1,
+            'ratings': int(n[row, 0]),
+            'mean': float(means[row, option]),
+            'ci': (float(means[row, option] - margins[row, option]), float(means[row, option] + margins[row, option])),
+        }
+
+    return {
+        'strongest': [describe(flat) for flat in order[::-1][:limit]],
+        'weakest': [describe(flat) for flat in order[:limit]],
+    }
+
+
+def data_version():
+    return f'{get_version(ITEMS)}.{get_version(EVALUATIONS)}'
+
+
+def parse_version(version):
+    """
+    (items, evaluations) of a data version string such as '3.120'.
+    """
+    items, evaluations = version.split('.')
+    return int(items), int(evaluations)
+
+
+def cache_key(version):
+    return f'evaluation:analytics:{version}'
+
+
+def build_in_background():
+    return getattr(settings, 'EVALUATION_ANALYTICS_BACKGROUND', True)
+
+
+def compute_report(workers=1, n_boot=DEFAULT_BOOTSTRAP, seed=0):
+    """
+    Compute the full report. With workers > 1 the metrics run in a process pool.
+    """
+    version = data_version()
+    tasks = load_tasks(n_boot, seed)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(analyse_metric, tasks))
+    else:
+        results = [analyse_metric(task) for task in tasks]
+
+    dialects = {}
+    mcq_options = []
+    for result in results:
+        group, name = result.pop('key')
+        if group == 'mcq':
+            mcq_options.append({'option': name, **result})
+        else:
+            dialects.setdefault(group, {'dialect': group})[name] = result
+    labels = dict(DialectData.DIALECT_CHOICES)
+    for dialect, entry in dialects.items():
+        entry['label'] = labels.get(dialect, dialect)
+        entry['ratings'] = entry['accuracy']['ratings']
+        entry['items'] = entry['accuracy']['items']
+
+    return {
+        'version': version,
+        'generated_at': timezone.now(),
+        'bootstrap': n_boot,
+        'dialects': list(dialects.values()),
+        'mcq_options': mcq_options,
+        'distractors': rank_distractors(),
+    }
+
+
+def store_report(report):
+    """
+    Cache report under its data version, and as the latest one unless a newer
+    report (a later computation that finished first) is already there.
+    """
+    cache = caches[CACHE_ALIAS]
+    cache.set(cache_key(report['version']), report, None)
+    latest = cache.get(LATEST_KEY)
+    if latest is None or parse_version(latest['version']) <= parse_version(report['version']):
+        cache.set(LATEST_KEY, report, None)
+
+
+class ReportBuilder:
+    """
+    Computes the report in a background thread, at most one at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+
+    def start(self, workers, n_boot):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        thread = threading.Thread(
+            target=self._run, args=(workers, n_boot), name='analytics-builder', daemon=True,
+        )
+        thread.start()
+
+    def running(self):
+        with self._lock:
+            return self._running
+
+    def _run(self, workers, n_boot):
+        try:
+            store_report(compute_report(workers=workers, n_boot=n_boot))
+        except Exception:
+            logger.exception('Computing the analytics report failed')
+        finally:
+            with self._lock:
+                self._running = False
+            # The builder has its own connection; don't leave it open
+            connection.close()
+
+
+report_builder = ReportBuilder()
+
+
+def get_report(workers=1, n_boot=DEFAULT_BOOTSTRAP, refresh=False):
+    """
+    Return the report for the current data version if it is cached. Otherwise
+    return the last computed one with stale=True and recompute in the
+    background, at most every REBUILD_INTERVAL seconds. The report is computed
+    in the request when there is none yet, when background computation is
+    off, or on refresh.
+    """
+    cache = caches[CACHE_ALIAS]
+    if not refresh:
+        report = cache.get(cache_key(data_version()))
+        if report is not None:
+            return report
+        latest = cache.get(LATEST_KEY)
+        if latest is not None and build_in_background():
+            if (timezone.now() - latest['generated_at']).total_seconds() >= REBUILD_INTERVAL:
+                report_builder.start(workers, n_boot)
+            return {**latest, 'stale': True}
+    report = compute_report(workers=workers, n_boot=n_boot)
+    store_report(report)
+    return report
@@ -0,0 +1,126 @@
+"""
+Async versions of the evaluation API and export views, used under ASGI.
+
+Exports are read with the async ORM (aiterator) and streamed from an async
+generator, so a slow client downloading a large export or trickling in a
+submission holds no thread while it waits on the network. Work that must
+run in one transaction (reserving items, saving a submission) goes through
+the same sync code as the WSGI views via sync_to_async, since Django's ORM
+has no async transactions.
+
+urls.py routes to these views when settings.EVALUATION_ASYNC_VIEWS is on,
+which asgi.py enables.
+"""
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import views
+from .exporters import FORMATS, aiter_rows, astream_export, encode_cursor, incremental_page
+
+
+@require_http_methods(["GET"])
+async def get_dialect_data(request):
+    """
+    Async get_dialect_data.
+    """
+    session_id = request.GET.get('session_id') or str(uuid.uuid4())
+    payload, status = await sync_to_async(views.dialect_items)(request.GET.get('dialect'), session_id)
+    return JsonResponse(payload, status=status)
+
+
+@require_http_methods(["GET"])
+async def get_plausibility_data(request):
+    """
+    Async get_plausibility_data.
+    """
+    session_id = request.GET.get('session_id') or str(uuid.uuid4())
+    payload, status = await sync_to_async(views.plausibility_items)(session_id)
+    return JsonResponse(payload, status=status)
+
+
+@require_http_methods(["GET"])
+async def session_bundle(request):
+    """
+    Async session_bundle.
+    """
+    payload, status = await sync_to_async(views.take_bundle)(request.GET.get('dialect'))
+    return JsonResponse(payload, status=status, json_dumps_params=views.COMPACT_JSON)
+
+
+@require_http_methods(["POST"])
+@csrf_exempt
+async def submit_evaluation(request):
+    """
+    Async submit_evaluation. The body has been read by the ASGI handler before
+    the view runs; only the transactional write takes a thread.
+    """
+    payload, status = await sync_to_async(views.submit_payload)(request.body, request.headers.get('Idempotency-Key'))
+    return JsonResponse(payload, status=status)
+
+
+async def export_data(request):
+    """
+    Async export_data: NDJSON and CSV are streamed with the async ORM.
+    """
+    user = await request.auser()
+    if not user.is_staff:
+        return redirect('evaluation:home')
+
+    export_type = request.GET.get('type', 'all')
+    output_format = request.GET.get('format', 'json')
+
+    if output_format in FORMATS:
+        return streaming_export(request, export_type, output_format)
+
+    data, filename = await sync_to_async(views.json_export)(export_type)
+
+    response = HttpResponse(data, content_type='application/json')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_export(request, export_type, output_format):
+    params = views.streaming_params(request, export_type, output_format)
+    if isinstance(params, HttpResponse):
+        return params
+    export_types, filename, content_type, compress = params
+
+    response = StreamingHttpResponse(astream_export(export_types, output_format, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_http_methods(["GET"])
+async def export_incremental(request):
+    """
+    Async export_incremental.
+    """
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+
+    params = views.incremental_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    export_type, since_id, limit = params
+
+    queryset, last_id, has_more = await sync_to_async(incremental_page)(export_type, since_id, limit)
+
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(
+            astream_export([export_type], 'ndjson', querysets={export_type: queryset}),
+            content_type=FORMATS['ndjson'],
+        )
+        return views.incremental_headers(response, export_type, last_id, has_more)
+
+    return JsonResponse({
+        'type': export_type,
+        'data': [row async for row in aiter_rows(export_type, queryset)],
+        'next_cursor': encode_cursor(export_type, last_id),
+        'has_more': has_more,
+    })
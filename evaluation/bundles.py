@@ -0,0 +1,209 @@
+"""
+Pre-generated session bundles.
+
+A bundle is everything an evaluator needs to start: a server-issued session
+id, 10 dialect items and up to 10 MCQ items. Each process keeps a few ready
+bundles per dialect and a background thread tops them up, so starting a
+session is one request that pops a bundle instead of two requests that each
+run the sampling queries. In balanced mode the items are reserved under the
+bundle's own session id when it is generated; handing it out only pushes
+the reservation expiry forward. Bundles that wait too long, or were built
+before the items changed, are dropped and their reservations released.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .item_pool import dialect_pool, plausibility_pool
+from .models import DialectData, ItemReservation
+from .scheduler import (
+    complete_session, dialect_scheduler, plausibility_scheduler, reservation_timeout, use_balanced_selection,
+)
+from .versioning import ITEMS, get_version
+from .write_lock import locked_write
+
+logger = logging.getLogger(__name__)
+
+ITEMS_PER_SESSION = 10
+
+# Pooled bundles older than this are discarded so they don't sit on reserved items.
+MAX_BUNDLE_AGE = 10 * 60
+
+# Seconds between refill passes when nobody has taken a bundle.
+REFILL_INTERVAL = 30
+
+
+class BundleError(Exception):
+    """
+    Raised when there are not enough items to build a bundle.
+    """
+
+
+def pool_size():
+    return getattr(settings, 'EVALUATION_BUNDLE_POOL_SIZE', 2)
+
+
+def build_bundle(dialect):
+    """
+    Sample (and in balanced mode reserve) a fresh bundle for dialect.
+    """
+    available = len(dialect_pool.ids(dialect))
+    if available < ITEMS_PER_SESSION:
+        raise BundleError(
+            f'Not enough data for {dialect}. Found {available} items, need at least {ITEMS_PER_SESSION}.'
+        )
+    if not len(plausibility_pool.ids()):
+        raise BundleError('No plausibility data available')
+
+    session_id = str(uuid.uuid4())
+    if use_balanced_selection():
+        dialect_items = dialect_scheduler.assign(ITEMS_PER_SESSION, session_id, dialect)
+        plausibility_items = plausibility_scheduler.assign(ITEMS_PER_SESSION, session_id)
+    else:
+        dialect_items = dialect_pool.sample(ITEMS_PER_SESSION, dialect)
+        plausibility_items = plausibility_pool.sample(ITEMS_PER_SESSION)
+    return {
+        'session_id': session_id,
+        'dialect': dialect,
+        'dialect_data': dialect_items,
+        'plausibility_data': plausibility_items,
+    }
+
+
+@locked_write
+def release_bundle(bundle):
+    """
+    Give a bundle's reserved items back to the queue.
+    """
+    with transaction.atomic():
+        complete_session(bundle['session_id'], [], [])
+
+
+@locked_write
+def extend_reservations(bundle):
+    """
+    Restart the reservation clock of a bundle's items.
+    """
+    with transaction.atomic():
+        ItemReservation.objects.filter(session_id=bundle['session_id']).update(
+            expires_at=timezone.now() + reservation_timeout()
+        )
+
+
+class BundlePool:
+    """
+    Ready bundles per dialect for this process, refilled by a daemon thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bundles = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _fresh(self, entry, version):
+        created, bundle_version, _ = entry
+        max_age = min(MAX_BUNDLE_AGE, reservation_timeout().total_seconds() / 2)
+        return bundle_version == version and time.monotonic() - created < max_age
+
+    def _pop(self, dialect, version):
+        """
+        Pop the oldest fresh bundle for dialect; stale ones popped on the way are returned for release.
+        """
+        stale = []
+        with self._lock:
+            queue = self._bundles.get(dialect)
+            while queue:
+                entry = queue.popleft()
+                if self._fresh(entry, version):
+                    return entry[2], stale
+                stale.append(entry[2])
+        return None, stale
+
+    def take(self, dialect):
+        """
+        Return a bundle for dialect, from the pool if one is ready.
+        """
+        if dialect not in dict(DialectData.DIALECT_CHOICES):
+            raise BundleError(f'Unknown dialect: {dialect}')
+        bundle, stale = self._pop(dialect, get_version(ITEMS)) if pool_size() > 0 else (None, [])
+        for old in stale:
+            release_bundle(old)
+        if bundle is None:
+            bundle = build_bundle(dialect)
+        elif use_balanced_selection():
+            # The clock starts when the evaluator gets the items, not when they were pooled
+            extend_reservations(bundle)
+        self._start()
+        self._wakeup.set()
+        return bundle
+
+    def refill(self):
+        """
+        Drop stale bundles and top every dialect up to the pool size.
+        Returns the number of bundles built.
+        """
+        version = get_version(ITEMS)
+        stale = []
+        with self._lock:
+            for queue in self._bundles.values():
+                stale += [entry[2] for entry in queue if not self._fresh(entry, version)]
+                kept = [entry for entry in queue if self._fresh(entry, version)]
+                queue.clear()
+                queue.extend(kept)
+        for bundle in stale:
+            release_bundle(bundle)
+
+        built = 0
+        for dialect, _ in DialectData.DIALECT_CHOICES:
+            while True:
+                with self._lock:
+                    if len(self._bundles.get(dialect, ())) >= pool_size():
+                        break
+                try:
+                    bundle = build_bundle(dialect)
+                except BundleError:
+                    break
+                with self._lock:
+                    self._bundles.setdefault(dialect, deque()).append((time.monotonic(), version, bundle))
+                built += 1
+        return built
+
+    def clear(self):
+        """
+        Empty the pool and release every pooled bundle.
+        """
+        with self._lock:
+            bundles = [entry[2] for queue in self._bundles.values() for entry in queue]
+            self._bundles = {}
+        for bundle in bundles:
+            release_bundle(bundle)
+
+    def _start(self):
+        if pool_size() <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='bundle-refiller', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(REFILL_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.refill()
+            except Exception:
+                logger.exception('Refilling session bundles failed')
+            finally:
+                # The refiller has its own connection; don't keep it open between passes
+                connection.close()
+
+
+bundle_pool = BundlePool()
@@ -0,0 +1,287 @@
+"""
+Streaming exports.
+
+Rows are read in chunks with .iterator() (or .aiterator() under ASGI) and
+encoded as NDJSON or CSV on the fly, so an export never holds a whole table in memory and the first
+bytes reach the client right away. Evaluation exports pull the item and
+submission columns they need through one joined .values() query.
+"""
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import DialectData, PlausibilityData, Submission, DialectEvaluation, PlausibilityEvaluation
+
+CHUNK_SIZE = 2000
+
+# Flush encoded output to the client once this many bytes are buffered
+FLUSH_SIZE = 64 * 1024
+
+EXPORTS = {
+    'dialect_data': (DialectData, (
+        'id', 'dialect_name', 'original_standard_text', 'ai_generated_dialect_text', 'created_at',
+    )),
+    'plausibility_data': (PlausibilityData, (
+        'id', 'question', 'correct_answer',
+        'wrong_option_1', 'wrong_option_2', 'wrong_option_3', 'created_at',
+    )),
+    'submissions': (Submission, (
+        'id', 'session_id', 'evaluator_name', 'evaluator_email', 'created_at',
+    )),
+    'dialect_evaluations': (DialectEvaluation, (
+        'id', 'dialect_data_id', 'dialect_data__dialect_name',
+        'submission_id', 'submission__session_id', 'submission__evaluator_name', 'submission__evaluator_email',
+        'accuracy_rating', 'naturalness_rating', 'comments', 'created_at',
+    )),
+    'plausibility_evaluations': (PlausibilityEvaluation, (
+        'id', 'plausibility_data_id',
+        'submission_id', 'submission__session_id', 'submission__evaluator_name', 'submission__evaluator_email',
+        'option_1_plausibility', 'option_2_plausibility', 'option_3_plausibility', 'comments', 'created_at',
+    )),
+}
+
+# Incremental exports leave out rows younger than this, so a transaction that
+# took an id earlier but commits later can never be skipped by a cursor.
+SETTLE_SECONDS = 5
+
+MAX_PAGE_SIZE = 10000
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def column_name(field):
+    """
+    Flatten a .values() lookup into an export column name (dialect_data__dialect_name -> dialect_name).
+    """
+    return field.rsplit('__', 1)[-1] if '__' in field else field
+
+
+def _export_queryset(export_type, queryset=None):
+    model, fields = EXPORTS[export_type]
+    if queryset is None:
+        queryset = model.objects.all()
+    return queryset.order_by('id'), fields
+
+
+def iter_rows(export_type, queryset=None):
+    """
+    Yield export rows of export_type as dicts keyed by column name, in id order.
+    """
+    queryset, fields = _export_queryset(export_type, queryset)
+    columns = [column_name(field) for field in fields]
+    for values in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(columns, values))
+
+
+async def aiter_rows(export_type, queryset=None):
+    """
+    Async version of iter_rows, for ASGI views.
+    """
+    queryset, fields = _export_queryset(export_type, queryset)
+    columns = [(field, column_name(field)) for field in fields]
+    # values() rather than values_list(): ValuesListIterable runs its query as
+    # soon as it is created, which aiterator() would do in the event loop.
+    async for values in queryset.values(*fields).aiterator(chunk_size=CHUNK_SIZE):
+        yield {column: values[field] for field, column in columns}
+
+
+class ChunkEncoder:
+    """
+    Encodes text pieces into byte chunks of about FLUSH_SIZE, optionally gzipped.
+    """
+
+    def __init__(self, compress=False):
+        self.buffer = []
+        self.size = 0
+        # wbits=31 writes a gzip header and trailer
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _emit(self, data):
+        return self.compressor.compress(data) if self.compressor else data
+
+    def write(self, piece):
+        """
+        Add a piece; returns the next chunk once enough is buffered, else b''.
+        """
+        data = piece.encode('utf-8')
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size < FLUSH_SIZE:
+            return b''
+        chunk = b''.join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        return self._emit(chunk)
+
+    def finish(self):
+        chunk = self._emit(b''.join(self.buffer))
+        self.buffer = []
+        if self.compressor:
+            chunk += self.compressor.flush()
+        return chunk
+
+
+def ndjson_line(row, table=None):
+    if table:
+        row = {'table': table, **row}
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def ndjson_lines(rows, table=None):
+    for row in rows:
+        yield ndjson_line(row, table)
+
+
+class CsvLine:
+    """
+    Formats one row of values as a CSV line.
+    """
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def __call__(self, values):
+        self.writer.writerow(values)
+        line = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line
+
+
+def csv_header(export_type):
+    _, fields = EXPORTS[export_type]
+    return [column_name(field) for field in fields]
+
+
+def csv_lines(rows, export_type):
+    encode = CsvLine()
+    yield encode(csv_header(export_type))
+    for row in rows:
+        yield encode(row.values())
+
+
+def _check_export(export_types, output_format):
+    if output_format == 'csv' and len(export_types) != 1:
+        raise ValueError('CSV exports hold a single table.')
+
+
+def _encode(lines, encoder):
+    for line in lines:
+        chunk = encoder.write(line)
+        if chunk:
+            yield chunk
+    yield encoder.finish()
+
+
+def stream_export(export_types, output_format, compress=False, querysets=None):
+    """
+    Return an iterator of encoded bytes for export_types in output_format.
+    With several export types (NDJSON only) each line carries a "table" key.
+    querysets optionally maps export types to pre-filtered querysets.
+    """
+    _check_export(export_types, output_format)
+    querysets = querysets or {}
+    if output_format == 'csv':
+        lines = csv_lines(iter_rows(export_types[0], querysets.get(export_types[0])), export_types[0])
+    else:
+        tag = len(export_types) > 1
+        lines = (
+            line
+            for export_type in export_types
+            for line in ndjson_lines(iter_rows(export_type, querysets.get(export_type)), export_type if tag else None)
+        )
+    return _encode(lines, ChunkEncoder(compress))
+
+
+async def _alines(export_types, output_format, querysets):
+    tag = len(export_types) > 1
+    encode_csv = CsvLine() if output_format == 'csv' else None
+    for export_type in export_types:
+        if encode_csv:
+            yield encode_csv(csv_header(export_type))
+        async for row in aiter_rows(export_type, querysets.get(export_type)):
+            yield encode_csv(row.values()) if encode_csv else ndjson_line(row, export_type if tag else None)
+
+
+async def astream_export(export_types, output_format, compress=False, querysets=None):
+    """
+    Async version of stream_export: rows are read with aiterator(), so a slow
+    download holds no worker thread while it waits on the client.
+    """
+    _check_export(export_types, output_format)
+    encoder = ChunkEncoder(compress)
+    async for line in _alines(export_types, output_format, querysets or {}):
+        chunk = encoder.write(line)
+        if chunk:
+            yield chunk
+    yield encoder.finish()
+
+
+class CursorError(ValueError):
+    """
+    Raised for a malformed cursor or one issued for a different export type.
+    """
+
+
+def encode_cursor(export_type, last_id):
+    """
+    Encode an opaque resume cursor: everything up to last_id has been delivered.
+    """
+    payload = json.dumps({'t': export_type, 'id': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, export_type):
+    """
+    Return the last delivered id stored in cursor (0 for an empty cursor).
+    """
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = int(payload['id'])
+        cursor_type = payload['t']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise CursorError('Invalid cursor.')
+    if cursor_type != export_type:
+        raise CursorError(f'Cursor was issued for {cursor_type}, not {export_type}.')
+    return last_id
+
+
+def incremental_page(export_type, since_id, limit):
+    """
+    Return (queryset, last_id, has_more) for the next keyset page after since_id.
+    The queryset is bounded by id so it can be streamed after the cursor is known.
+    """
+    model, _ = EXPORTS[export_type]
+    queryset = model.objects.filter(id__gt=since_id).order_by('id')
+    cutoff = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    # Filter on created_at alone so only the few rows inside the settle window are read, via its index
+    first_unsettled = model.objects.filter(created_at__gt=cutoff).aggregate(
+        first=Min('id', filter=Q(id__gt=since_id))
+    )['first']
+    if first_unsettled is not None:
+        queryset = queryset.filter(id__lt=first_unsettled)
+
+    # Read only the ids around the page boundary instead of the whole page
+    boundary = list(queryset.values_list('id', flat=True)[limit - 1:limit + 1])
+    if boundary:
+        last_id = boundary[0]
+        has_more = len(boundary) > 1
+    else:
+        last_id = queryset.values_list('id', flat=True).last() or since_id
+        has_more = False
+    return queryset.filter(id__lte=last_id), last_id, has_more
@@ -0,0 +1,255 @@
+"""
+Bulk dataset import.
+
+Records are streamed from JSONL or CSV, validated, and written in batches.
+Each batch is deduplicated against itself and against the database with a
+single content_hash IN query, then written with one bulk_create, so loading
+tens of thousands of items costs a few queries per thousand rows instead of
+one full-text get_or_create per row. Hashes are taken over NFC-normalized,
+whitespace-collapsed text, and the unique index on content_hash lets
+ignore_conflicts drop rows that a concurrent import inserted first.
+
+Rows that are not exact duplicates but nearly duplicate a stored item (or an
+earlier row) are found through the MinHash index in near_duplicates.py and
+flagged, or with near_duplicate_mode='skip' left out.
+"""
+import csv
+import json
+import sys
+import time
+import unicodedata
+
+from django.db import transaction
+
+from . import near_duplicates, search
+from .models import DialectData, PlausibilityData
+from .versioning import ITEMS, bump_version
+from .write_lock import locked_write
+
+DEFAULT_BATCH_SIZE = 1000
+
+NEAR_DUPLICATE_MODES = ('flag', 'skip', 'off')
+
+KINDS = {
+    'dialect': DialectData,
+    'plausibility': PlausibilityData,
+}
+
+# Alternative column names accepted in input files (as used by load_sample_data.py)
+ALIASES = {
+    'dialect': 'dialect_name',
+    'original': 'original_standard_text',
+    'generated': 'ai_generated_dialect_text',
+    'correct': 'correct_answer',
+    'wrong_1': 'wrong_option_1',
+    'wrong_2': 'wrong_option_2',
+    'wrong_3': 'wrong_option_3',
+}
+
+
+class ImportStats:
+    """
+    Running counters for one import.
+    """
+
+    def __init__(self):
+        self.read = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.skipped = 0
+        self.errors = []
+        # (line_number, what it nearly duplicates, similarity)
+        self.near_duplicates = []
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"read={self.read} created={self.created} duplicates={self.duplicates} "
+            f"near_duplicates={len(self.near_duplicates)} invalid={self.invalid} ({self.rate:,.0f} rows/s)"
+        )
+
+
+def read_records(stream, fmt):
+    """
+    Yield (line_number, record) pairs from a JSONL or CSV text stream.
+    """
+    if fmt == 'csv':
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def clean_record(model, record):
+    """
+    Map aliases, NFC-normalize and strip text and check required fields. Returns a dict of field values.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(str(record) if isinstance(record, Exception) else 'record must be an object')
+    values = {}
+    for key, value in record.items():
+        field = ALIASES.get(key, key)
+        if field in model.HASH_FIELDS and value is not None:
+            values[field] = unicodedata.normalize('NFC', str(value)).strip()
+    missing = [field for field in model.HASH_FIELDS if not values.get(field)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    if model is DialectData:
+        values['dialect_name'] = values['dialect_name'].lower()
+        if values['dialect_name'] not in dict(DialectData.DIALECT_CHOICES):
+            raise ValueError(f"unknown dialect {values['dialect_name']!r}")
+    return values
+
+
+def _check_near_duplicates(kind, rows, stats, skip):
+    """
+    Record rows ((line_number, digest, values) tuples) that nearly duplicate a stored item or an
+    earlier row of the batch, and with skip, drop them. Returns the rows to write and their
+    MinHash signatures.
+    """
+    index = near_duplicates.INDEXES[kind]
+    threshold = near_duplicates.default_threshold()
+    records = [values for _, _, values in rows]
+    sigs = index.signatures(records)
+    partitions = index.partitions(records)
+    stored = index.matches(sigs, partitions, threshold)
+    earlier = near_duplicates.earlier_matches(sigs, threshold, partitions)
+    keep = []
+    for row, (line_number, _, _) in enumerate(rows):
+        match = None
+        if stored[row]:
+            item_id, score = stored[row][0]
+            match = (f"item #{item_id}", score)
+        elif earlier[row] and earlier[row][0] in keep:
+            other, score = earlier[row]
+            match = (f"line {rows[other][0]}", score)
+        if match:
+            stats.near_duplicates.append((line_number, *match))
+        if not (match and skip):
+            keep.append(row)
+    return [rows[row] for row in keep], sigs[keep]
+
+
+def _write_batch(kind, batch, stats, dry_run, near_duplicate_mode):
+    """
+    Drop rows already in the database (one IN query) and, depending on near_duplicate_mode,
+    flag or drop near-duplicates. Bulk insert the rest and index them for search and near-duplicates.
+    """
+    model = KINDS[kind]
+    existing = set(
+        model.objects.filter(content_hash__in=list(batch)).values_list('content_hash', flat=True)
+    )
+    rows = [(line_number, digest, values) for digest, (line_number, values) in batch.items() if digest not in existing]
+    stats.duplicates += len(batch) - len(rows)
+    sigs = None
+    if near_duplicate_mode != 'off' and rows:
+        before = len(rows)
+        rows, sigs = _check_near_duplicates(kind, rows, stats, skip=near_duplicate_mode == 'skip')
+        stats.skipped += before - len(rows)
+    new = [model(content_hash=digest, **values) for _, digest, values in rows]
+    if dry_run or not new:
+        stats.created += len(new)
+        return
+    written, taken = _insert_batch(kind, new, sigs)
+    stats.duplicates += taken
+    stats.created += written
+
+
+@locked_write
+def _insert_batch(kind, new, sigs):
+    """
+    Insert unsaved items (with their MinHash signatures, or None) in one transaction under the
+    write lock, and index them. Returns (written, taken): how many were inserted and how many a
+    concurrent import had inserted first.
+    """
+    model = KINDS[kind]
+    # A retried attempt must not reuse ids read back by the rolled-back one
+    for obj in new:
+        obj.pk = None
+    with transaction.atomic():
+        # Rows a concurrent import wrote since the check above: ignore_conflicts would
+        # skip them silently, and reading the ids back would mistake them for ours
+        taken = set(
+            model.objects.filter(content_hash__in=[obj.content_hash for obj in new]).values_list('content_hash', flat=True)
+        )
+        if taken:
+            keep = [row for row, obj in enumerate(new) if obj.content_hash not in taken]
+            new = [new[row] for row in keep]
+            sigs = None if sigs is None else sigs[keep]
+        model.objects.bulk_create(new, ignore_conflicts=True)
+        # ignore_conflicts leaves the ids unset; read them back for the search and near-duplicate indexes
+        ids = dict(
+            model.objects.filter(content_hash__in=[obj.content_hash for obj in new]).values_list('content_hash', 'id')
+        )
+        for obj in new:
+            obj.pk = ids.get(obj.content_hash)
+        search.index(kind, [obj for obj in new if obj.pk], created=True)
+        written = [row for row, obj in enumerate(new) if obj.pk]
+        index = near_duplicates.INDEXES[kind]
+        if sigs is None:
+            index.add_items([new[row] for row in written], created=True)
+        else:
+            rows = [new[row].__dict__ for row in written]
+            index.add([new[row].pk for row in written], sigs[written], index.partitions(rows), created=True)
+    return len(written), len(taken)
+
+
+def import_records(kind, records, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None,
+                   near_duplicate_mode='flag'):
+    """
+    Import (line_number, record) pairs of the given kind. Returns ImportStats.
+    progress, if given, is called with the stats after every batch.
+    near_duplicate_mode is one of NEAR_DUPLICATE_MODES: 'flag' imports near-duplicates of stored
+    items (or of earlier rows) and lists them in stats.near_duplicates, 'skip' also leaves them out.
+    """
+    model = KINDS[kind]
+    stats = ImportStats()
+    batch = {}
+    for line_number, record in records:
+        stats.read += 1
+        try:
+            values = clean_record(model, record)
+        except ValueError as e:
+            stats.invalid += 1
+            stats.errors.append((line_number, str(e)))
+            continue
+        digest = model.hash_values(values)
+        if digest in batch:
+            stats.duplicates += 1
+            continue
+        batch[digest] = (line_number, values)
+        if len(batch) >= batch_size:
+            _write_batch(kind, batch, stats, dry_run, near_duplicate_mode)
+            batch = {}
+            if progress:
+                progress(stats)
+    if batch:
+        _write_batch(kind, batch, stats, dry_run, near_duplicate_mode)
+        if progress:
+            progress(stats)
+    if stats.created and not dry_run:
+        # bulk_create sends no post_save signals, so invalidate item pools here
+        bump_version(ITEMS)
+    return stats
+
+
+def open_input(path, encoding='utf-8'):
+    if path == '-':
+        return sys.stdin
+    return open(path, newline='', encoding=encoding)
@@ -0,0 +1,84 @@
+"""
+Process-level pools of evaluation item ids.
+
+Instead of loading whole tables to pick 10 rows, each pool keeps a compact
+array of primary keys per group (e.g. per dialect), samples ids from it in
+O(k) and fetches only the chosen rows. Pools are rebuilt lazily when the
+ITEMS version stamp changes.
+"""
+import random
+import threading
+from array import array
+
+from .models import DialectData, PlausibilityData
+from .versioning import ITEMS, get_version
+
+DIALECT_FIELDS = ('id', 'original_standard_text', 'ai_generated_dialect_text')
+PLAUSIBILITY_FIELDS = (
+    'id', 'question', 'correct_answer',
+    'wrong_option_1', 'wrong_option_2', 'wrong_option_3',
+)
+
+
+class ItemPool:
+    """
+    Sampling pool over one item model, optionally partitioned by a field.
+    """
+
+    def __init__(self, model, fields, group_field=None):
+        self.model = model
+        self.fields = fields
+        self.group_field = group_field
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = {}
+
+    def ids(self, group=None):
+        """
+        Return the id array for group, reloading it if the data changed.
+        """
+        version = get_version(ITEMS)
+        with self._lock:
+            if version != self._version:
+                self._ids = {}
+                self._version = version
+            ids = self._ids.get(group)
+        if ids is None:
+            ids = self._load(group)
+            with self._lock:
+                if self._version == version:
+                    self._ids[group] = ids
+        return ids
+
+    def _load(self, group):
+        queryset = self.model.objects.order_by()
+        if self.group_field:
+            queryset = queryset.filter(**{self.group_field: group})
+        return array('q', queryset.values_list('id', flat=True).iterator(chunk_size=10000))
+
+    def fetch(self, ids):
+        """
+        Fetch the rows for ids, preserving the given order.
+        """
+        rows = {
+            row['id']: row
+            for row in self.model.objects.filter(id__in=ids).order_by().values(*self.fields)
+        }
+        return [rows[pk] for pk in ids if pk in rows]
+
+    def sample(self, k, group=None):
+        """
+        Return up to k random rows from group.
+        """
+        ids = self.ids(group)
+        chosen = [ids[i] for i in random.sample(range(len(ids)), min(k, len(ids)))]
+        return self.fetch(chosen)
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+            self._version = None
+
+
+dialect_pool = ItemPool(DialectData, DIALECT_FIELDS, group_field='dialect_name')
+plausibility_pool = ItemPool(PlausibilityData, PLAUSIBILITY_FIELDS)
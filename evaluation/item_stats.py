@@ -0,0 +1,147 @@
+"""
+Incrementally maintained per-item rating statistics.
+
+Each item has one stats row with count, sum and sum of squares for every
+rating column. The submit transaction adds the new ratings to these rows,
+so means and variances are O(1) reads and the admin can sort by them
+without aggregating over the evaluation tables.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, NullIf
+
+from .models import DialectDataStats, PlausibilityDataStats, DialectEvaluation, PlausibilityEvaluation
+
+BATCH_SIZE = 1000
+
+
+class StatsSpec:
+    """
+    Describes how one evaluation model feeds one stats model.
+    """
+
+    def __init__(self, stats_model, evaluation_model, item_field, columns):
+        self.stats_model = stats_model
+        self.evaluation_model = evaluation_model
+        self.item_field = item_field
+        self.item_id_field = f'{item_field}_id'
+        # stats field prefix -> evaluation rating column
+        self.columns = columns
+
+    def _deltas(self, rows):
+        """
+        Sum count, sum and sum of squares per item over rows (dicts of evaluation values).
+        """
+        deltas = {}
+        for row in rows:
+            delta = deltas.setdefault(row[self.item_id_field], dict.fromkeys(self._fields(), 0))
+            delta['rating_count'] += 1
+            for prefix, column in self.columns.items():
+                value = row[column]
+                delta[f'{prefix}_sum'] += value
+                delta[f'{prefix}_sum_sq'] += value * value
+        return deltas
+
+    def _fields(self):
+        fields = ['rating_count']
+        for prefix in self.columns:
+            fields += [f'{prefix}_sum', f'{prefix}_sum_sq']
+        return fields
+
+    def apply(self, rows, sign=1):
+        """
+        Add (or with sign=-1, remove) the ratings in rows. Call inside the writing transaction.
+        """
+        deltas = self._deltas(rows)
+        if not deltas:
+            return
+        if sign > 0:
+            self.stats_model.objects.bulk_create(
+                [self.stats_model(**{self.item_id_field: pk}) for pk in deltas],
+                ignore_conflicts=True,
+            )
+        for pk, delta in deltas.items():
+            self.stats_model.objects.filter(pk=pk).update(**{
+                field: F(field) + sign * value for field, value in delta.items() if value
+            })
+
+    def row(self, evaluation):
+        """
+        The item id and ratings of an evaluation instance, as apply() takes them.
+        """
+        row = {self.item_id_field: getattr(evaluation, self.item_id_field)}
+        for column in self.columns.values():
+            row[column] = getattr(evaluation, column)
+        return row
+
+    def stored_row(self, pk):
+        """
+        The item id and ratings an evaluation has in the database, or None if it isn't saved.
+        """
+        return self.evaluation_model.objects.filter(pk=pk).values(self.item_id_field, *self.columns.values()).first()
+
+    def remove_instance(self, evaluation):
+        """
+        Take a deleted evaluation's ratings back out of its item's stats.
+        """
+        self.apply([self.row(evaluation)], sign=-1)
+
+    def replace_instance(self, old_row, evaluation):
+        """
+        Account for a saved evaluation whose stored ratings or item were old_row
+        (None for a new one): take the old contribution out and add the new one.
+        """
+        new_row = self.row(evaluation)
+        if old_row == new_row:
+            return
+        if old_row is not None:
+            self.apply([old_row], sign=-1)
+        self.apply([new_row])
+
+    def tracked_fields(self):
+        return {self.item_field, self.item_id_field, *self.columns.values()}
+
+    def rebuild(self):
+        """
+        Recompute every stats row from the evaluation table.
+        """
+        aggregates = {'rating_count': Count('id')}
+        for prefix, column in self.columns.items():
+            aggregates[f'{prefix}_sum'] = Sum(column)
+            aggregates[f'{prefix}_sum_sq'] = Sum(F(column) * F(column))
+        rows = (
+            self.evaluation_model.objects.order_by()
+            .values(self.item_id_field)
+            .annotate(**aggregates)
+        )
+        with transaction.atomic():
+            self.stats_model.objects.all().delete()
+            batch = []
+            count = 0
+            for row in rows.iterator():
+                batch.append(self.stats_model(**row))
+                if len(batch) >= BATCH_SIZE:
+                    self.stats_model.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            self.stats_model.objects.bulk_create(batch)
+            count += len(batch)
+        return count
+
+
+dialect_stats = StatsSpec(DialectDataStats, DialectEvaluation, 'dialect_data', {
+    'accuracy': 'accuracy_rating',
+    'naturalness': 'naturalness_rating',
+})
+plausibility_stats = StatsSpec(PlausibilityDataStats, PlausibilityEvaluation, 'plausibility_data', {
+    'option_1': 'option_1_plausibility',
+    'option_2': 'option_2_plausibility',
+    'option_3': 'option_3_plausibility',
+})
+
+
+def mean_expression(prefix, relation='stats'):
+    """
+    ORM expression for the mean of a stats field, usable for admin ordering.
+    """
+    return Cast(F(f'{relation}__{prefix}_sum'), FloatField()) / NullIf(F(f'{relation}__rating_count'), 0)
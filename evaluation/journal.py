@@ -0,0 +1,297 @@
+"""
+Write-behind submission journal.
+
+With EVALUATION_WRITE_BEHIND on, submit_evaluation validates a submission,
+appends it to a small WAL-mode SQLite file next to the database and answers
+right away. A background flusher in each process drains the journal into
+the main database in batches, one transaction per batch, so a burst of
+submissions turns into a few large writes instead of hundreds of competing
+ones.
+
+Durability and ordering:
+- An entry is committed to the journal (synchronous=FULL) before the
+  evaluator gets a response.
+- Flushers claim entries before writing them; a claim that is not settled
+  within CLAIM_TIMEOUT (the process died mid-flush) is picked up again, and
+  flush_journal replays everything that is left.
+- Replays are safe: Submission.session_id is unique, so an entry that was
+  already written is recognised and dropped instead of stored twice.
+- Email, session id and idempotency key are unique among the journal's
+  live entries, so a second submission from the same email is rejected even
+  while the first is still queued, and a retried post is answered with the
+  queued entry's session id. Entries that failed to write don't count: the
+  evaluator can submit again.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Submission
+from .submission import (
+    DUPLICATE_EMAIL_ERROR, DUPLICATE_SESSION_ERROR, AlreadySubmitted, SubmissionError, check_items,
+    email_already_submitted, replayed_session, save_submissions,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+# Seconds the flusher waits for more submissions before draining the journal.
+FLUSH_INTERVAL = 1.0
+
+# Claimed entries not settled within this many seconds are flushed again.
+CLAIM_TIMEOUT = 60
+
+STATUS_PENDING = 'pending'
+STATUS_FAILED = 'failed'
+
+TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    email TEXT,
+    idempotency_key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL
+)
+"""
+
+COLUMNS = 'id, session_id, email, idempotency_key, payload, status, error, created_at, claimed_at'
+
+# Partial indexes: a failed entry keeps its keys for the record but doesn't
+# block a new submission with them
+INDEXES = """
+CREATE INDEX IF NOT EXISTS journal_status_idx ON journal (status, claimed_at);
+CREATE UNIQUE INDEX IF NOT EXISTS journal_session_idx ON journal (session_id) WHERE status != 'failed';
+CREATE UNIQUE INDEX IF NOT EXISTS journal_email_idx ON journal (email) WHERE status != 'failed';
+CREATE UNIQUE INDEX IF NOT EXISTS journal_key_idx ON journal (idempotency_key) WHERE status != 'failed';
+"""
+
+
+def write_behind_enabled():
+    return getattr(settings, 'EVALUATION_WRITE_BEHIND', False)
+
+
+def journal_path():
+    return str(getattr(settings, 'EVALUATION_JOURNAL_PATH', settings.BASE_DIR / 'var' / 'submission_journal.sqlite3'))
+
+
+class Journal:
+    """
+    Append-only queue of validated submissions in a separate SQLite file.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path or journal_path()
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'path', None) != self.path:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # isolation_level=None: transactions are opened explicitly below
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=FULL')
+            db.execute(TABLE.format(name='journal'))
+            self._upgrade(db)
+            db.executescript(INDEXES)
+            self._local.db = db
+            self._local.path = self.path
+        return db
+
+    def _upgrade(self, db):
+        """
+        Rebuild a journal created with table-wide UNIQUE columns, which SQLite can't drop in place.
+        """
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            sql, = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'journal'").fetchone()
+            if 'UNIQUE' in sql:
+                columns = {row[1] for row in db.execute('PRAGMA table_info(journal)')}
+                if 'idempotency_key' not in columns:
+                    db.execute('ALTER TABLE journal ADD COLUMN idempotency_key TEXT')
+                db.execute(TABLE.format(name='journal_upgrade'))
+                db.execute(f'INSERT INTO journal_upgrade ({COLUMNS}) SELECT {COLUMNS} FROM journal')
+                db.execute('DROP TABLE journal')
+                db.execute('ALTER TABLE journal_upgrade RENAME TO journal')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def append(self, cleaned):
+        """
+        Durably queue a validated submission. Raises AlreadySubmitted for a
+        known idempotency key and SubmissionError for a duplicate email or
+        session, or for unknown items.
+        """
+        check_items(cleaned)
+        db = self._connect()
+        try:
+            cursor = db.execute(
+                'INSERT INTO journal (session_id, email, idempotency_key, payload, created_at) VALUES (?, ?, ?, ?, ?)',
+                (cleaned['session_id'], cleaned['evaluator_email'], cleaned['idempotency_key'], json.dumps(cleaned),
+                 time.time()),
+            )
+        except sqlite3.IntegrityError as e:
+            session_id = self.queued_session(cleaned['idempotency_key'])
+            if session_id:
+                raise AlreadySubmitted(session_id)
+            raise SubmissionError(DUPLICATE_EMAIL_ERROR if 'email' in str(e) else DUPLICATE_SESSION_ERROR)
+        # Checked after the insert: a flusher commits to the database before it
+        # deletes the journal row, so one of the two checks always sees it.
+        duplicate = None
+        session_id = replayed_session(cleaned['idempotency_key'])
+        if session_id:
+            duplicate = AlreadySubmitted(session_id)
+        elif cleaned['evaluator_email'] and email_already_submitted(cleaned['evaluator_email']):
+            duplicate = SubmissionError(DUPLICATE_EMAIL_ERROR)
+        elif Submission.objects.filter(session_id=cleaned['session_id']).exists():
+            duplicate = SubmissionError(DUPLICATE_SESSION_ERROR)
+        if duplicate:
+            db.execute('DELETE FROM journal WHERE id = ?', (cursor.lastrowid,))
+            raise duplicate
+        self._start()
+        self._wakeup.set()
+        return cleaned['session_id']
+
+    def queued_session(self, idempotency_key):
+        """
+        Session id of the journal entry queued under idempotency_key, or None.
+        """
+        if not idempotency_key:
+            return None
+        row = self._connect().execute(
+            'SELECT session_id FROM journal WHERE idempotency_key = ? AND status != ?', (idempotency_key, STATUS_FAILED)
+        ).fetchone()
+        return row[0] if row else None
+
+    def replayed_session(self, idempotency_key):
+        """
+        Session id of the submission sent with idempotency_key, whether it is
+        still queued or already written, or None.
+        """
+        return self.queued_session(idempotency_key) or replayed_session(idempotency_key)
+
+    def _claim(self, limit):
+        db = self._connect()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = db.execute(
+                'SELECT id, session_id, payload FROM journal '
+                'WHERE status = ? AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?',
+                (STATUS_PENDING, now - CLAIM_TIMEOUT, limit),
+            ).fetchall()
+            db.executemany('UPDATE journal SET claimed_at = ? WHERE id = ?', [(now, row[0]) for row in rows])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return rows
+
+    def flush(self, batch_size=BATCH_SIZE, max_batches=None):
+        """
+        Write claimed journal entries to the database, one transaction per batch.
+        Returns (written, failed).
+        """
+        written = failed = batches = 0
+        while max_batches is None or batches < max_batches:
+            rows = self._claim(batch_size)
+            if not rows:
+                break
+            batches += 1
+            session_ids = [session_id for _, session_id, _ in rows]
+            # Entries whose earlier flush committed before the process died
+            done = set(Submission.objects.filter(session_id__in=session_ids).values_list('session_id', flat=True))
+            todo = [row for row in rows if row[1] not in done]
+            errors = save_submissions([json.loads(payload) for _, _, payload in todo])
+
+            db = self._connect()
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany('DELETE FROM journal WHERE id = ?', [(row[0],) for row in rows if row[1] in done])
+            for (entry_id, _, _), error in zip(todo, errors):
+                # AlreadySubmitted: the key's submission reached the database another way
+                if error is None or isinstance(error, AlreadySubmitted):
+                    db.execute('DELETE FROM journal WHERE id = ?', (entry_id,))
+                    written += 1
+                else:
+                    db.execute(
+                        'UPDATE journal SET status = ?, error = ? WHERE id = ?', (STATUS_FAILED, str(error), entry_id)
+                    )
+                    logger.error('Journal entry %s could not be written: %s', entry_id, error)
+                    failed += 1
+            db.execute('COMMIT')
+        return written, failed
+
+    def counts(self):
+        """
+        Number of journal entries per status.
+        """
+        return dict(self._connect().execute('SELECT status, COUNT(*) FROM journal GROUP BY status').fetchall())
+
+    def failed_entries(self):
+        return self._connect().execute(
+            'SELECT id, session_id, email, error FROM journal WHERE status = ? ORDER BY id', (STATUS_FAILED,)
+        ).fetchall()
+
+    def requeue_failed(self):
+        """
+        Mark failed entries pending again. Returns how many were requeued; entries whose
+        email, session or key has been queued again since stay failed.
+        """
+        cursor = self._connect().execute(
+            'UPDATE OR IGNORE journal SET status = ?, error = NULL, claimed_at = NULL WHERE status = ?',
+            (STATUS_PENDING, STATUS_FAILED),
+        )
+        return cursor.rowcount
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='journal-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            # Let a burst collect into one batch
+            time.sleep(FLUSH_INTERVAL / 10)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing the submission journal failed')
+            finally:
+                connection.close()
+
+
+journal = Journal()
+
+
+def start_replay():
+    """
+    Start the flusher so entries left by a crashed process are written without
+    waiting for the next submission.
+    """
+    if write_behind_enabled() and os.path.exists(journal_path()):
+        journal._start()
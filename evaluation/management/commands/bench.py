@@ -0,0 +1,349 @@
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+PERCENTILES = (50, 95, 99)
+SERVER_START_TIMEOUT = 60
+PREFILL_BATCH = 500
+RATINGS_PER_SUBMISSION = 10
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """
+    Thread-safe latency and error collection per endpoint.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            if ok:
+                self.latencies.setdefault(endpoint, []).append(seconds)
+            else:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        results = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(endpoint, []))
+            results[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors.get(endpoint, 0),
+                'throughput': len(values) / elapsed if elapsed else 0.0,
+                'mean_ms': sum(values) / len(values) * 1000 if values else None,
+                **{f'p{p}_ms': percentile(values, p) * 1000 if values else None for p in PERCENTILES},
+            }
+        return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the evaluation flow: seed a scratch database, start a local server and run "
+        "concurrent evaluators through home -> fetch -> submit, reporting latency per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=50, help="Items per dialect (and MCQ items) to seed.")
+        parser.add_argument('--evaluations', type=int, default=0,
+                            help="Existing evaluations to prefill, e.g. 1000, 100000 or 1000000.")
+        parser.add_argument('--evaluators', type=int, default=20, help="Concurrent evaluators.")
+        parser.add_argument('--sessions', type=int, default=200, help="Evaluation sessions to run in total.")
+        parser.add_argument('--flow', choices=['bundle', 'legacy'], default='bundle',
+                            help="bundle: one session-bundle request; legacy: separate item requests.")
+        parser.add_argument('--port', type=int, help="Server port (default: a free port).")
+        parser.add_argument('--server-env', action='append', default=[], metavar='NAME=VALUE',
+                            help="Extra environment for the server, e.g. BANGLAVERSE_SQLITE_PROFILE=production.")
+        parser.add_argument('--label', default='', help="Label stored with the baseline.")
+        parser.add_argument('--save', metavar='PATH', help="Write the results as a JSON baseline.")
+        parser.add_argument('--compare', metavar='PATH', help="Compare the results with a saved baseline.")
+        # Internal mode used by the setup subprocess
+        parser.add_argument('--setup', action='store_true', help="(internal) migrate and seed the database.")
+
+    def handle(self, *args, **options):
+        if options['setup']:
+            return self.setup(options['items'], options['evaluations'])
+
+        extra_env = {}
+        for pair in options['server_env']:
+            name, sep, value = pair.partition('=')
+            if not sep:
+                raise CommandError(f"--server-env expects NAME=VALUE, got {pair!r}")
+            extra_env[name] = value
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'BANGLAVERSE_DB_PATH': os.path.join(directory, 'bench.sqlite3'),
+                'BANGLAVERSE_JOURNAL_PATH': os.path.join(directory, 'journal.sqlite3'),
+                # The load generator is one client and would be throttled at once
+                'BANGLAVERSE_RATE_LIMIT': '0',
+                'BANGLAVERSE_RATE_LIMIT_PATH': os.path.join(directory, 'rate_limits.sqlite3'),
+                # Nothing the benchmark server writes may land in, or be read from, the real var/
+                'BANGLAVERSE_METRICS_PATH': os.path.join(directory, 'metrics.sqlite3'),
+                'BANGLAVERSE_SNAPSHOT_DIR': os.path.join(directory, 'snapshots'),
+                'BANGLAVERSE_WRITE_LOCK_PATH': os.path.join(directory, 'sqlite-write.lock'),
+                'BANGLAVERSE_CACHE_DIR': os.path.join(directory, 'cache'),
+                **extra_env,
+            }
+            self.stdout.write(f"Seeding {options['items']} items per dialect and {options['evaluations']} evaluations...")
+            subprocess.run(self._manage('bench', '--setup', '--items', str(options['items']),
+                                        '--evaluations', str(options['evaluations'])), env=env, check=True)
+
+            port = options['port'] or self._free_port()
+            server = subprocess.Popen(
+                self._manage('runserver', f'127.0.0.1:{port}', '--noreload'),
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                self._wait_for(base_url)
+                results = self.run_load(base_url, options)
+            finally:
+                server.terminate()
+                server.wait()
+
+        baseline = {
+            'label': options['label'],
+            'created': datetime.now(timezone.utc).isoformat(),
+            'commit': self._commit(),
+            'params': {
+                key: options[key] for key in ('items', 'evaluations', 'evaluators', 'sessions', 'flow')
+            } | {'server_env': extra_env, 'debug': settings.DEBUG},
+            **results,
+        }
+        self.report(baseline)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                self.compare(json.load(f), baseline)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as f:
+                json.dump(baseline, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['save']}"))
+
+    # Server
+
+    def _manage(self, *args):
+        return [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args]
+
+    @staticmethod
+    def _free_port():
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def _wait_for(self, base_url):
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(base_url + '/thank-you/', timeout=1).read()
+                return
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.2)
+        raise CommandError(f"Server did not start within {SERVER_START_TIMEOUT}s.")
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    # Seeding
+
+    def setup(self, items, evaluations):
+        from evaluation import importers
+        from evaluation.models import DialectData
+
+        call_command('migrate', verbosity=0)
+        for dialect, _ in DialectData.DIALECT_CHOICES:
+            importers.import_records('dialect', enumerate(
+                {'dialect': dialect, 'original': f'{dialect} original {n}', 'generated': f'{dialect} generated {n}'}
+                for n in range(items)
+            ))
+        importers.import_records('plausibility', enumerate(
+            {'question': f'question {n}', 'correct': 'a', 'wrong_1': 'b', 'wrong_2': 'c', 'wrong_3': 'd'}
+            for n in range(items)
+        ))
+        if evaluations:
+            self.prefill(evaluations)
+
+    def prefill(self, evaluations):
+        """
+        Bulk insert past submissions so the evaluation tables hold about `evaluations` rows,
+        half dialect and half MCQ ratings, then bring stats and coverage counters in line.
+        """
+        from django.db import transaction
+        from django.db.models import Count, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+
+        from evaluation.item_stats import dialect_stats, plausibility_stats
+        from evaluation.models import (
+            DialectData, DialectEvaluation, PlausibilityData, PlausibilityEvaluation, Submission,
+        )
+
+        dialect_ids = list(DialectData.objects.values_list('id', flat=True))
+        plausibility_ids = list(PlausibilityData.objects.values_list('id', flat=True))
+        per_submission = 2 * RATINGS_PER_SUBMISSION
+        submissions = max(evaluations // per_submission, 1)
+        for start in range(0, submissions, PREFILL_BATCH):
+            with transaction.atomic():
+                created = Submission.objects.bulk_create([
+                    Submission(session_id=str(uuid.uuid4()), evaluator_email=f'prefill-{n}@example.com')
+                    for n in range(start, min(start + PREFILL_BATCH, submissions))
+                ])
+                DialectEvaluation.objects.bulk_create([
+                    DialectEvaluation(submission=submission, dialect_data_id=pk,
+                                      accuracy_rating=random.randint(1, 5), naturalness_rating=random.randint(1, 5))
+                    for submission in created
+                    for pk in random.sample(dialect_ids, min(RATINGS_PER_SUBMISSION, len(dialect_ids)))
+                ], batch_size=PREFILL_BATCH)
+                PlausibilityEvaluation.objects.bulk_create([
+                    PlausibilityEvaluation(submission=submission, plausibility_data_id=pk,
+                                           option_1_plausibility=random.randint(1, 5),
+                                           option_2_plausibility=random.randint(1, 5),
+                                           option_3_plausibility=random.randint(1, 5))
+                    for submission in created
+                    for pk in random.sample(plausibility_ids, min(RATINGS_PER_SUBMISSION, len(plausibility_ids)))
+                ], batch_size=PREFILL_BATCH)
+
+        dialect_stats.rebuild()
+        plausibility_stats.rebuild()
+        for model, evaluation_model, field in (
+            (DialectData, DialectEvaluation, 'dialect_data'),
+            (PlausibilityData, PlausibilityEvaluation, 'plausibility_data'),
+        ):
+            ratings = Subquery(
+                evaluation_model.objects.filter(**{field: OuterRef('pk')}).order_by()
+                .values(field).annotate(n=Count('id')).values('n')
+            )
+            model.objects.update(completed_count=Coalesce(ratings, 0), assigned_count=Coalesce(ratings, 0))
+
+    # Load
+
+    def run_load(self, base_url, options):
+        from evaluation.models import DialectData
+
+        dialects = [code for code, _ in DialectData.DIALECT_CHOICES]
+        recorder = Recorder()
+        run_id = uuid.uuid4().hex[:8]
+
+        def call(endpoint, url, body=None):
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(base_url + url, data=data, headers={'Content-Type': 'application/json'})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    content = response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                content, ok = None, False
+            recorder.record(endpoint, time.perf_counter() - started, ok)
+            return content
+
+        def session(n):
+            dialect = random.choice(dialects)
+            call('home', '/')
+            if options['flow'] == 'bundle':
+                content = call('session_bundle', f'/api/session-bundle/?dialect={dialect}')
+                if content is None:
+                    return
+                bundle = json.loads(content)
+                session_id, dialect_items, plausibility_items = (
+                    bundle['session_id'], bundle['dialect_data'], bundle['plausibility_data'],
+                )
+            else:
+                session_id = str(uuid.uuid4())
+                dialect_content = call('get_dialect_data', f'/api/get-dialect-data/?dialect={dialect}&session_id={session_id}')
+                plausibility_content = call('get_plausibility_data', f'/api/get-plausibility-data/?session_id={session_id}')
+                if dialect_content is None or plausibility_content is None:
+                    return
+                dialect_items = json.loads(dialect_content)['data']
+                plausibility_items = json.loads(plausibility_content)['data']
+            call('submit_evaluation', '/api/submit-evaluation/', {
+                'session_id': session_id,
+                'evaluator_name': f'Bench {n}',
+                'evaluator_email': f'bench-{run_id}-{n}@example.com',
+                'dialect_evaluations': [
+                    {'dialect_data_id': item['id'], 'accuracy_rating': random.randint(1, 5),
+                     'naturalness_rating': random.randint(1, 5)}
+                    for item in dialect_items
+                ],
+                'plausibility_evaluations': [
+                    {'plausibility_data_id': item['id'], 'option_1_plausibility': random.randint(1, 5),
+                     'option_2_plausibility': random.randint(1, 5), 'option_3_plausibility': random.randint(1, 5)}
+                    for item in plausibility_items
+                ],
+            })
+
+        self.stdout.write(f"Running {options['sessions']} sessions with {options['evaluators']} concurrent evaluators...")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['evaluators']) as pool:
+            list(pool.map(session, range(options['sessions'])))
+        elapsed = time.perf_counter() - started
+        return {
+            'elapsed': elapsed,
+            'sessions_per_second': options['sessions'] / elapsed,
+            'endpoints': recorder.summary(elapsed),
+        }
+
+    # Output
+
+    def _format(self, value):
+        return f'{value:8.1f}' if value is not None else '       -'
+
+    def report(self, baseline):
+        self.stdout.write(
+            f"\n{'endpoint':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for endpoint, row in baseline['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<24}{row['requests']:>9}{row['errors']:>8}{row['throughput']:>9.1f}"
+                f"{self._format(row['p50_ms'])} {self._format(row['p95_ms'])} {self._format(row['p99_ms'])}"
+            )
+        self.stdout.write(f"\n{baseline['sessions_per_second']:.1f} sessions/s over {baseline['elapsed']:.1f}s")
+
+    def compare(self, old, new):
+        self.stdout.write(f"\nCompared with {old.get('label') or 'baseline'} ({old.get('commit') or 'unknown commit'}):")
+        if old.get('params') != new.get('params'):
+            self.stdout.write(self.style.WARNING(f"  parameters differ: {old.get('params')} vs {new.get('params')}"))
+        for endpoint, row in new['endpoints'].items():
+            before = old.get('endpoints', {}).get(endpoint)
+            if not before:
+                self.stdout.write(f"  {endpoint:<22} (new)")
+                continue
+            changes = []
+            for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if before.get(key) and row.get(key) is not None:
+                    changes.append(f"{key} {(row[key] - before[key]) / before[key] * 100:+.0f}%")
+            self.stdout.write(f"  {endpoint:<22} {', '.join(changes)}")
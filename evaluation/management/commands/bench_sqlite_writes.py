@@ -0,0 +1,140 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+# Environment for each profile; every worker process gets its own Django setup.
+PROFILES = {
+    'basic': {'BANGLAVERSE_SQLITE_PROFILE': 'basic'},
+    'production': {'BANGLAVERSE_SQLITE_PROFILE': 'production'},
+}
+
+# Each profile runs with the write lock (evaluation/write_lock.py) off and on
+LOCK_MODES = {'off': '0', 'on': '1'}
+
+SEED_ITEMS = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare submission write throughput of the SQLite profiles, with and without the "
+        "write lock: several processes submit concurrently into a scratch database for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help="Concurrent writer processes.")
+        parser.add_argument('--submissions', type=int, default=50, help="Submissions per process.")
+        parser.add_argument('--profiles', default=','.join(PROFILES), help="Comma-separated profiles to run.")
+        parser.add_argument('--lock', choices=[*LOCK_MODES, 'both'], default='both',
+                            help="Run with the write lock off, on, or both.")
+        # Internal modes used by the subprocesses
+        parser.add_argument('--setup', action='store_true', help="(internal) migrate and seed the database.")
+        parser.add_argument('--worker', type=int, help="(internal) run as writer number N.")
+
+    def handle(self, *args, **options):
+        if options['setup']:
+            return self.setup()
+        if options['worker'] is not None:
+            return self.work(options['worker'], options['submissions'])
+
+        profiles = options['profiles'].split(',')
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+        self.stdout.write(
+            f"{options['processes']} processes x {options['submissions']} submissions "
+            f"(10 dialect + 10 MCQ ratings each)"
+        )
+        locks = list(LOCK_MODES) if options['lock'] == 'both' else [options['lock']]
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                for lock in locks:
+                    self.run_profile(profile, lock, directory, options['processes'], options['submissions'])
+
+    def _command(self, *args):
+        return [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_sqlite_writes', *args]
+
+    def run_profile(self, profile, lock, directory, processes, submissions):
+        name = f'{profile}-lock-{lock}'
+        env = {
+            **os.environ,
+            **PROFILES[profile],
+            'BANGLAVERSE_WRITE_LOCK': LOCK_MODES[lock],
+            'BANGLAVERSE_DB_PATH': os.path.join(directory, f'{name}.sqlite3'),
+            # A scratch lock file: the writers mustn't queue behind a server using var/
+            'BANGLAVERSE_WRITE_LOCK_PATH': os.path.join(directory, f'{name}.lock'),
+            'BANGLAVERSE_ASYNC_VIEWS': '0',
+        }
+        subprocess.run(self._command('--setup'), env=env, check=True)
+
+        started = time.monotonic()
+        workers = [
+            subprocess.Popen(
+                self._command('--worker', str(n), '--submissions', str(submissions)),
+                env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for n in range(processes)
+        ]
+        results = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+        elapsed = time.monotonic() - started
+
+        saved = sum(result['saved'] for result in results)
+        locked = sum(result['locked'] for result in results)
+        latencies = sorted(latency for result in results for latency in result['latencies'])
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        self.stdout.write(
+            f"{profile:<11} lock {lock:<3} {saved / elapsed:8.1f} submissions/s  saved={saved:<5} "
+            f"locked errors={locked:<5} p95={p95:.0f}ms  wall={elapsed:.1f}s"
+        )
+
+    def setup(self):
+        from evaluation import importers
+
+        call_command('migrate', verbosity=0)
+        importers.import_records('dialect', enumerate(
+            ({'dialect': 'sylheti', 'original': f'original {n}', 'generated': f'generated {n}'}
+             for n in range(SEED_ITEMS)),
+        ))
+        importers.import_records('plausibility', enumerate(
+            ({'question': f'question {n}', 'correct': 'a', 'wrong_1': 'b', 'wrong_2': 'c', 'wrong_3': 'd'}
+             for n in range(SEED_ITEMS)),
+        ))
+
+    def work(self, number, submissions):
+        from evaluation.models import DialectData, PlausibilityData
+        from evaluation.submission import save_submission, validate_submission
+
+        dialect_ids = list(DialectData.objects.values_list('id', flat=True))
+        plausibility_ids = list(PlausibilityData.objects.values_list('id', flat=True))
+        saved = locked = 0
+        latencies = []
+        for n in range(submissions):
+            cleaned = validate_submission({
+                'evaluator_email': f'bench-{number}-{n}@example.com',
+                'dialect_evaluations': [
+                    {'dialect_data_id': pk, 'accuracy_rating': random.randint(1, 5), 'naturalness_rating': 3}
+                    for pk in random.sample(dialect_ids, 10)
+                ],
+                'plausibility_evaluations': [
+                    {'plausibility_data_id': pk, 'option_1_plausibility': 2, 'option_2_plausibility': 3,
+                     'option_3_plausibility': random.randint(1, 5)}
+                    for pk in random.sample(plausibility_ids, 10)
+                ],
+            })
+            started = time.monotonic()
+            try:
+                save_submission(cleaned)
+            except OperationalError:
+                locked += 1
+            else:
+                saved += 1
+                latencies.append(time.monotonic() - started)
+        self.stdout.write(json.dumps({'saved': saved, 'locked': locked, 'latencies': latencies}))
@@ -0,0 +1,32 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from evaluation import analytics
+
+
+class Command(BaseCommand):
+    help = "Compute agreement statistics and distractor rankings and cache them for the staff report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes for the per-metric computations.")
+        parser.add_argument('--bootstrap', type=int, default=analytics.DEFAULT_BOOTSTRAP,
+                            help="Bootstrap resamples per metric.")
+        parser.add_argument('--output', help="Also write the report as JSON to this path.")
+
+    def handle(self, *args, **options):
+        report = analytics.get_report(workers=options['workers'], n_boot=options['bootstrap'], refresh=True)
+        for row in report['dialects']:
+            self.stdout.write(
+                f"{row['label']:<14} ratings={row['ratings']:<7} "
+                f"accuracy α={row['accuracy']['alpha']} naturalness α={row['naturalness']['alpha']}"
+            )
+        for row in report['mcq_options']:
+            self.stdout.write(f"MCQ {row['option']:<10} ratings={row['ratings']:<7} α={row['alpha']}")
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Cached report for data version {report['version']}."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from evaluation.near_duplicates import INDEXES, default_threshold
+
+PREVIEW_LENGTH = 80
+
+
+class Command(BaseCommand):
+    help = "List clusters of near-identical dialect or MCQ items, using the MinHash index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(INDEXES), action='append', dest='kinds',
+                            help="Item table to check (repeatable; default: both).")
+        parser.add_argument('--threshold', type=float,
+                            help=f"Minimum estimated similarity (default: {default_threshold()}).")
+        parser.add_argument('--limit', type=int, default=50, help="Clusters to print per table.")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute every item signature first (after raw SQL loads or a changed shingle setup).")
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if threshold is not None and not 0 < threshold <= 1:
+            raise CommandError("--threshold must be in (0, 1].")
+        for kind in options['kinds'] or sorted(INDEXES):
+            index = INDEXES[kind]
+            if options['rebuild']:
+                count = index.rebuild()
+                self.stdout.write(f"Indexed {count} {kind} items.")
+            clusters = index.clusters(threshold=threshold)
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(clusters)} {kind} cluster(s) covering {sum(len(c['item_ids']) for c in clusters)} items."
+            ))
+            shown = clusters[:options['limit']]
+            items = index.model.objects.in_bulk({pk for cluster in shown for pk in cluster['item_ids']})
+            for cluster in shown:
+                self.stdout.write(f"\n{len(cluster['item_ids'])} items, up to {cluster['similarity']:.0%} similar:")
+                for pk in cluster['item_ids']:
+                    if pk in items:
+                        self.stdout.write(f"  #{pk}  {str(items[pk])[:PREVIEW_LENGTH]}")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from evaluation.journal import BATCH_SIZE, journal
+
+
+class Command(BaseCommand):
+    help = "Write every queued write-behind submission to the database (also replays entries left by a crash)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Submissions per database transaction.")
+        parser.add_argument('--requeue-failed', action='store_true',
+                            help="Retry entries that failed on an earlier flush.")
+
+    def handle(self, *args, **options):
+        if options['requeue_failed']:
+            self.stdout.write(f"Requeued {journal.requeue_failed()} failed entries.")
+        written, failed = journal.flush(batch_size=options['batch_size'])
+        for entry_id, session_id, email, error in journal.failed_entries():
+            self.stderr.write(f"#{entry_id} {session_id} {email or ''}: {error}")
+        counts = journal.counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} submissions ({failed} failed). "
+            f"Journal: {counts.get('pending', 0)} pending, {counts.get('failed', 0)} failed."
+        ))
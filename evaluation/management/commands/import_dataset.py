@@ -0,0 +1,72 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from evaluation import importers
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = "Import dialect or plausibility items from a JSONL or CSV file (use - for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - to read from stdin.")
+        parser.add_argument('--kind', choices=sorted(importers.KINDS), required=True,
+                            help="Which item table to load.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help="Input format (default: from the file extension, jsonl for stdin).")
+        parser.add_argument('--batch-size', type=int, default=importers.DEFAULT_BATCH_SIZE,
+                            help="Rows per insert batch.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate and count duplicates without writing anything.")
+        parser.add_argument('--near-duplicates', choices=importers.NEAR_DUPLICATE_MODES, default='flag',
+                            help="Rows nearly identical to a stored item or an earlier row: import and "
+                                 "list them (flag, the default), leave them out (skip), or don't check (off).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if not fmt:
+            fmt = 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        def progress(stats):
+            self.stdout.write(f"  {stats}")
+
+        try:
+            stream = importers.open_input(path)
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+        try:
+            stats = importers.import_records(
+                options['kind'],
+                importers.read_records(stream, fmt),
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                progress=progress,
+                near_duplicate_mode=options['near_duplicates'],
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line_number, message in stats.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f"line {line_number}: {message}")
+        if len(stats.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... and {len(stats.errors) - MAX_REPORTED_ERRORS} more invalid rows")
+
+        action = "skipped" if options['near_duplicates'] == 'skip' else "imported"
+        for line_number, match, score in stats.near_duplicates[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f"line {line_number}: near-duplicate of {match} ({score:.0%} similar), {action}")
+        if len(stats.near_duplicates) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... and {len(stats.near_duplicates) - MAX_REPORTED_ERRORS} more near-duplicates")
+
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats.created} {options['kind']} items in {stats.elapsed:.1f}s "
+            f"({stats.duplicates} duplicates, {len(stats.near_duplicates)} near-duplicates, "
+            f"{stats.invalid} invalid, {stats.rate:,.0f} rows/s)."
+        ))
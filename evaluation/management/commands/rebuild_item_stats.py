@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from evaluation.item_stats import dialect_stats, plausibility_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute per-item rating statistics from the evaluation tables."
+
+    def handle(self, *args, **options):
+        dialect_count = dialect_stats.rebuild()
+        plausibility_count = plausibility_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {dialect_count} dialect item(s) and {plausibility_count} MCQ item(s)."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from evaluation import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search documents of items and evaluation comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', action='append', dest='kinds',
+            help=f"Only rebuild this kind (repeatable): {', '.join(search.SOURCES)}.",
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kinds']
+        unknown = set(kinds or ()) - set(search.SOURCES)
+        if unknown:
+            raise CommandError(f"Unknown kinds: {', '.join(sorted(unknown))}")
+        count = search.rebuild(kinds)
+        backend = "FTS5 trigram index" if search.fts_enabled() else "substring fallback (no FTS5 table)"
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} row(s); searching with the {backend}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from evaluation.scheduler import release_expired
+
+
+class Command(BaseCommand):
+    help = "Release item reservations whose evaluator session never submitted."
+
+    def handle(self, *args, **options):
+        released = release_expired(force=True)
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
@@ -0,0 +1,363 @@
+"""
+Per-request performance metrics.
+
+MetricsMiddleware times every request and, through an execute wrapper on
+each database connection, counts its queries and their time. Observations
+go into fixed-bucket histograms per resolved view name held in process
+memory (a dict update under a lock per request). Every FLUSH_INTERVAL
+seconds each process writes a snapshot of its totals into a shared SQLite
+file, one row per process, and the /metrics endpoint sums the rows into
+Prometheus text format, so the numbers cover every gunicorn worker.
+
+Requests slower than EVALUATION_SLOW_REQUEST_SECONDS are logged to the
+'evaluation.slow_requests' logger together with the SQL they ran.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('evaluation.slow_requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'banglaverse_request_duration_seconds': ('Wall time per request.', DURATION_BUCKETS),
+    'banglaverse_request_db_queries': ('Database queries per request.', QUERY_BUCKETS),
+    'banglaverse_request_db_seconds': ('Database time per request.', DURATION_BUCKETS),
+    'banglaverse_response_size_bytes': ('Response body size (non-streaming responses).', SIZE_BUCKETS),
+}
+REQUESTS_TOTAL = 'banglaverse_requests_total'
+REJECTED_TOTAL = 'banglaverse_admission_rejected_total'
+
+# Seconds between snapshots of this process's metrics into the shared file.
+FLUSH_INTERVAL = 5
+
+# Rows of processes that stopped reporting this long ago are merged into one.
+ARCHIVE_AFTER = 60 * 60
+ARCHIVE_ROW = 'archived'
+
+# SQL statements kept per request for the slow-request log.
+MAX_LOGGED_QUERIES = 50
+
+UNRESOLVED = '<unresolved>'
+
+_current = contextvars.ContextVar('evaluation_request_queries', default=None)
+
+
+def slow_request_seconds():
+    return getattr(settings, 'EVALUATION_SLOW_REQUEST_SECONDS', 1.0)
+
+
+def metrics_path():
+    return str(getattr(settings, 'EVALUATION_METRICS_PATH', settings.BASE_DIR / 'var' / 'metrics.sqlite3'))
+
+
+class QueryLog:
+    """
+    Queries run on behalf of one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.seconds += duration
+            if len(self.statements) < MAX_LOGGED_QUERIES:
+                self.statements.append((duration, sql))
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection; charges the query to the current request, if any.
+    The request's QueryLog lives in a context variable, so queries that async views run
+    through sync_to_async are counted as well.
+    """
+    log = _current.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    return log(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Registry:
+    """
+    This process's histograms and counters, flushed to the shared store periodically.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in HISTOGRAMS}
+        self._counters = {}
+        self._rejections = {}
+        self._last_flush = time.monotonic()
+        self.process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+    def observe(self, view, status, duration, queries, db_seconds, size):
+        values = {
+            'banglaverse_request_duration_seconds': duration,
+            'banglaverse_request_db_queries': queries,
+            'banglaverse_request_db_seconds': db_seconds,
+            'banglaverse_response_size_bytes': size,
+        }
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                buckets = HISTOGRAMS[name][1]
+                # bucket counts, then sum and count
+                series = self._histograms[name].setdefault(view, [0] * (len(buckets) + 3))
+                series[bisect.bisect_left(buckets, value)] += 1
+                series[-2] += value
+                series[-1] += 1
+            key = f'{view}\x1f{status}'
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def reject(self, view, reason):
+        """
+        Count a request turned away by admission control (evaluation/admission.py).
+        """
+        key = f'{view}\x1f{reason}'
+        with self._lock:
+            self._rejections[key] = self._rejections.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': {name: {view: list(series) for view, series in views.items()}
+                               for name, views in self._histograms.items()},
+                'counters': dict(self._counters),
+                'rejections': dict(self._rejections),
+            }
+
+    def claim_flush(self):
+        """
+        Whether a request should write this process's snapshot now: true once
+        per FLUSH_INTERVAL, for the first caller only.
+        """
+        with self._lock:
+            if time.monotonic() - self._last_flush < FLUSH_INTERVAL:
+                return False
+            self._last_flush = time.monotonic()
+            return True
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        store.save(self.process_id, self.snapshot())
+
+
+class Store:
+    """
+    Shared SQLite file holding the latest snapshot of every process.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connect(self):
+        path = metrics_path()
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.path != path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            db = sqlite3.connect(path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=OFF')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS snapshots '
+                '(process_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, data TEXT NOT NULL)'
+            )
+            self._local.db = db
+            self._local.path = path
+        return db
+
+    def save(self, process_id, snapshot):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                'INSERT INTO snapshots (process_id, updated_at, data) VALUES (?, ?, ?) '
+                'ON CONFLICT (process_id) DO UPDATE SET updated_at = excluded.updated_at, data = excluded.data',
+                (process_id, time.time(), json.dumps(snapshot)),
+            )
+            self._archive(db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _archive(self, db):
+        """
+        Fold the rows of processes that have exited into one row, so restarts don't grow the table.
+        """
+        rows = db.execute(
+            'SELECT process_id, data FROM snapshots WHERE updated_at < ? AND process_id != ?',
+            (time.time() - ARCHIVE_AFTER, ARCHIVE_ROW),
+        ).fetchall()
+        if not rows:
+            return
+        snapshots = [json.loads(data) for _, data in rows]
+        archived = db.execute('SELECT data FROM snapshots WHERE process_id = ?', (ARCHIVE_ROW,)).fetchone()
+        if archived:
+            snapshots.append(json.loads(archived[0]))
+        db.executemany('DELETE FROM snapshots WHERE process_id = ?', [(process_id,) for process_id, _ in rows])
+        db.execute(
+            'INSERT OR REPLACE INTO snapshots (process_id, updated_at, data) VALUES (?, ?, ?)',
+            (ARCHIVE_ROW, time.time(), json.dumps(merge(snapshots))),
+        )
+
+    def load(self):
+        return [json.loads(data) for (data,) in self._connect().execute('SELECT data FROM snapshots')]
+
+
+def merge(snapshots):
+    """
+    Sum snapshots element-wise.
+    """
+    total = {'histograms': {name: {} for name in HISTOGRAMS}, 'counters': {}, 'rejections': {}}
+    for snapshot in snapshots:
+        for name, views in snapshot['histograms'].items():
+            merged = total['histograms'].setdefault(name, {})
+            for view, series in views.items():
+                current = merged.setdefault(view, [0] * len(series))
+                merged[view] = [a + b for a, b in zip(current, series)]
+        # Snapshots written before admission control have no rejections
+        for section in ('counters', 'rejections'):
+            for key, value in snapshot.get(section, {}).items():
+                total[section][key] = total[section].get(key, 0) + value
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def render(snapshot):
+    """
+    Prometheus text exposition of a merged snapshot.
+    """
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for view, series in sorted(snapshot['histograms'].get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], series[:len(buckets) + 1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels(view=view, le=bound)}}} {cumulative}')
+            lines.append(f'{name}_sum{{{_labels(view=view)}}} {series[-2]:g}')
+            lines.append(f'{name}_count{{{_labels(view=view)}}} {series[-1]}')
+    lines += [f'# HELP {REQUESTS_TOTAL} Requests by view and status code.', f'# TYPE {REQUESTS_TOTAL} counter']
+    for key, value in sorted(snapshot['counters'].items()):
+        view, status = key.split('\x1f')
+        lines.append(f'{REQUESTS_TOTAL}{{{_labels(view=view, status=status)}}} {value}')
+    lines += [
+        f'# HELP {REJECTED_TOTAL} API requests rejected by admission control, by view and reason.',
+        f'# TYPE {REJECTED_TOTAL} counter',
+    ]
+    for key, value in sorted(snapshot.get('rejections', {}).items()):
+        view, reason = key.split('\x1f')
+        lines.append(f'{REJECTED_TOTAL}{{{_labels(view=view, reason=reason)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+store = Store()
+
+
+def collect():
+    """
+    Flush this process and return the metrics of all processes in Prometheus text format.
+    """
+    registry.flush()
+    return render(merge(store.load()))
+
+
+class MetricsMiddleware:
+    """
+    Records duration, DB queries, DB time and response size per resolved view.
+    For streaming responses the duration covers the view up to the first byte and no size is recorded.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        log, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, log, started)
+        if registry.claim_flush():
+            self._flush()
+        return response
+
+    async def __acall__(self, request):
+        log, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, log, started)
+        if registry.claim_flush():
+            # The write can wait on the store's lock; keep it off the event loop
+            await sync_to_async(self._flush, thread_sensitive=False)()
+        return response
+
+    def _start(self):
+        log = QueryLog()
+        return log, _current.set(log), time.perf_counter()
+
+    def _finish(self, request, response, log, started):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        size = None if response.streaming else len(response.content)
+        registry.observe(view, response.status_code, duration, log.count, log.seconds, size)
+        if duration >= slow_request_seconds():
+            slow_logger.warning(
+                'Slow request %s %s (%s): %.3fs, %d queries in %.3fs\n%s',
+                request.method, request.get_full_path(), view, duration, log.count, log.seconds,
+                '\n'.join(f'  {seconds * 1000:8.1f} ms  {sql}' for seconds, sql in log.statements),
+            )
+
+    def _flush(self):
+        try:
+            registry.flush()
+        except sqlite3.Error:
+            logger.exception('Could not write metrics snapshot')
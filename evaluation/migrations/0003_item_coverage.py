@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_coverage(apps, schema_editor):
+    """
+    Seed the coverage counters from ratings collected before the scheduler existed.
+    """
+    for model_name in ('DialectData', 'PlausibilityData'):
+        model = apps.get_model('evaluation', model_name)
+        counts = model.objects.annotate(n=Count('evaluations')).filter(n__gt=0).values_list('id', 'n')
+        for pk, n in counts.iterator():
+            model.objects.filter(pk=pk).update(assigned_count=n, completed_count=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0002_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(db_index=True, max_length=100)),
+                ('kind', models.CharField(choices=[('dialect', 'Dialect'), ('plausibility', 'Plausibility')], max_length=20)),
+                ('item_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Item Reservation',
+                'verbose_name_plural': 'Item Reservations',
+            },
+        ),
+        migrations.AddField(
+            model_name='dialectdata',
+            name='assigned_count',
+            field=models.PositiveIntegerField(default=0, help_text='Times handed out to evaluators (released if never submitted)'),
+        ),
+        migrations.AddField(
+            model_name='dialectdata',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0, help_text='Submitted ratings'),
+        ),
+        migrations.AddField(
+            model_name='plausibilitydata',
+            name='assigned_count',
+            field=models.PositiveIntegerField(default=0, help_text='Times handed out to evaluators (released if never submitted)'),
+        ),
+        migrations.AddField(
+            model_name='plausibilitydata',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0, help_text='Submitted ratings'),
+        ),
+        migrations.AddIndex(
+            model_name='dialectdata',
+            index=models.Index(fields=['dialect_name', 'assigned_count'], name='dialectdata_coverage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plausibilitydata',
+            index=models.Index(fields=['assigned_count'], name='plausibilitydata_coverage_idx'),
+        ),
+        migrations.RunPython(backfill_coverage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    return email or None
+
+
+def create_submissions(apps, schema_editor):
+    """
+    Move evaluator details from the evaluation rows onto one Submission per session.
+    Sessions sharing a normalized email are merged into the first one, so the
+    one-submission-per-email rule holds for existing data too.
+    """
+    Submission = apps.get_model('evaluation', 'Submission')
+    evaluation_models = [
+        apps.get_model('evaluation', 'DialectEvaluation'),
+        apps.get_model('evaluation', 'PlausibilityEvaluation'),
+    ]
+
+    sessions = {}
+    for model in evaluation_models:
+        rows = model.objects.order_by().values('session_id').annotate(
+            first_created=Min('created_at'),
+            name=Max('evaluator_name'),
+            email=Max('evaluator_email'),
+        )
+        for row in rows.iterator():
+            known = sessions.setdefault(row['session_id'], row)
+            known['first_created'] = min(known['first_created'], row['first_created'])
+            known['name'] = known['name'] or row['name']
+            known['email'] = known['email'] or row['email']
+
+    by_email = {}
+    for session_id, row in sorted(sessions.items(), key=lambda item: item[1]['first_created']):
+        email = normalize_email(row['email'])
+        submission = by_email.get(email) if email else None
+        if submission is None:
+            submission = Submission.objects.create(
+                session_id=session_id,
+                evaluator_name=row['name'] or None,
+                evaluator_email=email,
+            )
+            # Keep the original submission time rather than the migration time
+            Submission.objects.filter(pk=submission.pk).update(created_at=row['first_created'])
+            if email:
+                by_email[email] = submission
+        for model in evaluation_models:
+            model.objects.filter(session_id=session_id).update(submission=submission)
+
+
+def restore_evaluator_fields(apps, schema_editor):
+    for model_name in ('DialectEvaluation', 'PlausibilityEvaluation'):
+        model = apps.get_model('evaluation', model_name)
+        for evaluation in model.objects.select_related('submission').iterator():
+            model.objects.filter(pk=evaluation.pk).update(
+                session_id=evaluation.submission.session_id,
+                evaluator_name=evaluation.submission.evaluator_name,
+                evaluator_email=evaluation.submission.evaluator_email,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0003_item_coverage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(help_text='Session identifier for grouping responses', max_length=100, unique=True)),
+                ('evaluator_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('evaluator_email', models.EmailField(blank=True, help_text='Lower-cased evaluator email', max_length=254, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Submission',
+                'verbose_name_plural': 'Submissions',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dialectevaluation',
+            name='submission',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dialect_evaluations', to='evaluation.submission'),
+        ),
+        migrations.AddField(
+            model_name='plausibilityevaluation',
+            name='submission',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='plausibility_evaluations', to='evaluation.submission'),
+        ),
+        migrations.RunPython(create_submissions, restore_evaluator_fields),
+        migrations.AlterField(
+            model_name='dialectevaluation',
+            name='submission',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dialect_evaluations', to='evaluation.submission'),
+        ),
+        migrations.AlterField(
+            model_name='plausibilityevaluation',
+            name='submission',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plausibility_evaluations', to='evaluation.submission'),
+        ),
+        migrations.RemoveField(
+            model_name='dialectevaluation',
+            name='evaluator_email',
+        ),
+        migrations.RemoveField(
+            model_name='dialectevaluation',
+            name='evaluator_name',
+        ),
+        migrations.RemoveField(
+            model_name='dialectevaluation',
+            name='session_id',
+        ),
+        migrations.RemoveField(
+            model_name='plausibilityevaluation',
+            name='evaluator_email',
+        ),
+        migrations.RemoveField(
+            model_name='plausibilityevaluation',
+            name='evaluator_name',
+        ),
+        migrations.RemoveField(
+            model_name='plausibilityevaluation',
+            name='session_id',
+        ),
+    ]
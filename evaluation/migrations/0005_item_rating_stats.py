@@ -0,0 +1,74 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:22
+
+import django.db.models.deletion
+import evaluation.models
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    """
+    Seed the stats tables from the ratings already collected.
+    """
+    sources = [
+        ('DialectDataStats', 'DialectEvaluation', 'dialect_data_id', {
+            'accuracy': 'accuracy_rating', 'naturalness': 'naturalness_rating',
+        }),
+        ('PlausibilityDataStats', 'PlausibilityEvaluation', 'plausibility_data_id', {
+            'option_1': 'option_1_plausibility', 'option_2': 'option_2_plausibility', 'option_3': 'option_3_plausibility',
+        }),
+    ]
+    for stats_name, evaluation_name, item_id_field, columns in sources:
+        stats_model = apps.get_model('evaluation', stats_name)
+        evaluation_model = apps.get_model('evaluation', evaluation_name)
+        aggregates = {'rating_count': Count('id')}
+        for prefix, column in columns.items():
+            aggregates[f'{prefix}_sum'] = Sum(column)
+            aggregates[f'{prefix}_sum_sq'] = Sum(F(column) * F(column))
+        rows = evaluation_model.objects.order_by().values(item_id_field).annotate(**aggregates)
+        stats_model.objects.bulk_create([stats_model(**row) for row in rows.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0004_submission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DialectDataStats',
+            fields=[
+                ('dialect_data', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='evaluation.dialectdata')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('accuracy_sum', models.PositiveBigIntegerField(default=0)),
+                ('accuracy_sum_sq', models.PositiveBigIntegerField(default=0)),
+                ('naturalness_sum', models.PositiveBigIntegerField(default=0)),
+                ('naturalness_sum_sq', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Dialect Data Statistics',
+                'verbose_name_plural': 'Dialect Data Statistics',
+            },
+            bases=(evaluation.models.RatingStatsMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='PlausibilityDataStats',
+            fields=[
+                ('plausibility_data', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='evaluation.plausibilitydata')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('option_1_sum', models.PositiveBigIntegerField(default=0)),
+                ('option_1_sum_sq', models.PositiveBigIntegerField(default=0)),
+                ('option_2_sum', models.PositiveBigIntegerField(default=0)),
+                ('option_2_sum_sq', models.PositiveBigIntegerField(default=0)),
+                ('option_3_sum', models.PositiveBigIntegerField(default=0)),
+                ('option_3_sum_sq', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Plausibility Data Statistics',
+                'verbose_name_plural': 'Plausibility Data Statistics',
+            },
+            bases=(evaluation.models.RatingStatsMixin, models.Model),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:05
+
+import hashlib
+
+from django.db import migrations, models
+
+HASH_FIELDS = {
+    'DialectData': ('dialect_name', 'original_standard_text', 'ai_generated_dialect_text'),
+    'PlausibilityData': ('question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3'),
+}
+
+
+def backfill_content_hash(apps, schema_editor):
+    for model_name, fields in HASH_FIELDS.items():
+        model = apps.get_model('evaluation', model_name)
+        for row in model.objects.values('id', *fields).iterator():
+            digest = hashlib.sha256('\x1f'.join(str(row[field]) for field in fields).encode('utf-8')).hexdigest()
+            model.objects.filter(pk=row['id']).update(content_hash=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0005_item_rating_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dialectdata',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', editable=False, help_text='Hash of dialect and texts, for deduplication', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='plausibilitydata',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', editable=False, help_text='Hash of question and options, for deduplication', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:40
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# model, hash fields, evaluation model, evaluation FK, stats model, reservation kind, stats columns
+ITEM_MODELS = [
+    ('DialectData', ('dialect_name', 'original_standard_text', 'ai_generated_dialect_text'),
+     'DialectEvaluation', 'dialect_data', 'DialectDataStats', 'dialect', {
+         'accuracy': 'accuracy_rating',
+         'naturalness': 'naturalness_rating',
+     }),
+    ('PlausibilityData', ('question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3'),
+     'PlausibilityEvaluation', 'plausibility_data', 'PlausibilityDataStats', 'plausibility', {
+         'option_1': 'option_1_plausibility',
+         'option_2': 'option_2_plausibility',
+         'option_3': 'option_3_plausibility',
+     }),
+]
+
+
+def normalized_hash(values):
+    parts = (WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', str(value))).strip() for value in values)
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def rebuild_stats(Stats, Evaluation, item_field, columns, item_ids):
+    aggregates = {'rating_count': Count('id')}
+    for prefix, column in columns.items():
+        aggregates[f'{prefix}_sum'] = Sum(column)
+        aggregates[f'{prefix}_sum_sq'] = Sum(F(column) * F(column))
+    Stats.objects.filter(**{f'{item_field}_id__in': item_ids}).delete()
+    rows = (
+        Evaluation.objects.filter(**{f'{item_field}_id__in': item_ids})
+        .order_by().values(f'{item_field}_id').annotate(**aggregates)
+    )
+    Stats.objects.bulk_create([Stats(**row) for row in rows])
+
+
+def normalize_content_hash(apps, schema_editor):
+    """
+    Rehash every item over its normalized text and merge items that turn out
+    to be duplicates into the oldest one, so the hash can become unique.
+    Ratings, reservations and coverage counters move to the kept item.
+    """
+    ItemReservation = apps.get_model('evaluation', 'ItemReservation')
+    for model_name, fields, evaluation_name, item_field, stats_name, kind, columns in ITEM_MODELS:
+        model = apps.get_model('evaluation', model_name)
+        Evaluation = apps.get_model('evaluation', evaluation_name)
+        Stats = apps.get_model('evaluation', stats_name)
+
+        keepers = {}
+        merges = []
+        changed = []
+        for row in model.objects.order_by('id').values('id', 'content_hash', *fields).iterator():
+            digest = normalized_hash(row[field] for field in fields)
+            keeper = keepers.setdefault(digest, row['id'])
+            if keeper != row['id']:
+                merges.append((row['id'], keeper))
+            elif digest != row['content_hash']:
+                changed.append(model(id=row['id'], content_hash=digest))
+
+        for duplicate, keeper in merges:
+            Evaluation.objects.filter(**{item_field: duplicate}).update(**{item_field: keeper})
+            ItemReservation.objects.filter(kind=kind, item_id=duplicate).update(item_id=keeper)
+            counts = model.objects.filter(id=duplicate).values('assigned_count', 'completed_count').get()
+            model.objects.filter(id=keeper).update(
+                assigned_count=F('assigned_count') + counts['assigned_count'],
+                completed_count=F('completed_count') + counts['completed_count'],
+            )
+        model.objects.filter(id__in=[duplicate for duplicate, _ in merges]).delete()
+        model.objects.bulk_update(changed, ['content_hash'], batch_size=500)
+        if merges:
+            rebuild_stats(Stats, Evaluation, item_field, columns, sorted({keeper for _, keeper in merges}))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0006_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_content_hash, migrations.RunPython.noop),
+    ]
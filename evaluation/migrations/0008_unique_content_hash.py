@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0007_normalize_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dialectdata',
+            name='content_hash',
+            field=models.CharField(editable=False, help_text='Hash of dialect and normalized texts, for deduplication', max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='plausibilitydata',
+            name='content_hash',
+            field=models.CharField(editable=False, help_text='Hash of normalized question and options, for deduplication', max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0008_unique_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dialectdata',
+            index=models.Index(fields=['dialect_name', 'created_at'], name='dialectdata_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dialectdata',
+            index=models.Index(fields=['created_at'], name='dialectdata_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dialectevaluation',
+            index=models.Index(fields=['created_at'], name='dialecteval_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dialectevaluation',
+            index=models.Index(fields=['accuracy_rating', 'created_at'], name='dialecteval_accuracy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dialectevaluation',
+            index=models.Index(fields=['naturalness_rating', 'created_at'], name='dialecteval_naturalness_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plausibilitydata',
+            index=models.Index(fields=['created_at'], name='plausibilitydata_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plausibilityevaluation',
+            index=models.Index(fields=['created_at'], name='plausibilityeval_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['created_at'], name='submission_created_idx'),
+        ),
+    ]
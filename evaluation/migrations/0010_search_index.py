@@ -0,0 +1,130 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:30
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+# Frozen copies of evaluation.search as of this migration, so later changes
+# there don't alter what this migration creates or indexes
+FTS_TABLE = 'evaluation_searchdocument_fts'
+
+WHITESPACE_RE = re.compile(r'\s+')
+ZERO_WIDTH_RE = re.compile('[\u200b\u200c\u200d\u2060\ufeff]')
+KHANDA_TA_RE = re.compile('\u09a4\u09cd\u200d')
+KHANDA_TA = '\u09ce'
+VOWEL_FOLDS = str.maketrans({
+    '\u09c0': '\u09bf',
+    '\u09c2': '\u09c1',
+    '\u0988': '\u0987',
+    '\u098a': '\u0989',
+})
+
+
+def normalize_search_text(value):
+    value = ZERO_WIDTH_RE.sub('', KHANDA_TA_RE.sub(KHANDA_TA, str(value)))
+    value = WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', value)).strip()
+    return value.translate(VOWEL_FOLDS).casefold()
+
+
+# External-content FTS5 table over the documents, kept in step by triggers
+FTS_SQL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"text, content='evaluation_searchdocument', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON evaluation_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON evaluation_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON evaluation_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+# kind, model, searchable fields
+SOURCES = [
+    ('dialect', 'DialectData', ('original_standard_text', 'ai_generated_dialect_text')),
+    ('plausibility', 'PlausibilityData',
+     ('question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3')),
+    ('dialect_comment', 'DialectEvaluation', ('comments',)),
+    ('plausibility_comment', 'PlausibilityEvaluation', ('comments',)),
+]
+
+BATCH_SIZE = 2000
+
+
+def create_fts(apps, schema_editor):
+    """
+    SQLite only, and only where the build has FTS5; search falls back to LIKE otherwise.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(FTS_SQL[0])
+    except OperationalError:  # no fts5 module, or no trigram tokenizer (SQLite < 3.34)
+        return
+    for sql in FTS_SQL[1:]:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+def index_existing_rows(apps, schema_editor):
+    SearchDocument = apps.get_model('evaluation', 'SearchDocument')
+    for kind, model_name, fields in SOURCES:
+        model = apps.get_model('evaluation', model_name)
+        queryset = model.objects.only('pk', *fields).order_by('pk')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            documents = []
+            for obj in batch:
+                parts = (normalize_search_text(getattr(obj, field) or '') for field in fields)
+                text = '\n'.join(part for part in parts if part)
+                if text:
+                    documents.append(SearchDocument(kind=kind, object_id=obj.pk, text=text))
+            SearchDocument.objects.bulk_create(documents)
+            last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0009_admin_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('dialect', 'Dialect item'), ('plausibility', 'Plausibility item'), ('dialect_comment', 'Dialect evaluation comment'), ('plausibility_comment', 'Plausibility evaluation comment')], max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('text', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdocument_object_unique')],
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:55
+
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+from django.db import migrations, models
+
+# Frozen copies of evaluation.search and evaluation.near_duplicates as of this
+# migration, so later changes there don't alter the signatures it stores
+WHITESPACE_RE = re.compile(r'\s+')
+ZERO_WIDTH_RE = re.compile('[\u200b\u200c\u200d\u2060\ufeff]')
+KHANDA_TA_RE = re.compile('\u09a4\u09cd\u200d')
+KHANDA_TA = '\u09ce'
+VOWEL_FOLDS = str.maketrans({
+    '\u09c0': '\u09bf',
+    '\u09c2': '\u09c1',
+    '\u0988': '\u0987',
+    '\u098a': '\u0989',
+})
+
+SHINGLE_SIZE = 4
+NUM_PERM = 96
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1
+MAX_SHINGLES = 100_000
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 1 << 63, (BANDS, ROWS), dtype=np.uint64) | np.uint64(1)
+_BAND_OFFSETS = _rng.integers(1, 1 << 63, BANDS, dtype=np.uint64)
+
+
+def normalize_search_text(value):
+    value = ZERO_WIDTH_RE.sub('', KHANDA_TA_RE.sub(KHANDA_TA, str(value)))
+    value = WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', value)).strip()
+    return value.translate(VOWEL_FOLDS).casefold()
+
+
+def shingle_hashes(text):
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def _minhash(hashes):
+    offsets = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+    permuted = (_A[:, None] * np.concatenate(hashes)[None, :] + _B[:, None]) % PRIME
+    return np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+
+
+def signatures(texts):
+    rows = []
+    chunk = []
+    size = 0
+    for text in texts:
+        hashes = shingle_hashes(text)
+        if chunk and size + len(hashes) > MAX_SHINGLES:
+            rows.append(_minhash(chunk))
+            chunk, size = [], 0
+        chunk.append(hashes)
+        size += len(hashes)
+    if chunk:
+        rows.append(_minhash(chunk))
+    return np.concatenate(rows) if rows else np.empty((0, NUM_PERM), dtype=np.uint32)
+
+
+def bucket_keys(sigs):
+    bands = sigs.astype(np.uint64).reshape(len(sigs), BANDS, ROWS)
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64) + _BAND_OFFSETS
+    return keys.view(np.int64)
+
+
+# kind, model, fields the signature is taken over
+SOURCES = [
+    ('dialect', 'DialectData', ('original_standard_text', 'ai_generated_dialect_text')),
+    ('plausibility', 'PlausibilityData',
+     ('question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3')),
+]
+
+BATCH_SIZE = 1000
+
+
+def index_existing_items(apps, schema_editor):
+    ItemSignature = apps.get_model('evaluation', 'ItemSignature')
+    SignatureBucket = apps.get_model('evaluation', 'SignatureBucket')
+    for kind, model_name, fields in SOURCES:
+        model = apps.get_model('evaluation', model_name)
+        queryset = model.objects.only('pk', *fields).order_by('pk')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            sigs = signatures(
+                '\n'.join(normalize_search_text(getattr(item, field) or '') for field in fields) for item in batch
+            )
+            ItemSignature.objects.bulk_create([
+                ItemSignature(kind=kind, item_id=item.pk, signature=sig.astype('<u4').tobytes())
+                for item, sig in zip(batch, sigs)
+            ])
+            SignatureBucket.objects.bulk_create([
+                SignatureBucket(kind=kind, bucket=int(key), item_id=item.pk)
+                for item, keys in zip(batch, bucket_keys(sigs)) for key in keys
+            ], batch_size=BATCH_SIZE)
+            last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('dialect', 'Dialect'), ('plausibility', 'Plausibility')], max_length=20)),
+                ('item_id', models.BigIntegerField()),
+                ('signature', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Item Signature',
+                'verbose_name_plural': 'Item Signatures',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'item_id'), name='itemsignature_item_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SignatureBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('dialect', 'Dialect'), ('plausibility', 'Plausibility')], max_length=20)),
+                ('bucket', models.BigIntegerField()),
+                ('item_id', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Signature Bucket',
+                'verbose_name_plural': 'Signature Buckets',
+                'indexes': [models.Index(fields=['kind', 'bucket'], name='signaturebucket_lookup_idx'), models.Index(fields=['kind', 'item_id'], name='signaturebucket_item_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_items, migrations.RunPython.noop),
+    ]
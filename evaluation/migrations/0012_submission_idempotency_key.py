@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0011_near_duplicate_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-generated key; a retried post with the same key gets the original response', max_length=100, null=True, unique=True),
+        ),
+    ]
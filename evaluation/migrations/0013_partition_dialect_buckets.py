@@ -0,0 +1,76 @@
+import zlib
+
+import numpy as np
+from django.db import migrations
+
+# Frozen copy of evaluation.near_duplicates.bucket_keys as of this migration.
+# Stored signatures don't change, only the dialect items' buckets: they are
+# keyed by dialect_name from now on
+BANDS = 16
+ROWS = 96 // BANDS
+PRIME = (1 << 31) - 1
+
+# The MinHash parameters are drawn first; draw them again to reach the band ones
+_rng = np.random.default_rng(20240601)
+_rng.integers(1, PRIME, 96, dtype=np.uint64)
+_rng.integers(0, PRIME, 96, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 1 << 63, (BANDS, ROWS), dtype=np.uint64) | np.uint64(1)
+_BAND_OFFSETS = _rng.integers(1, 1 << 63, BANDS, dtype=np.uint64)
+_PARTITION_MULTIPLIER = _rng.integers(1, 1 << 63, dtype=np.uint64) | np.uint64(1)
+
+BATCH_SIZE = 1000
+
+
+def bucket_keys(sigs, partitions=None):
+    bands = sigs.astype(np.uint64).reshape(len(sigs), BANDS, ROWS)
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64) + _BAND_OFFSETS
+    if partitions is not None:
+        crcs = np.fromiter((zlib.crc32(partition.encode('utf-8')) for partition in partitions),
+                           dtype=np.uint64, count=len(sigs))
+        keys += (crcs * _PARTITION_MULTIPLIER)[:, None]
+    return keys.view(np.int64)
+
+
+def rebucket_dialect_items(apps, partitioned):
+    DialectData = apps.get_model('evaluation', 'DialectData')
+    ItemSignature = apps.get_model('evaluation', 'ItemSignature')
+    SignatureBucket = apps.get_model('evaluation', 'SignatureBucket')
+    SignatureBucket.objects.filter(kind='dialect').delete()
+    signatures = ItemSignature.objects.filter(kind='dialect').order_by('item_id').values_list('item_id', 'signature')
+    last_id = 0
+    while True:
+        batch = list(signatures.filter(item_id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        dialects = dict(
+            DialectData.objects.filter(pk__in=[item_id for item_id, _ in batch]).values_list('pk', 'dialect_name')
+        )
+        batch = [(item_id, data) for item_id, data in batch if item_id in dialects]
+        if not batch:
+            continue
+        sigs = np.array([np.frombuffer(bytes(data), dtype='<u4') for _, data in batch])
+        partitions = [dialects[item_id] for item_id, _ in batch] if partitioned else None
+        SignatureBucket.objects.bulk_create([
+            SignatureBucket(kind='dialect', bucket=int(key), item_id=item_id)
+            for (item_id, _), keys in zip(batch, bucket_keys(sigs, partitions)) for key in keys
+        ], batch_size=BATCH_SIZE)
+
+
+def partition_buckets(apps, schema_editor):
+    rebucket_dialect_items(apps, partitioned=True)
+
+
+def unpartition_buckets(apps, schema_editor):
+    rebucket_dialect_items(apps, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0012_submission_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_buckets, unpartition_buckets),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0013_partition_dialect_buckets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plausibilityevaluation',
+            index=models.Index(fields=['option_1_plausibility', 'created_at'], name='plausibilityeval_option_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plausibilityevaluation',
+            index=models.Index(fields=['option_2_plausibility', 'created_at'], name='plausibilityeval_option_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plausibilityevaluation',
+            index=models.Index(fields=['option_3_plausibility', 'created_at'], name='plausibilityeval_option_3_idx'),
+        ),
+    ]
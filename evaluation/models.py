@@ -1,7 +1,64 @@
+import hashlib
+import re
+import unicodedata
+
+from django.core.exceptions import ValidationError
 from django.db import models
 
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """
+    NFC-normalize and collapse whitespace, so the same Bangla text typed with
+    decomposed vowel signs or stray spaces and line breaks hashes the same.
+    """
+    return WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', str(value))).strip()
+
+
+def content_hash(parts):
+    """
+    SHA-256 over an item's normalized text fields, so duplicate items are found with one index probe.
+    """
+    return hashlib.sha256('\x1f'.join(normalize_text(part) for part in parts).encode('utf-8')).hexdigest()
 
-class DialectData(models.Model):
+
+class ContentHashMixin:
+    """
+    Keeps content_hash in sync with the fields listed in HASH_FIELDS.
+    """
+    HASH_FIELDS = ()
+    
+    @classmethod
+    def hash_values(cls, values):
+        """
+        Content hash for a mapping of field values (e.g. an import record).
+        """
+        return content_hash(str(values[field]) for field in cls.HASH_FIELDS)
+    
+    @classmethod
+    def find_duplicate(cls, values):
+        """
+        Return the stored item with the same normalized content as values, if any.
+        """
+        return cls.objects.filter(content_hash=cls.hash_values(values)).first()
+    
+    def clean(self):
+        super().clean()
+        if all(getattr(self, field) for field in self.HASH_FIELDS):
+            duplicate = self.find_duplicate(self.__dict__)
+            if duplicate is not None and duplicate.pk != self.pk:
+                raise ValidationError(f"This item duplicates #{duplicate.pk}.")
+    
+    def save(self, *args, **kwargs):
+        self.content_hash = self.hash_values(self.__dict__)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.HASH_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class DialectData(ContentHashMixin, models.Model):
     """
     Model for storing dialect translation pairs.
     Each dialect has 50 pairs of original and AI-generated text.
@@ -13,49 +70,105 @@ class DialectData(models.Model):
         ('barishal', 'Barishal'),
         ('rangpur', 'Rangpur'),
     ]
+    HASH_FIELDS = ('dialect_name', 'original_standard_text', 'ai_generated_dialect_text')
     
     dialect_name = models.CharField(max_length=50, choices=DIALECT_CHOICES)
     original_standard_text = models.TextField(help_text="Original standard Bangla text")
     ai_generated_dialect_text = models.TextField(help_text="AI-generated dialectal version")
+    content_hash = models.CharField(max_length=64, unique=True, editable=False, help_text="Hash of dialect and normalized texts, for deduplication")
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Coverage counters maintained by the item scheduler
+    assigned_count = models.PositiveIntegerField(default=0, help_text="Times handed out to evaluators (released if never submitted)")
+    completed_count = models.PositiveIntegerField(default=0, help_text="Submitted ratings")
+    
     class Meta:
         verbose_name = "Dialect Data"
         verbose_name_plural = "Dialect Data"
         ordering = ['dialect_name', 'created_at']
+        indexes = [
+            models.Index(fields=['dialect_name', 'assigned_count'], name='dialectdata_coverage_idx'),
+            models.Index(fields=['dialect_name', 'created_at'], name='dialectdata_listing_idx'),
+            models.Index(fields=['created_at'], name='dialectdata_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_dialect_name_display()} - {self.original_standard_text[:50]}..."
 
 
-class PlausibilityData(models.Model):
+class PlausibilityData(ContentHashMixin, models.Model):
     """
     Model for storing MCQ plausibility evaluation data.
     Includes human-made question and correct answer with 3 AI-generated wrong options.
     """
+    HASH_FIELDS = ('question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3')
+    
     question = models.TextField(help_text="Human-made question")
     correct_answer = models.TextField(help_text="Human-made correct answer")
     wrong_option_1 = models.TextField(help_text="AI-generated wrong option 1")
     wrong_option_2 = models.TextField(help_text="AI-generated wrong option 2")
     wrong_option_3 = models.TextField(help_text="AI-generated wrong option 3")
+    content_hash = models.CharField(max_length=64, unique=True, editable=False, help_text="Hash of normalized question and options, for deduplication")
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Coverage counters maintained by the item scheduler
+    assigned_count = models.PositiveIntegerField(default=0, help_text="Times handed out to evaluators (released if never submitted)")
+    completed_count = models.PositiveIntegerField(default=0, help_text="Submitted ratings")
+    
     class Meta:
         verbose_name = "Plausibility Data"
         verbose_name_plural = "Plausibility Data"
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['assigned_count'], name='plausibilitydata_coverage_idx'),
+            models.Index(fields=['created_at'], name='plausibilitydata_created_idx'),
+        ]
     
     def __str__(self):
         return f"MCQ: {self.question[:50]}..."
 
 
+class Submission(models.Model):
+    """
+    Model for storing one evaluator's submission.
+    Holds the evaluator details shared by all evaluation rows of the submission.
+    Each (normalized) email can submit only once, and each idempotency key names one submission.
+    """
+    session_id = models.CharField(max_length=100, unique=True, help_text="Session identifier for grouping responses")
+    evaluator_name = models.CharField(max_length=100, blank=True, null=True)
+    evaluator_email = models.EmailField(blank=True, null=True, unique=True, help_text="Lower-cased evaluator email")
+    idempotency_key = models.CharField(
+        max_length=100, blank=True, null=True, unique=True,
+        help_text="Client-generated key; a retried post with the same key gets the original response",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Submission"
+        verbose_name_plural = "Submissions"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='submission_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Submission by {self.evaluator_name or self.evaluator_email or 'Anonymous'}"
+    
+    @staticmethod
+    def normalize_email(email):
+        """
+        Return the form emails are stored and compared in, or None for a blank email.
+        """
+        email = (email or '').strip().lower()
+        return email or None
+
+
 class DialectEvaluation(models.Model):
     """
     Model for storing evaluator responses for dialect data.
     """
     dialect_data = models.ForeignKey(DialectData, on_delete=models.CASCADE, related_name='evaluations')
-    evaluator_name = models.CharField(max_length=100, blank=True, null=True)
-    evaluator_email = models.EmailField(blank=True, null=True)
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='dialect_evaluations')
     
     # Rating fields (1-5 scale)
     accuracy_rating = models.IntegerField(
@@ -69,15 +182,20 @@ class DialectEvaluation(models.Model):
     
     comments = models.TextField(blank=True, null=True, help_text="Additional comments")
     created_at = models.DateTimeField(auto_now_add=True)
-    session_id = models.CharField(max_length=100, help_text="Session identifier for grouping responses")
     
     class Meta:
         verbose_name = "Dialect Evaluation"
         verbose_name_plural = "Dialect Evaluations"
         ordering = ['-created_at']
+        # The admin changelist filters by rating and lists newest first
+        indexes = [
+            models.Index(fields=['created_at'], name='dialecteval_created_idx'),
+            models.Index(fields=['accuracy_rating', 'created_at'], name='dialecteval_accuracy_idx'),
+            models.Index(fields=['naturalness_rating', 'created_at'], name='dialecteval_naturalness_idx'),
+        ]
     
     def __str__(self):
-        return f"Evaluation of {self.dialect_data.dialect_name} by {self.evaluator_name or 'Anonymous'}"
+        return f"Evaluation of {self.dialect_data.dialect_name} by {self.submission.evaluator_name or 'Anonymous'}"
 
 
 class PlausibilityEvaluation(models.Model):
@@ -85,8 +203,7 @@ class PlausibilityEvaluation(models.Model):
     Model for storing evaluator responses for plausibility data.
     """
     plausibility_data = models.ForeignKey(PlausibilityData, on_delete=models.CASCADE, related_name='evaluations')
-    evaluator_name = models.CharField(max_length=100, blank=True, null=True)
-    evaluator_email = models.EmailField(blank=True, null=True)
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='plausibility_evaluations')
     
     # Plausibility ratings for each wrong option (1-5 scale)
     option_1_plausibility = models.IntegerField(
@@ -104,12 +221,193 @@ class PlausibilityEvaluation(models.Model):
     
     comments = models.TextField(blank=True, null=True, help_text="Additional comments")
     created_at = models.DateTimeField(auto_now_add=True)
-    session_id = models.CharField(max_length=100, help_text="Session identifier for grouping responses")
     
     class Meta:
         verbose_name = "Plausibility Evaluation"
         verbose_name_plural = "Plausibility Evaluations"
         ordering = ['-created_at']
+        # The admin changelist filters by option rating and lists newest first
+        indexes = [
+            models.Index(fields=['created_at'], name='plausibilityeval_created_idx'),
+            models.Index(fields=['option_1_plausibility', 'created_at'], name='plausibilityeval_option_1_idx'),
+            models.Index(fields=['option_2_plausibility', 'created_at'], name='plausibilityeval_option_2_idx'),
+            models.Index(fields=['option_3_plausibility', 'created_at'], name='plausibilityeval_option_3_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Plausibility evaluation by {self.submission.evaluator_name or 'Anonymous'}"
+
+
+class DataVersion(models.Model):
+    """
+    Version stamp for a group of tables.
+    Bumped whenever the underlying rows change so per-process caches can tell they are stale.
+    """
+    key = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Data Version"
+        verbose_name_plural = "Data Versions"
+    
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+
+class ItemReservation(models.Model):
+    """
+    An item handed out to an evaluator session that has not been submitted yet.
+    Expired reservations are released so the item becomes under-covered again.
+    """
+    KIND_DIALECT = 'dialect'
+    KIND_PLAUSIBILITY = 'plausibility'
+    KIND_CHOICES = [
+        (KIND_DIALECT, 'Dialect'),
+        (KIND_PLAUSIBILITY, 'Plausibility'),
+    ]
+    
+    session_id = models.CharField(max_length=100, db_index=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    item_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = "Item Reservation"
+        verbose_name_plural = "Item Reservations"
+    
+    def __str__(self):
+        return f"{self.kind} #{self.item_id} for {self.session_id}"
+
+
+class SearchDocument(models.Model):
+    """
+    Search text of one item or evaluation comment, normalized for Bangla.
+    On SQLite it is mirrored into an FTS5 trigram index (see evaluation/search.py).
+    """
+    KIND_DIALECT = 'dialect'
+    KIND_PLAUSIBILITY = 'plausibility'
+    KIND_DIALECT_COMMENT = 'dialect_comment'
+    KIND_PLAUSIBILITY_COMMENT = 'plausibility_comment'
+    KIND_CHOICES = [
+        (KIND_DIALECT, 'Dialect item'),
+        (KIND_PLAUSIBILITY, 'Plausibility item'),
+        (KIND_DIALECT_COMMENT, 'Dialect evaluation comment'),
+        (KIND_PLAUSIBILITY_COMMENT, 'Plausibility evaluation comment'),
+    ]
+    
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    text = models.TextField()
+    
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdocument_object_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+
+class ItemSignature(models.Model):
+    """
+    MinHash signature of an item's text, for near-duplicate detection (see evaluation/near_duplicates.py).
+    """
+    kind = models.CharField(max_length=20, choices=ItemReservation.KIND_CHOICES)
+    item_id = models.BigIntegerField()
+    signature = models.BinaryField()
+    
+    class Meta:
+        verbose_name = "Item Signature"
+        verbose_name_plural = "Item Signatures"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'item_id'], name='itemsignature_item_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Signature of {self.kind} #{self.item_id}"
+
+
+class SignatureBucket(models.Model):
+    """
+    One LSH band of an item signature. Items sharing a bucket are near-duplicate candidates.
+    """
+    kind = models.CharField(max_length=20, choices=ItemReservation.KIND_CHOICES)
+    bucket = models.BigIntegerField()
+    item_id = models.BigIntegerField()
+    
+    class Meta:
+        verbose_name = "Signature Bucket"
+        verbose_name_plural = "Signature Buckets"
+        indexes = [
+            models.Index(fields=['kind', 'bucket'], name='signaturebucket_lookup_idx'),
+            models.Index(fields=['kind', 'item_id'], name='signaturebucket_item_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.item_id} in bucket {self.bucket}"
+
+
+class RatingStatsMixin:
+    """
+    Mean and sample variance computed from running count, sum and sum of squares.
+    """
+    
+    def mean(self, field):
+        if not self.rating_count:
+            return None
+        return getattr(self, f'{field}_sum') / self.rating_count
+    
+    def variance(self, field):
+        n = self.rating_count
+        if n < 2:
+            return None
+        total = getattr(self, f'{field}_sum')
+        return (getattr(self, f'{field}_sum_sq') - total * total / n) / (n - 1)
+
+
+class DialectDataStats(RatingStatsMixin, models.Model):
+    """
+    Running rating statistics for one dialect item, updated with every submission.
+    """
+    RATING_FIELDS = ('accuracy', 'naturalness')
+    
+    dialect_data = models.OneToOneField(DialectData, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    rating_count = models.PositiveIntegerField(default=0)
+    accuracy_sum = models.PositiveBigIntegerField(default=0)
+    accuracy_sum_sq = models.PositiveBigIntegerField(default=0)
+    naturalness_sum = models.PositiveBigIntegerField(default=0)
+    naturalness_sum_sq = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Dialect Data Statistics"
+        verbose_name_plural = "Dialect Data Statistics"
+    
+    def __str__(self):
+        return f"Stats for dialect item #{self.dialect_data_id}"
+
+
+class PlausibilityDataStats(RatingStatsMixin, models.Model):
+    """
+    Running plausibility statistics for one MCQ item, updated with every submission.
+    """
+    RATING_FIELDS = ('option_1', 'option_2', 'option_3')
+    
+    plausibility_data = models.OneToOneField(PlausibilityData, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    rating_count = models.PositiveIntegerField(default=0)
+    option_1_sum = models.PositiveBigIntegerField(default=0)
+    option_1_sum_sq = models.PositiveBigIntegerField(default=0)
+    option_2_sum = models.PositiveBigIntegerField(default=0)
+    option_2_sum_sq = models.PositiveBigIntegerField(default=0)
+    option_3_sum = models.PositiveBigIntegerField(default=0)
+    option_3_sum_sq = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Plausibility Data Statistics"
+        verbose_name_plural = "Plausibility Data Statistics"
     
     def __str__(self):
-        return f"Plausibility evaluation by {self.evaluator_name or 'Anonymous'}"
+        return f"Stats for MCQ item #{self.plausibility_data_id}"
@@ -0,0 +1,364 @@
+"""
+Near-duplicate detection for items with MinHash and locality-sensitive hashing.
+
+content_hash only catches exact duplicates. The AI pipeline also produces
+items that differ by a character or two, and comparing every pair of tens of
+thousands of items is O(n²). Instead each item's normalized text is cut into
+character shingles, and NUM_PERM hash functions of the form (a·x + b) mod p
+give its MinHash signature: the fraction of positions where two signatures
+agree estimates the Jaccard similarity of the two shingle sets. Hashing is
+done with NumPy for all shingles of a batch of items at once.
+
+The signature is split into BANDS bands of ROWS values, and each band is
+hashed into a bucket. Items that agree on a whole band share a bucket, so
+pairs above the threshold share one with high probability while unrelated
+items almost never do. Only items sharing a bucket are compared, using the
+stored signatures. An index can be partitioned by a field (dialect items by
+dialect_name): the partition is mixed into every bucket key, so items of
+different partitions never share a bucket and are never compared. The same
+standard sentence rendered in Sylheti and in Noakhali is two items, not one.
+
+Signatures and buckets are stored per item. The importer writes them for new
+items and the model signals update them on edits and deletes, so checking a
+new item is one indexed bucket query.
+"""
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import DialectData, PlausibilityData, ItemReservation, ItemSignature, SignatureBucket
+from .search import normalize_search_text
+
+SHINGLE_SIZE = 4
+# 16 bands of 6: pairs at 0.8 similarity share a bucket over 99% of the time,
+# pairs at 0.5 about 22% and at 0.3 about 1%
+NUM_PERM = 96
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1
+
+# Fixed seed: stored signatures must stay comparable across processes and restarts
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+# Odd multipliers that mix a band's values, and an offset per band number
+_BAND_MULTIPLIERS = _rng.integers(1, 1 << 63, (BANDS, ROWS), dtype=np.uint64) | np.uint64(1)
+_BAND_OFFSETS = _rng.integers(1, 1 << 63, BANDS, dtype=np.uint64)
+# Mixes a partition's CRC32 into the bucket keys
+_PARTITION_MULTIPLIER = _rng.integers(1, 1 << 63, dtype=np.uint64) | np.uint64(1)
+
+DEFAULT_THRESHOLD = 0.8
+
+# Items per batch when (re)building, and shingles hashed per NumPy operation
+BATCH_SIZE = 1000
+MAX_SHINGLES = 100_000
+
+# Keys per bucket IN query
+QUERY_CHUNK = 900
+
+# Items compared per bucket; larger buckets (many items sharing a band) are truncated
+MAX_BUCKET_ITEMS = 500
+
+
+def default_threshold():
+    return getattr(settings, 'EVALUATION_NEAR_DUPLICATE_THRESHOLD', DEFAULT_THRESHOLD)
+
+
+def shingle_hashes(text):
+    """
+    CRC32 of every distinct SHINGLE_SIZE-character substring of text (of the whole text if shorter).
+    """
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def _minhash(hashes):
+    offsets = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+    shingles = np.concatenate(hashes)
+    # a < 2^31 and shingles < 2^32, so a·x + b fits in 64 bits
+    permuted = (_A[:, None] * shingles[None, :] + _B[:, None]) % PRIME
+    return np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+
+
+def signatures(texts):
+    """
+    MinHash signatures of texts: an (n, NUM_PERM) uint32 array.
+    """
+    rows = []
+    chunk = []
+    size = 0
+    for text in texts:
+        hashes = shingle_hashes(text)
+        if chunk and size + len(hashes) > MAX_SHINGLES:
+            rows.append(_minhash(chunk))
+            chunk, size = [], 0
+        chunk.append(hashes)
+        size += len(hashes)
+    if chunk:
+        rows.append(_minhash(chunk))
+    return np.concatenate(rows) if rows else np.empty((0, NUM_PERM), dtype=np.uint32)
+
+
+def bucket_keys(sigs, partitions=None):
+    """
+    LSH bucket of every band of every signature: an (n, BANDS) int64 array.
+    Equal bands in different positions, or of signatures in different
+    partitions (one string per signature), get different keys.
+    """
+    bands = sigs.astype(np.uint64).reshape(len(sigs), BANDS, ROWS)
+    # Wraps modulo 2^64, which is what a hash wants
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64) + _BAND_OFFSETS
+    if partitions is not None:
+        crcs = np.fromiter((zlib.crc32(partition.encode('utf-8')) for partition in partitions),
+                           dtype=np.uint64, count=len(sigs))
+        keys += (crcs * _PARTITION_MULTIPLIER)[:, None]
+    return keys.view(np.int64)
+
+
+def similarity(a, b):
+    """
+    Estimated Jaccard similarity of two signatures (or row-wise of two arrays of them).
+    """
+    return (a == b).mean(axis=-1)
+
+
+def earlier_matches(sigs, threshold, partitions=None):
+    """
+    For each signature, the most similar earlier row of sigs (in the same partition)
+    at or above threshold, as (row, similarity), or None. Used for near-duplicates
+    within one import batch.
+    """
+    rows_by_key = defaultdict(list)
+    results = []
+    for row, keys in enumerate(bucket_keys(sigs, partitions)):
+        candidates = {earlier for key in keys for earlier in rows_by_key[int(key)]}
+        best = None
+        for earlier in sorted(candidates):
+            score = float(similarity(sigs[row], sigs[earlier]))
+            if score >= threshold and (best is None or score > best[1]):
+                best = (earlier, score)
+        results.append(best)
+        for key in keys:
+            rows_by_key[int(key)].append(row)
+    return results
+
+
+def _encode(sig):
+    return sig.astype('<u4').tobytes()
+
+
+def _decode(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+def _chunks(values, size=QUERY_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class NearDuplicateIndex:
+    """
+    Signatures and LSH buckets of one item table, optionally partitioned by the partition field.
+    """
+
+    def __init__(self, kind, model, fields, partition=None):
+        self.kind = kind
+        self.model = model
+        self.fields = fields
+        self.partition = partition
+        # Fields whose change requires re-indexing an item
+        self.source_fields = fields + ((partition,) if partition else ())
+
+    def text(self, values):
+        """
+        Normalized text of an item, from a mapping of its field values.
+        """
+        return '\n'.join(normalize_search_text(values.get(field) or '') for field in self.fields)
+
+    def signatures(self, rows):
+        return signatures(self.text(values) for values in rows)
+
+    def partitions(self, rows):
+        """
+        Partition of each row (a mapping of field values), or None if the index isn't partitioned.
+        """
+        if not self.partition:
+            return None
+        return [values.get(self.partition) or '' for values in rows]
+
+    def add(self, item_ids, sigs, partitions=None, created=False):
+        """
+        Store the signatures of saved items, replacing older ones unless the items are new.
+        """
+        if not item_ids:
+            return
+        keys = bucket_keys(sigs, partitions)
+        with transaction.atomic():
+            if not created:
+                self.remove(item_ids)
+            ItemSignature.objects.bulk_create([
+                ItemSignature(kind=self.kind, item_id=item_id, signature=_encode(sig))
+                for item_id, sig in zip(item_ids, sigs)
+            ], ignore_conflicts=created)
+            # BANDS rows per item: skip building model instances for them
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {SignatureBucket._meta.db_table} (kind, bucket, item_id) VALUES (%s, %s, %s)',
+                    [(self.kind, int(key), item_id) for item_id, row in zip(item_ids, keys) for key in row],
+                )
+
+    def add_items(self, items, created=False):
+        """
+        Compute and store the signatures of saved model instances.
+        """
+        items = list(items)
+        rows = [item.__dict__ for item in items]
+        self.add([item.pk for item in items], self.signatures(rows), self.partitions(rows), created)
+
+    def remove(self, item_ids):
+        for chunk in _chunks(item_ids):
+            ItemSignature.objects.filter(kind=self.kind, item_id__in=chunk).delete()
+            SignatureBucket.objects.filter(kind=self.kind, item_id__in=chunk).delete()
+
+    def load(self, item_ids):
+        """
+        Stored signatures of item_ids, as {item_id: signature}.
+        """
+        stored = {}
+        for chunk in _chunks(item_ids):
+            rows = ItemSignature.objects.filter(kind=self.kind, item_id__in=chunk).values_list('item_id', 'signature')
+            stored.update((item_id, _decode(data)) for item_id, data in rows)
+        return stored
+
+    def matches(self, sigs, partitions=None, threshold=None):
+        """
+        Stored items similar to each signature: one list of (item_id, similarity), best first, per row.
+        """
+        threshold = default_threshold() if threshold is None else threshold
+        rows_by_key = defaultdict(set)
+        for row, keys in enumerate(bucket_keys(sigs, partitions)):
+            for key in keys:
+                rows_by_key[int(key)].add(row)
+        candidates = defaultdict(set)
+        for chunk in _chunks(rows_by_key):
+            members = defaultdict(list)
+            buckets = SignatureBucket.objects.filter(kind=self.kind, bucket__in=chunk).values_list('bucket', 'item_id')
+            for key, item_id in buckets:
+                if len(members[key]) < MAX_BUCKET_ITEMS:
+                    members[key].append(item_id)
+            for key, item_ids in members.items():
+                for row in rows_by_key[key]:
+                    candidates[row].update(item_ids)
+        stored = self.load({item_id for ids in candidates.values() for item_id in ids})
+        results = []
+        for row, sig in enumerate(sigs):
+            item_ids = [item_id for item_id in candidates.get(row, ()) if item_id in stored]
+            if not item_ids:
+                results.append([])
+                continue
+            scores = similarity(np.array([stored[item_id] for item_id in item_ids]), sig)
+            results.append(sorted(
+                [(item_id, float(score)) for item_id, score in zip(item_ids, scores) if score >= threshold],
+                key=lambda match: -match[1],
+            ))
+        return results
+
+    def clusters(self, item_ids=None, threshold=None):
+        """
+        Groups of near-duplicate items, largest first. Each is a dict with the sorted item_ids
+        and the highest pairwise similarity. item_ids (a list or a values('pk') subquery)
+        limits the result to clusters containing at least one of them.
+        """
+        threshold = default_threshold() if threshold is None else threshold
+        buckets = SignatureBucket.objects.filter(kind=self.kind)
+        if item_ids is not None:
+            buckets = buckets.filter(bucket__in=SignatureBucket.objects.filter(
+                kind=self.kind, item_id__in=item_ids,
+            ).values('bucket'))
+        shared = buckets.order_by().values('bucket').annotate(items=Count('id')).filter(items__gt=1)
+        members = defaultdict(list)
+        rows = SignatureBucket.objects.filter(
+            kind=self.kind, bucket__in=shared.values('bucket'),
+        ).values_list('bucket', 'item_id')
+        for key, item_id in rows.iterator():
+            if len(members[key]) < MAX_BUCKET_ITEMS:
+                members[key].append(item_id)
+
+        pairs = set()
+        for ids in members.values():
+            ids = sorted(set(ids))
+            pairs.update((a, b) for i, a in enumerate(ids) for b in ids[i + 1:])
+        if not pairs:
+            return []
+        stored = self.load({item_id for pair in pairs for item_id in pair})
+        pairs = [pair for pair in pairs if pair[0] in stored and pair[1] in stored]
+        if not pairs:
+            return []
+        left = np.array([stored[a] for a, _ in pairs])
+        right = np.array([stored[b] for _, b in pairs])
+        scores = similarity(left, right)
+
+        edges = [(a, b, float(score)) for (a, b), score in zip(pairs, scores) if score >= threshold]
+
+        # Union-find over the pairs above the threshold
+        parent = {}
+
+        def root(item_id):
+            while parent.setdefault(item_id, item_id) != item_id:
+                parent[item_id] = parent[parent[item_id]]
+                item_id = parent[item_id]
+            return item_id
+
+        for a, b, _ in edges:
+            parent[root(a)] = root(b)
+        groups = defaultdict(list)
+        for item_id in list(parent):
+            groups[root(item_id)].append(item_id)
+        best = defaultdict(float)
+        for a, _, score in edges:
+            best[root(a)] = max(best[root(a)], score)
+        clusters = [{'item_ids': sorted(ids), 'similarity': best[group]} for group, ids in groups.items()]
+        return sorted(clusters, key=lambda cluster: (-len(cluster['item_ids']), -cluster['similarity']))
+
+    def rebuild(self, progress=None):
+        """
+        Recompute every signature of the table. Returns the number of items indexed.
+        """
+        queryset = self.model.objects.only('pk', *self.source_fields).order_by('pk')
+        count = 0
+        with transaction.atomic():
+            ItemSignature.objects.filter(kind=self.kind).delete()
+            SignatureBucket.objects.filter(kind=self.kind).delete()
+            last_id = 0
+            while True:
+                batch = list(queryset.filter(pk__gt=last_id)[:BATCH_SIZE])
+                if not batch:
+                    break
+                self.add_items(batch, created=True)
+                last_id = batch[-1].pk
+                count += len(batch)
+                if progress:
+                    progress(count)
+        return count
+
+
+dialect_near_duplicates = NearDuplicateIndex(
+    ItemReservation.KIND_DIALECT, DialectData, ('original_standard_text', 'ai_generated_dialect_text'),
+    partition='dialect_name',
+)
+plausibility_near_duplicates = NearDuplicateIndex(
+    ItemReservation.KIND_PLAUSIBILITY, PlausibilityData, PlausibilityData.HASH_FIELDS,
+)
+
+INDEXES = {
+    ItemReservation.KIND_DIALECT: dialect_near_duplicates,
+    ItemReservation.KIND_PLAUSIBILITY: plausibility_near_duplicates,
+}
@@ -0,0 +1,91 @@
+"""
+Rendered-page cache for the pages whose HTML is the same for every visitor.
+
+home, thank_you and export_page render templates that don't depend on the
+request, so each process renders every page once, keeps the bytes together
+with a gzipped copy and a content hash, and answers later requests from
+memory: a 304 when the client's If-None-Match matches, otherwise the stored
+bytes in the encoding the client accepts.
+
+Pages are rendered without the request, so context processors can't make
+them vary per visitor. Entries are keyed by the template name and the
+context, so a change of context (e.g. the dialect choices) is a new entry.
+Template edits are picked up on a restart, like the cached template loader,
+or right away under runserver, whose autoreloader clears the cache
+(signals.py).
+"""
+import gzip
+import hashlib
+import threading
+import time
+
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .static_assets import accepted_encodings
+
+
+class CachedPage:
+    """
+    One rendered page: identity and gzip bytes and their validators.
+    """
+
+    def __init__(self, content):
+        self.content = content.encode()
+        self.gzipped = gzip.compress(self.content, mtime=0)
+        digest = hashlib.sha256(self.content).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        # The gzip bytes are a different representation and need their own tag
+        self.gzip_etag = f'"{digest}-gzip"'
+        self.last_modified = time.time()
+
+
+class PageCache:
+    """
+    Rendered pages of this process by (template name, context).
+    """
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_name, context=None):
+        key = (template_name, repr(sorted((context or {}).items())))
+        page = self._pages.get(key)
+        if page is None:
+            page = CachedPage(render_to_string(template_name, context))
+            with self._lock:
+                page = self._pages.setdefault(key, page)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+page_cache = PageCache()
+
+
+def cached_page_response(request, template_name, context=None, cache_control='no-cache'):
+    """
+    Response for a request-independent page, served from page_cache.
+    cache_control 'no-cache' lets browsers and proxies keep the page but
+    makes them revalidate it, which costs a 304 when nothing changed.
+    """
+    page = page_cache.get(template_name, context)
+    if 'gzip' in accepted_encodings(request):
+        content, etag, encoding = page.gzipped, page.gzip_etag, 'gzip'
+    else:
+        content, etag, encoding = page.content, page.etag, None
+    response = get_conditional_response(request, etag=etag, last_modified=int(page.last_modified))
+    if response is None:
+        response = HttpResponse(content)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(page.last_modified)
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
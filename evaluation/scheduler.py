@@ -0,0 +1,188 @@
+"""
+Coverage-balanced item scheduler.
+
+Every item carries an assigned_count (handed out and not released) and a
+completed_count (submitted ratings). Sessions are given the k items with the
+lowest assigned_count, read straight off the (group, assigned_count) index,
+and each hand-out is recorded as an ItemReservation. Reservations that are
+never submitted are released after EVALUATION_RESERVATION_TIMEOUT seconds so
+the item moves back to the front of the queue.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .item_pool import dialect_pool, plausibility_pool
+from .models import DialectData, PlausibilityData, ItemReservation
+from .write_lock import locked_write
+
+# How many low-coverage candidates to read per requested item, so ties can be
+# broken randomly instead of always handing out the same rows.
+CANDIDATE_FACTOR = 4
+
+# Minimum number of seconds between two sweeps of expired reservations in one process.
+RELEASE_INTERVAL = 60
+RELEASE_BATCH_SIZE = 500
+
+_release_lock = threading.Lock()
+_last_release = 0.0
+
+
+def reservation_timeout():
+    return timedelta(seconds=getattr(settings, 'EVALUATION_RESERVATION_TIMEOUT', 2 * 60 * 60))
+
+
+def _apply_counts(model, counts, **fields):
+    """
+    Add count * delta to each field for every item in counts, one UPDATE per distinct count.
+    """
+    by_count = {}
+    for pk, n in counts.items():
+        by_count.setdefault(n, []).append(pk)
+    for n, ids in by_count.items():
+        model.objects.filter(id__in=ids).update(**{
+            field: F(field) + n * delta if delta > 0 else Greatest(F(field) + n * delta, Value(0))
+            for field, delta in fields.items()
+        })
+
+
+class ItemScheduler:
+    """
+    Hands out the least-covered items of one model, optionally partitioned by a field.
+    """
+
+    def __init__(self, model, kind, pool, group_field=None):
+        self.model = model
+        self.kind = kind
+        self.pool = pool
+        self.group_field = group_field
+
+    def _candidates(self, k, group):
+        queryset = self.model.objects.all()
+        if self.group_field:
+            queryset = queryset.filter(**{self.group_field: group})
+        return list(
+            queryset.order_by('assigned_count').values_list('id', 'assigned_count')[:k * CANDIDATE_FACTOR]
+        )
+
+    @staticmethod
+    def _pick(candidates, k):
+        """
+        Take every candidate below the k-th lowest coverage, then fill up randomly among the ties.
+        """
+        if len(candidates) <= k:
+            return [pk for pk, _ in candidates]
+        boundary = candidates[k - 1][1]
+        chosen = [pk for pk, count in candidates if count < boundary]
+        ties = [pk for pk, count in candidates if count == boundary]
+        chosen += random.sample(ties, k - len(chosen))
+        random.shuffle(chosen)
+        return chosen
+
+    def assign(self, k, session_id, group=None):
+        """
+        Reserve up to k of the least-covered items for session_id and return their rows.
+        """
+        release_expired()
+        chosen = self._reserve(k, session_id, group)
+        return self.pool.fetch(chosen)
+
+    @locked_write
+    def _reserve(self, k, session_id, group):
+        expires_at = timezone.now() + reservation_timeout()
+        with transaction.atomic():
+            chosen = self._pick(self._candidates(k, group), k)
+            ItemReservation.objects.bulk_create([
+                ItemReservation(session_id=session_id, kind=self.kind, item_id=pk, expires_at=expires_at)
+                for pk in chosen
+            ])
+            self.model.objects.filter(id__in=chosen).update(assigned_count=F('assigned_count') + 1)
+        return chosen
+
+    def complete(self, session_id, item_ids):
+        """
+        Record submitted ratings for item_ids and settle the session's reservations.
+        Must be called inside the submission transaction.
+        """
+        reservations = ItemReservation.objects.filter(session_id=session_id, kind=self.kind)
+        reserved = Counter(reservations.values_list('item_id', flat=True))
+        submitted = Counter(item_ids)
+
+        # Ratings for items this session never reserved (expired or old clients)
+        # still count as an assignment.
+        unreserved = submitted - reserved
+        _apply_counts(self.model, submitted - unreserved, completed_count=1)
+        _apply_counts(self.model, unreserved, assigned_count=1, completed_count=1)
+
+        # Anything handed out but not rated goes back to the queue.
+        _apply_counts(self.model, reserved - submitted, assigned_count=-1)
+        reservations.delete()
+
+
+dialect_scheduler = ItemScheduler(DialectData, ItemReservation.KIND_DIALECT, dialect_pool, group_field='dialect_name')
+plausibility_scheduler = ItemScheduler(PlausibilityData, ItemReservation.KIND_PLAUSIBILITY, plausibility_pool)
+
+SCHEDULERS = {
+    ItemReservation.KIND_DIALECT: dialect_scheduler,
+    ItemReservation.KIND_PLAUSIBILITY: plausibility_scheduler,
+}
+
+
+def release_expired(force=False):
+    """
+    Release reservations whose session never submitted in time.
+    Runs at most once per RELEASE_INTERVAL per process unless force is set.
+    Returns the number of reservations released.
+    """
+    global _last_release
+    with _release_lock:
+        if not force and time.monotonic() - _last_release < RELEASE_INTERVAL:
+            return 0
+        _last_release = time.monotonic()
+
+    now = timezone.now()
+    # Check with a plain read first, so an idle sweep never takes the write lock
+    if not ItemReservation.objects.filter(expires_at__lt=now).exists():
+        return 0
+    released = 0
+    while True:
+        count = _release_batch(now)
+        if not count:
+            break
+        released += count
+    return released
+
+
+@locked_write
+def _release_batch(now):
+    with transaction.atomic():
+        rows = list(
+            ItemReservation.objects.filter(expires_at__lt=now)
+            .order_by('expires_at')
+            .values_list('id', 'kind', 'item_id')[:RELEASE_BATCH_SIZE]
+        )
+        for kind, scheduler in SCHEDULERS.items():
+            counts = Counter(item_id for _, row_kind, item_id in rows if row_kind == kind)
+            _apply_counts(scheduler.model, counts, assigned_count=-1)
+        ItemReservation.objects.filter(id__in=[pk for pk, _, _ in rows]).delete()
+    return len(rows)
+
+
+def complete_session(session_id, dialect_ids, plausibility_ids):
+    """
+    Settle all reservations of a submitted session.
+    """
+    dialect_scheduler.complete(session_id, dialect_ids)
+    plausibility_scheduler.complete(session_id, plausibility_ids)
+
+
+def use_balanced_selection():
+    return getattr(settings, 'EVALUATION_ITEM_SELECTION', 'balanced') == 'balanced'
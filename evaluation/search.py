@@ -0,0 +1,234 @@
+"""
+Full-text search over item texts and evaluation comments.
+
+Every indexed row has a SearchDocument holding its text normalized for
+Bangla (normalize_search_text). On SQLite the documents are mirrored into
+an FTS5 table with the trigram tokenizer by SQL triggers on the document
+table, so a search for any fragment of three or more characters is an index
+lookup, ranked by bm25. On other databases, or SQLite builds without FTS5,
+search falls back to substring matches over the normalized documents.
+
+Documents are written by the model signals (admin edits and deletes) and
+by the bulk paths that bypass them: the importer and the submission writer.
+rebuild() recreates all of them (manage.py rebuild_search_index).
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import (
+    DialectData, PlausibilityData, DialectEvaluation, PlausibilityEvaluation, SearchDocument, normalize_text,
+)
+
+FTS_TABLE = 'evaluation_searchdocument_fts'
+
+# Searchable fields per document kind
+SOURCES = {
+    SearchDocument.KIND_DIALECT: (DialectData, ('original_standard_text', 'ai_generated_dialect_text')),
+    SearchDocument.KIND_PLAUSIBILITY: (
+        PlausibilityData, ('question', 'correct_answer', 'wrong_option_1', 'wrong_option_2', 'wrong_option_3'),
+    ),
+    SearchDocument.KIND_DIALECT_COMMENT: (DialectEvaluation, ('comments',)),
+    SearchDocument.KIND_PLAUSIBILITY_COMMENT: (PlausibilityEvaluation, ('comments',)),
+}
+
+COMMENT_KINDS = (SearchDocument.KIND_DIALECT_COMMENT, SearchDocument.KIND_PLAUSIBILITY_COMMENT)
+
+# Trigram index: shorter terms can't be looked up and are matched with LIKE
+MIN_TERM_LENGTH = 3
+
+# Without FTS, at most this many matching documents are scored for ranking
+FALLBACK_CANDIDATES = 1000
+
+REBUILD_BATCH_SIZE = 2000
+
+ZERO_WIDTH_RE = re.compile('[\u200b\u200c\u200d\u2060\ufeff]')
+# Khanda ta in the older encoding: ta, hasant, zero-width joiner
+KHANDA_TA_RE = re.compile('\u09a4\u09cd\u200d')
+KHANDA_TA = '\u09ce'
+# Long and short vowels are used interchangeably in dialect spellings
+VOWEL_FOLDS = str.maketrans({
+    '\u09c0': '\u09bf',  # vowel sign ii -> i
+    '\u09c2': '\u09c1',  # vowel sign uu -> u
+    '\u0988': '\u0987',  # letter ii -> i
+    '\u098a': '\u0989',  # letter uu -> u
+})
+
+_fts_tables = {}
+
+
+def normalize_search_text(value):
+    """
+    Form that documents and queries are compared in: khanda ta as one letter, zero-width
+    joiners and non-joiners removed (so split vowel signs compose under NFC), long vowels
+    folded onto short ones, case folded and whitespace collapsed.
+    """
+    value = ZERO_WIDTH_RE.sub('', KHANDA_TA_RE.sub(KHANDA_TA, str(value)))
+    return normalize_text(value).translate(VOWEL_FOLDS).casefold()
+
+
+def document_text(kind, obj):
+    """
+    Normalized search text of obj, one line per field; empty if obj has no text.
+    """
+    _, fields = SOURCES[kind]
+    parts = (normalize_search_text(getattr(obj, field) or '') for field in fields)
+    return '\n'.join(part for part in parts if part)
+
+
+def index(kind, objects, created=False):
+    """
+    Write the search documents of saved objects of kind. Objects without text lose
+    their document, unless created is set (a new row has none to remove).
+    """
+    documents = []
+    empty = []
+    for obj in objects:
+        text = document_text(kind, obj)
+        if text:
+            documents.append(SearchDocument(kind=kind, object_id=obj.pk, text=text))
+        else:
+            empty.append(obj.pk)
+    if documents:
+        SearchDocument.objects.bulk_create(
+            documents, update_conflicts=True, unique_fields=['kind', 'object_id'], update_fields=['text'],
+        )
+    if empty and not created:
+        remove(kind, empty)
+
+
+def remove(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def rebuild(kinds=None, batch_size=REBUILD_BATCH_SIZE, progress=None):
+    """
+    Recreate the documents of the given kinds (default: all) from the source tables.
+    progress, if given, is called with (kind, documents indexed so far).
+    Returns the number of rows indexed.
+    """
+    total = 0
+    for kind in kinds or SOURCES:
+        model, fields = SOURCES[kind]
+        queryset = model.objects.only('pk', *fields).order_by('pk')
+        if kind in COMMENT_KINDS:
+            queryset = queryset.exclude(comments__isnull=True).exclude(comments='')
+        with transaction.atomic():
+            SearchDocument.objects.filter(kind=kind).delete()
+            last_id = 0
+            while True:
+                batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                index(kind, batch, created=True)
+                last_id = batch[-1].pk
+                total += len(batch)
+                if progress:
+                    progress(kind, total)
+    return total
+
+
+def fts_enabled():
+    """
+    Whether the FTS5 table exists in the current database (checked once per database).
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    key = connection.settings_dict['NAME']
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+def search_terms(query):
+    return normalize_search_text(query).split()
+
+
+def _like(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _fts_match(terms, kinds, select, order_limit=None):
+    """
+    SQL and params selecting from the FTS index the documents of kinds that contain every term.
+    Returns None when no term is long enough for a trigram lookup.
+    """
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    if not long_terms:
+        return None
+    # CROSS JOIN keeps the index match as the outer loop; otherwise SQLite may
+    # walk every document of the kind and run the match once per document
+    sql = (
+        f'SELECT {select} FROM {FTS_TABLE} '
+        f'CROSS JOIN evaluation_searchdocument d ON d.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND d.kind IN ({", ".join(["%s"] * len(kinds))})'
+    )
+    params = [' '.join('"%s"' % term.replace('"', '""') for term in long_terms), *kinds]
+    for term in terms:
+        if len(term) < MIN_TERM_LENGTH:
+            sql += " AND d.text LIKE %s ESCAPE '\\'"
+            params.append(_like(term))
+    if order_limit:
+        sql += f' ORDER BY {order_limit[0]} LIMIT %s'
+        params.append(order_limit[1])
+    return sql, params
+
+
+def _fallback_documents(terms, kinds):
+    documents = SearchDocument.objects.filter(kind__in=kinds)
+    for term in terms:
+        documents = documents.filter(text__contains=term)
+    return documents
+
+
+def object_ids(kind, query):
+    """
+    Subquery of the ids of kind's rows matching query, for filter(pk__in=...),
+    or None if the query has no terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+    if fts_enabled():
+        match = _fts_match(terms, [kind], 'd.object_id')
+        if match:
+            return RawSQL(*match)
+    return _fallback_documents(terms, [kind]).values('object_id')
+
+
+def filter_queryset(queryset, kind, query):
+    """
+    Narrow queryset to the rows of kind matching query (unchanged for an empty query).
+    """
+    ids = object_ids(kind, query)
+    return queryset if ids is None else queryset.filter(pk__in=ids)
+
+
+def search(query, kinds=None, limit=20):
+    """
+    Documents matching every term of query, best first: a list of (kind, object_id, score).
+    Scores are comparable within one search only.
+    """
+    terms = search_terms(query)
+    kinds = list(kinds or SOURCES)
+    if not terms:
+        return []
+    match = fts_enabled() and _fts_match(
+        terms, kinds, f'd.kind, d.object_id, -bm25({FTS_TABLE})', order_limit=(f'bm25({FTS_TABLE})', limit),
+    )
+    if match:
+        with connection.cursor() as cursor:
+            cursor.execute(*match)
+            return [(kind, object_id, score) for kind, object_id, score in cursor.fetchall()]
+    # Rank by occurrences per character among the first candidates
+    candidates = _fallback_documents(terms, kinds).values_list('kind', 'object_id', 'text')[:FALLBACK_CANDIDATES]
+    scored = [
+        (kind, object_id, sum(text.count(term) for term in terms) / len(text))
+        for kind, object_id, text in candidates
+    ]
+    scored.sort(key=lambda result: -result[2])
+    return scored[:limit]
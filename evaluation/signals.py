@@ -0,0 +1,155 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.autoreload import file_changed
+
+from . import search
+from .near_duplicates import dialect_near_duplicates, plausibility_near_duplicates
+from .item_stats import dialect_stats, plausibility_stats
+from .models import (
+    DialectData, PlausibilityData, Submission, DialectEvaluation, PlausibilityEvaluation, SearchDocument,
+)
+from .metrics import install_query_recorder
+from .page_cache import page_cache
+from .versioning import EVALUATIONS, ITEMS, bump_version
+
+# Count queries per request for the metrics middleware
+connection_created.connect(install_query_recorder)
+
+
+@receiver(post_save, sender=DialectData)
+@receiver(post_delete, sender=DialectData)
+@receiver(post_save, sender=PlausibilityData)
+@receiver(post_delete, sender=PlausibilityData)
+def items_changed(sender, **kwargs):
+    """
+    Invalidate item pools in every worker when evaluation items change.
+    """
+    bump_version(ITEMS)
+
+
+@receiver(post_save, sender=DialectEvaluation)
+@receiver(post_delete, sender=DialectEvaluation)
+@receiver(post_save, sender=PlausibilityEvaluation)
+@receiver(post_delete, sender=PlausibilityEvaluation)
+def evaluations_changed(sender, **kwargs):
+    """
+    Invalidate cached analytics when ratings are edited or deleted.
+    New submissions bump the version in the submit transaction.
+    """
+    bump_version(EVALUATIONS)
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def submission_changed(sender, created=False, **kwargs):
+    """
+    Outdate snapshots (evaluation/snapshots.py) when a submission is edited or
+    deleted, e.g. an evaluator's email removed on request.
+    New submissions bump the version in the submit transaction.
+    """
+    if not created:
+        bump_version(EVALUATIONS)
+
+
+STATS = {
+    DialectEvaluation: dialect_stats,
+    PlausibilityEvaluation: plausibility_stats,
+}
+
+
+@receiver(pre_save, sender=DialectEvaluation)
+@receiver(pre_save, sender=PlausibilityEvaluation)
+def evaluation_saving(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the stored ratings of an evaluation edited one by one (e.g. in
+    the admin), so evaluation_saved can move its stats contribution.
+    Submissions use bulk_create and keep their stats up to date themselves.
+    """
+    stats = STATS[sender]
+    instance._stats_row = None
+    if instance.pk is not None and text_changed(stats.tracked_fields(), update_fields):
+        instance._stats_row = stats.stored_row(instance.pk)
+
+
+@receiver(post_save, sender=DialectEvaluation)
+@receiver(post_save, sender=PlausibilityEvaluation)
+def evaluation_saved(sender, instance, created, update_fields=None, **kwargs):
+    stats = STATS[sender]
+    if created or text_changed(stats.tracked_fields(), update_fields):
+        stats.replace_instance(getattr(instance, '_stats_row', None), instance)
+
+
+@receiver(post_delete, sender=DialectEvaluation)
+@receiver(post_delete, sender=PlausibilityEvaluation)
+def evaluation_deleted(sender, instance, **kwargs):
+    STATS[sender].remove_instance(instance)
+
+
+def text_changed(fields, update_fields):
+    """
+    Whether a save with update_fields may have changed any of fields.
+    """
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+SEARCH_KINDS = {
+    DialectData: SearchDocument.KIND_DIALECT,
+    PlausibilityData: SearchDocument.KIND_PLAUSIBILITY,
+    DialectEvaluation: SearchDocument.KIND_DIALECT_COMMENT,
+    PlausibilityEvaluation: SearchDocument.KIND_PLAUSIBILITY_COMMENT,
+}
+
+
+@receiver(post_save, sender=DialectData)
+@receiver(post_save, sender=PlausibilityData)
+@receiver(post_save, sender=DialectEvaluation)
+@receiver(post_save, sender=PlausibilityEvaluation)
+def searchable_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the search index in step with single-row saves. Bulk writes index their rows themselves.
+    """
+    kind = SEARCH_KINDS[sender]
+    if text_changed(search.SOURCES[kind][1], update_fields):
+        search.index(kind, [instance], created=created)
+
+
+@receiver(post_delete, sender=DialectData)
+@receiver(post_delete, sender=PlausibilityData)
+@receiver(post_delete, sender=DialectEvaluation)
+@receiver(post_delete, sender=PlausibilityEvaluation)
+def searchable_deleted(sender, instance, **kwargs):
+    search.remove(SEARCH_KINDS[sender], [instance.pk])
+
+
+NEAR_DUPLICATE_INDEXES = {
+    DialectData: dialect_near_duplicates,
+    PlausibilityData: plausibility_near_duplicates,
+}
+
+
+@receiver(post_save, sender=DialectData)
+@receiver(post_save, sender=PlausibilityData)
+def item_signature_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the near-duplicate index in step with single-item saves. The importer indexes its own rows.
+    """
+    index = NEAR_DUPLICATE_INDEXES[sender]
+    if text_changed(index.source_fields, update_fields):
+        index.add_items([instance], created=created)
+
+
+@receiver(post_delete, sender=DialectData)
+@receiver(post_delete, sender=PlausibilityData)
+def item_signature_deleted(sender, instance, **kwargs):
+    NEAR_DUPLICATE_INDEXES[sender].remove([instance.pk])
+
+
+@receiver(file_changed, dispatch_uid='evaluation_page_cache')
+def source_file_changed(sender, file_path, **kwargs):
+    """
+    runserver reloads templates without restarting; drop the pages rendered from the old ones.
+    Python changes restart the process anyway.
+    """
+    if file_path.suffix != '.py':
+        page_cache.clear()
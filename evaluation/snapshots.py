@@ -0,0 +1,375 @@
+"""
+SQLite snapshots of the evaluation data for analysts.
+
+A snapshot is a standalone SQLite file holding the export tables
+(dialect_data, plausibility_data, submissions, dialect_evaluations,
+plausibility_evaluations) that analysts can open with sqlite3, pandas or
+DuckDB instead of paging through the JSON export.
+
+A build takes three steps:
+- The online backup API copies the live database into a private work file.
+  The copy is one read transaction, so it is consistent, and under WAL
+  (BANGLAVERSE_SQLITE_PROFILE=production) writers are not blocked while it runs.
+- The requested tables and columns are copied out of the work file into a fresh
+  database. evaluator_email is left out unless the snapshot asks for PII.
+  Nothing else from the live database reaches the snapshot: no sessions,
+  no users, and no free pages holding deleted rows.
+- The result is gzipped next to the other snapshots, under a name made of the
+  options and the data version recorded in the copy.
+
+Builds run in a background thread. The request that asks for a projection
+with no snapshot yet gets 202 and polls. Once one exists, the newest finished
+snapshot is always served, with its version in X-Snapshot-Version. When the
+data has moved on, a rebuild starts in the background, at most once every
+REBUILD_INTERVAL, so submissions arriving during a campaign don't keep
+analysts waiting. Older snapshots are deleted once a newer one is written.
+The download honours Range and If-Range, so a large snapshot can be resumed.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .analytics import data_version, parse_version
+from .exporters import EXPORTS
+from .models import DataVersion
+from .versioning import EVALUATIONS, ITEMS
+
+logger = logging.getLogger(__name__)
+
+# Columns left out unless the snapshot asks for PII, by table
+PII_COLUMNS = {
+    'submissions': ('evaluator_email',),
+}
+
+# Seconds a client is told to wait before asking again for a snapshot being built
+BUILD_RETRY_AFTER = 5
+
+# Seconds a snapshot is served before a newer data version triggers a rebuild
+REBUILD_INTERVAL = 60
+
+# Bytes read per chunk when serving a range
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class SnapshotError(ValueError):
+    """
+    The snapshot request can't be served (bad options, or not a SQLite database).
+    """
+
+
+def snapshot_dir():
+    return str(getattr(settings, 'EVALUATION_SNAPSHOT_DIR', settings.BASE_DIR / 'var' / 'snapshots'))
+
+
+def build_in_background():
+    return getattr(settings, 'EVALUATION_SNAPSHOT_BACKGROUND', True)
+
+
+def table_columns(table):
+    model = EXPORTS[table][0]
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def projection(columns=None, include_pii=False):
+    """
+    Tables and columns of a snapshot. columns is a comma-separated list of
+    table.column entries (submissions.created_at,dialect_evaluations.accuracy_rating);
+    a table that is listed keeps only those columns and its id, the others keep all of theirs.
+    """
+    selected = {}
+    for entry in (columns or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        table, _, column = entry.partition('.')
+        if table not in EXPORTS:
+            raise SnapshotError(f'Unknown table: {table}. Choose from {", ".join(EXPORTS)}.')
+        if column not in table_columns(table):
+            raise SnapshotError(f'Unknown column: {entry}')
+        selected.setdefault(table, {'id'}).add(column)
+
+    tables = {}
+    for table in EXPORTS:
+        kept = [column for column in table_columns(table) if table not in selected or column in selected[table]]
+        if not include_pii:
+            kept = [column for column in kept if column not in PII_COLUMNS.get(table, ())]
+        tables[table] = kept
+    return tables
+
+
+def projection_digest(tables):
+    return hashlib.sha256(repr(sorted(tables.items())).encode()).hexdigest()[:16]
+
+
+def snapshot_name(digest, version):
+    return f'snapshot-{digest}-{version}.sqlite3.gz'
+
+
+def snapshot_version(path):
+    """
+    Data version a snapshot file was built from, taken from its name.
+    """
+    return os.path.basename(path)[len('snapshot-'):-len('.sqlite3.gz')].split('-', 1)[1]
+
+
+def snapshots_of(digest):
+    """
+    Finished snapshots of one projection as {version tuple: path}.
+    """
+    prefix = f'snapshot-{digest}-'
+    try:
+        names = os.listdir(snapshot_dir())
+    except FileNotFoundError:
+        return {}
+    found = {}
+    for name in names:
+        if name.startswith(prefix) and name.endswith('.sqlite3.gz'):
+            path = os.path.join(snapshot_dir(), name)
+            try:
+                found[parse_version(snapshot_version(path))] = path
+            except ValueError:
+                continue
+    return found
+
+
+def latest_snapshot(digest):
+    """
+    Path of the newest finished snapshot of a projection, or None.
+    Both version counters only grow, so the largest pair is the newest copy.
+    """
+    found = snapshots_of(digest)
+    return found[max(found)] if found else None
+
+
+def _copy_tables(work_path, path, tables):
+    """
+    Copy the tables and columns of the work file into a new database at path,
+    keeping the declared column types.
+    """
+    db = sqlite3.connect(path, isolation_level=None)
+    try:
+        db.execute('ATTACH DATABASE ? AS work', (work_path,))
+        db.execute('BEGIN')
+        for table, columns in tables.items():
+            source = EXPORTS[table][0]._meta.db_table
+            types = {row[1]: row[2] for row in db.execute(f'PRAGMA work.table_info("{source}")')}
+            definitions = ', '.join(
+                f'"{column}" {types[column]}' + (' PRIMARY KEY' if column == 'id' else '') for column in columns
+            )
+            names = ', '.join(f'"{column}"' for column in columns)
+            db.execute(f'CREATE TABLE "{table}" ({definitions})')
+            db.execute(f'INSERT INTO "{table}" ({names}) SELECT {names} FROM work."{source}"')
+            # Analysts join the evaluations to their items and submissions
+            for column in columns:
+                if column.endswith('_id'):
+                    db.execute(f'CREATE INDEX "{table}_{column}" ON "{table}" ("{column}")')
+        db.execute('COMMIT')
+        db.execute('DETACH DATABASE work')
+    finally:
+        db.close()
+
+
+def _work_version(work_path):
+    """
+    Data version recorded in the backed-up copy, i.e. the version of the data it holds.
+    """
+    db = sqlite3.connect(work_path)
+    try:
+        versions = dict(db.execute(f'SELECT key, version FROM "{DataVersion._meta.db_table}"'))
+    finally:
+        db.close()
+    return f'{versions.get(ITEMS, 0)}.{versions.get(EVALUATIONS, 0)}'
+
+
+def build(tables):
+    """
+    Write a gzipped snapshot of tables ({table: columns}) to the snapshot directory.
+    Uses the calling thread's database connection. Returns the path.
+    """
+    connection.ensure_connection()
+    if connection.vendor != 'sqlite':
+        raise SnapshotError('Snapshots need the SQLite database backend.')
+    directory = snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as work:
+        work_path = os.path.join(work, 'work.sqlite3')
+        snapshot_path = os.path.join(work, 'snapshot.sqlite3')
+        copy = sqlite3.connect(work_path)
+        try:
+            connection.connection.backup(copy)
+        finally:
+            copy.close()
+        # Read the version from the copy: rows written after data_version() was
+        # last checked are in the copy too, and the name must not understate them
+        version = _work_version(work_path)
+        _copy_tables(work_path, snapshot_path, tables)
+        os.remove(work_path)
+        compressed = snapshot_path + '.gz'
+        with open(snapshot_path, 'rb') as source, open(compressed, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as target:
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+        path = os.path.join(directory, snapshot_name(projection_digest(tables), version))
+        # Another process building the same snapshot may win; both files are the same data
+        os.replace(compressed, path)
+    return path
+
+
+class SnapshotBuilder:
+    """
+    Builds snapshots in background threads, at most one at a time per
+    projection, and remembers the projections being built.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._building = set()
+
+    def get(self, tables):
+        """
+        Path of the newest finished snapshot of tables, or None if there is none yet.
+        Starts a build when that snapshot is behind the current data version
+        and older than REBUILD_INTERVAL, so a busy campaign doesn't keep the
+        builder copying the database back to back.
+        """
+        digest = projection_digest(tables)
+        path = latest_snapshot(digest)
+        if path is not None and snapshot_version(path) == data_version():
+            return path
+        if not build_in_background():
+            self._build(tables)
+            return latest_snapshot(digest)
+        if path is None or time.time() - os.path.getmtime(path) >= REBUILD_INTERVAL:
+            with self._lock:
+                start = digest not in self._building
+                self._building.add(digest)
+            if start:
+                self._start(tables)
+        return path
+
+    def building(self):
+        with self._lock:
+            return set(self._building)
+
+    def _build(self, tables):
+        path = build(tables)
+        remove_outdated(path)
+
+    def _start(self, tables):
+        thread = threading.Thread(target=self._run, args=(tables,), name='snapshot-builder', daemon=True)
+        thread.start()
+
+    def _run(self, tables):
+        try:
+            self._build(tables)
+        except Exception:
+            logger.exception('Building a snapshot failed')
+        finally:
+            with self._lock:
+                self._building.discard(projection_digest(tables))
+            # The builder has its own connection; don't leave it open
+            connection.close()
+
+
+snapshot_builder = SnapshotBuilder()
+
+
+def remove_outdated(path):
+    """
+    Delete the snapshots of the same projection that are older than the one at path.
+    Newer ones (a later build that finished first) are kept.
+    """
+    digest = os.path.basename(path)[len('snapshot-'):].split('-', 1)[0]
+    written = parse_version(snapshot_version(path))
+    for version, other in snapshots_of(digest).items():
+        if version != written and version[0] <= written[0] and version[1] <= written[1]:
+            try:
+                os.remove(other)
+            except FileNotFoundError:
+                pass
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single-range Range header, inclusive; None to serve the whole
+    file (no header, or one this doesn't handle); 'unsatisfiable' if it is past the end.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N is the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return 'unsatisfiable'
+    if end < start:
+        return None
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def snapshot_response(request, path, filename):
+    """
+    Download of the snapshot at path, with Range (one range), If-Range and If-None-Match support.
+    """
+    stats = os.stat(path)
+    etag = f'"{os.path.basename(path)[:-len(".sqlite3.gz")]}-{stats.st_mtime_ns:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stats.st_mtime))
+    if response is None:
+        requested = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        # A stale If-Range gets the whole new file instead of a piece of it
+        if requested and if_range and if_range != etag:
+            requested = None
+        span = byte_range(requested, stats.st_size)
+        if span == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stats.st_size}'
+        elif span is None:
+            response = FileResponse(open(path, 'rb'), content_type='application/gzip')
+        else:
+            start, end = span
+            response = StreamingHttpResponse(
+                _read_range(path, start, end - start + 1), status=206, content_type='application/gzip',
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{stats.st_size}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Accept-Ranges'] = 'bytes'
+    # The data version the file holds; it can be behind the live data while a rebuild runs
+    response['X-Snapshot-Version'] = snapshot_version(path)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stats.st_mtime)
+    # Staff only, and outdated as soon as a submission comes in
+    response['Cache-Control'] = 'private, no-cache'
+    return response
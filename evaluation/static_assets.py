@@ -0,0 +1,199 @@
+"""
+Content-hashed, precompressed static files served by Django itself.
+
+collectstatic with CompressedManifestStaticFilesStorage is the build step:
+besides the usual copy into STATIC_ROOT it writes content-hashed copies
+(base.3f9c2a1b7e4d.css) with a manifest that {% static %} resolves names
+through, and next to every hashed text asset a .gz variant (and a .br one
+when the brotli package is installed). Since a hashed name changes with the
+content, StaticAssetMiddleware can serve those files with a one-year
+immutable Cache-Control and pick the smallest variant the client accepts,
+without a separate web server in front of the app.
+
+With DEBUG on, {% static %} returns the plain names and runserver serves
+them from the app directories as before.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import stat
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml')
+
+# A variant is only kept if it saves at least this fraction of the size
+MIN_SAVING = 0.05
+
+# Best encoding first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# ManifestStaticFilesStorage appends the first 12 hex digits of the MD5 of the content
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Unhashed names keep their URL across deploys, so clients must revalidate them
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+
+def compress(path):
+    """
+    Write the .gz (and .br) variants of the file at path that are worth keeping.
+    Returns the encodings written.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('gzip', '.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ('br', '.br', brotli.compress(data)))
+    written = []
+    for encoding, suffix, compressed in variants:
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(encoding)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also precompresses the hashed text assets.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                compress(self.path(hashed_name))
+
+
+def static_prefix():
+    prefix = settings.STATIC_URL or ''
+    if '://' in prefix:
+        return None
+    return '/' + prefix.strip('/') + '/'
+
+
+def accepted_encodings(request):
+    """
+    Content codings the client accepts (those not refused with q=0).
+    """
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, quality = part.partition(';')
+        quality = quality.strip().lower()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    Serves GET and HEAD requests for files in STATIC_ROOT: the precompressed
+    variant the client accepts, a far-future Cache-Control for hashed names,
+    and 304s for If-Modified-Since. Other requests, and names that aren't in
+    STATIC_ROOT, go on to the views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        name = self.static_name(request)
+        if name is not None:
+            response = self.serve(request, name)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        name = self.static_name(request)
+        if name is not None:
+            # The file system calls run in a thread. Static files are small, so
+            # they are read whole instead of streamed from a sync iterator.
+            response = await sync_to_async(self.serve, thread_sensitive=False)(request, name, stream=False)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def static_name(self, request):
+        """
+        Name under STATIC_ROOT that a GET or HEAD request asks for, or None if it isn't a static URL.
+        """
+        prefix = static_prefix()
+        if (
+            prefix and settings.STATIC_ROOT and request.method in ('GET', 'HEAD')
+            and request.path_info.startswith(prefix)
+        ):
+            return request.path_info[len(prefix):]
+        return None
+
+    def serve(self, request, name, stream=True):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+            stats = os.stat(path)
+        except (SuspiciousFileOperation, ValueError, OSError):
+            return None
+        if not stat.S_ISREG(stats.st_mode):
+            return None
+        cache_control = IMMUTABLE if HASHED_NAME_RE.search(name) else REVALIDATE
+        if not was_modified_since(request.headers.get('If-Modified-Since'), stats.st_mtime):
+            response = HttpResponseNotModified()
+            response['Cache-Control'] = cache_control
+            return response
+
+        content_type, _ = mimetypes.guess_type(path)
+        encoding = None
+        served = path
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            accepted = accepted_encodings(request)
+            for candidate, suffix in ENCODINGS:
+                if candidate in accepted and os.path.exists(path + suffix):
+                    encoding, served = candidate, path + suffix
+                    break
+        content_type = content_type or 'application/octet-stream'
+        if stream:
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+        else:
+            with open(served, 'rb') as f:
+                response = HttpResponse(f.read(), content_type=content_type)
+        response['Last-Modified'] = http_date(stats.st_mtime)
+        response['Cache-Control'] = cache_control
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            response['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
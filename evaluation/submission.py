@@ -0,0 +1,236 @@
+"""
+Batched submission engine.
+
+A submission is validated in full before anything touches the database.
+Referenced items are then checked with one IN query per model, each
+evaluation model is written with a single bulk_create, and the whole
+submission commits in one transaction, so SQLite pays one fsync per
+evaluator instead of one per rating and a failure never leaves a partial
+submission behind.
+
+A client may send an idempotency key with a submission. The key is stored
+on the Submission under a unique index, so a retried post (the evaluator's
+connection dropped before the response arrived) is answered with the
+original result instead of being written twice or rejected as a duplicate.
+"""
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from . import search
+from .models import (
+    DialectData, PlausibilityData, DialectEvaluation, PlausibilityEvaluation, SearchDocument, Submission,
+)
+from .item_stats import dialect_stats, plausibility_stats
+from .scheduler import complete_session
+from .versioning import EVALUATIONS, bump_version
+from .write_lock import locked_write
+
+DIALECT_RATING_FIELDS = ('accuracy_rating', 'naturalness_rating')
+PLAUSIBILITY_RATING_FIELDS = ('option_1_plausibility', 'option_2_plausibility', 'option_3_plausibility')
+RATING_RANGE = range(1, 6)
+
+DUPLICATE_EMAIL_ERROR = 'This email has already submitted an evaluation. Only one submission per email is allowed.'
+DUPLICATE_SESSION_ERROR = 'This session has already been submitted.'
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 100
+
+
+class SubmissionError(Exception):
+    """
+    Raised when a submission is invalid or cannot be accepted.
+    """
+
+
+class AlreadySubmitted(SubmissionError):
+    """
+    Raised when a submission's idempotency key belongs to one that was already accepted.
+    session_id is the session the original submission was stored under.
+    """
+
+    def __init__(self, session_id):
+        super().__init__(DUPLICATE_SESSION_ERROR)
+        self.session_id = session_id
+
+
+def _clean_rating(eval_data, field, index, section):
+    value = eval_data.get(field)
+    if isinstance(value, bool) or not isinstance(value, int) or value not in RATING_RANGE:
+        raise SubmissionError(f'{section}[{index}].{field} must be an integer between 1 and 5.')
+    return value
+
+
+def _clean_id(eval_data, field, index, section):
+    value = eval_data.get(field)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise SubmissionError(f'{section}[{index}].{field} must be an integer.')
+    return value
+
+
+def _clean_items(data, section, id_field, rating_fields):
+    items = data.get(section) or []
+    if not isinstance(items, list):
+        raise SubmissionError(f'{section} must be a list.')
+    cleaned = []
+    for index, eval_data in enumerate(items):
+        if not isinstance(eval_data, dict):
+            raise SubmissionError(f'{section}[{index}] must be an object.')
+        item = {id_field: _clean_id(eval_data, id_field, index, section)}
+        for field in rating_fields:
+            item[field] = _clean_rating(eval_data, field, index, section)
+        item['comments'] = str(eval_data.get('comments') or '')
+        cleaned.append(item)
+    return cleaned
+
+
+def clean_idempotency_key(key):
+    """
+    Return the stored form of a client-supplied idempotency key, or None if there is none.
+    """
+    key = (key or '').strip()
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise SubmissionError(f'Idempotency-Key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters.')
+    return key or None
+
+
+def validate_submission(data, idempotency_key=None):
+    """
+    Validate a decoded submission payload and return its cleaned form.
+    """
+    if not isinstance(data, dict):
+        raise SubmissionError('Submission must be a JSON object.')
+    cleaned = {
+        'idempotency_key': clean_idempotency_key(idempotency_key),
+        'session_id': str(data.get('session_id') or uuid.uuid4())[:100],
+        'evaluator_name': str(data.get('evaluator_name') or '')[:100],
+        'evaluator_email': Submission.normalize_email(str(data.get('evaluator_email') or '')),
+        'dialect_evaluations': _clean_items(
+            data, 'dialect_evaluations', 'dialect_data_id', DIALECT_RATING_FIELDS
+        ),
+        'plausibility_evaluations': _clean_items(
+            data, 'plausibility_evaluations', 'plausibility_data_id', PLAUSIBILITY_RATING_FIELDS
+        ),
+    }
+    return cleaned
+
+
+def _check_items_exist(model, ids, id_field):
+    wanted = set(ids)
+    if not wanted:
+        return
+    found = set(model.objects.filter(id__in=wanted).values_list('id', flat=True))
+    missing = sorted(wanted - found)
+    if missing:
+        raise SubmissionError(f'Unknown {id_field}: {", ".join(str(pk) for pk in missing)}')
+
+
+def email_already_submitted(email):
+    return Submission.objects.filter(evaluator_email=Submission.normalize_email(email)).exists()
+
+
+def replayed_session(idempotency_key):
+    """
+    Session id of the submission stored under idempotency_key, or None (one index lookup).
+    """
+    if not idempotency_key:
+        return None
+    return Submission.objects.filter(idempotency_key=idempotency_key).values_list('session_id', flat=True).first()
+
+
+def _create_submission(cleaned):
+    """
+    Insert the Submission row; the unique indexes on email, session_id and
+    idempotency key reject duplicates even when two posts race past any earlier check.
+    """
+    # Journal entries queued before keys were recorded have none
+    idempotency_key = cleaned.get('idempotency_key')
+    try:
+        with transaction.atomic():
+            return Submission.objects.create(
+                session_id=cleaned['session_id'],
+                evaluator_name=cleaned['evaluator_name'] or None,
+                evaluator_email=cleaned['evaluator_email'],
+                idempotency_key=idempotency_key,
+            )
+    except IntegrityError:
+        session_id = replayed_session(idempotency_key)
+        if session_id:
+            raise AlreadySubmitted(session_id)
+        if cleaned['evaluator_email'] and email_already_submitted(cleaned['evaluator_email']):
+            raise SubmissionError(DUPLICATE_EMAIL_ERROR)
+        raise SubmissionError(DUPLICATE_SESSION_ERROR)
+
+
+def check_items(cleaned):
+    """
+    Check that every rated item exists (one IN query per model).
+    """
+    _check_items_exist(DialectData, [item['dialect_data_id'] for item in cleaned['dialect_evaluations']], 'dialect_data_id')
+    _check_items_exist(
+        PlausibilityData, [item['plausibility_data_id'] for item in cleaned['plausibility_evaluations']],
+        'plausibility_data_id',
+    )
+
+
+def _write_submission(cleaned):
+    """
+    Write one validated submission. Must run inside a transaction.
+    """
+    dialect_evaluations = cleaned['dialect_evaluations']
+    plausibility_evaluations = cleaned['plausibility_evaluations']
+    check_items(cleaned)
+
+    submission = _create_submission(cleaned)
+    dialect_rows = DialectEvaluation.objects.bulk_create([
+        DialectEvaluation(submission=submission, **item) for item in dialect_evaluations
+    ])
+    plausibility_rows = PlausibilityEvaluation.objects.bulk_create([
+        PlausibilityEvaluation(submission=submission, **item) for item in plausibility_evaluations
+    ])
+    # bulk_create skips the signals; index the comments here
+    search.index(SearchDocument.KIND_DIALECT_COMMENT, dialect_rows, created=True)
+    search.index(SearchDocument.KIND_PLAUSIBILITY_COMMENT, plausibility_rows, created=True)
+
+    dialect_stats.apply(dialect_evaluations)
+    plausibility_stats.apply(plausibility_evaluations)
+
+    # Settle the item reservations handed out to this session
+    complete_session(
+        cleaned['session_id'],
+        [item['dialect_data_id'] for item in dialect_evaluations],
+        [item['plausibility_data_id'] for item in plausibility_evaluations],
+    )
+
+
+@locked_write
+def save_submission(cleaned):
+    """
+    Write a validated submission in a single transaction.
+    Returns the session id the evaluations were stored under.
+    """
+    with transaction.atomic():
+        _write_submission(cleaned)
+        bump_version(EVALUATIONS)
+    return cleaned['session_id']
+
+
+@locked_write
+def save_submissions(batch):
+    """
+    Write many validated submissions in one transaction, each in its own savepoint,
+    so a rejected one doesn't take the rest of the batch with it.
+    Returns one SubmissionError (or None on success) per submission.
+    """
+    errors = []
+    with transaction.atomic():
+        for cleaned in batch:
+            try:
+                with transaction.atomic():
+                    _write_submission(cleaned)
+            except SubmissionError as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        if None in errors:
+            bump_version(EVALUATIONS)
+    return errors
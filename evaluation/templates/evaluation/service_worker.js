@@ -0,0 +1,283 @@
+// BanglaVerse service worker.
+//
+// - The form page and its static assets are cached, so the form still opens
+//   without a connection. Asset names are content-hashed, so they are served
+//   from the cache without asking the server.
+// - The last session bundle fetched per dialect is kept until its session is
+//   submitted, so a reload mid-evaluation gets the same items back offline.
+// - A submission that cannot reach the server (offline, 5xx, 429) is queued
+//   in IndexedDB and retried with exponential backoff and jitter. Every retry
+//   carries the submission's Idempotency-Key, so a post that did reach the
+//   server before the connection dropped is answered with the original
+//   response instead of being stored twice.
+
+const CACHE = 'banglaverse-{{ version }}';
+const PAGES = ['/', '/thank-you/'];
+const ASSETS = {{ assets|safe }};
+const BUNDLE_PATH = '/api/session-bundle/';
+const SUBMIT_PATH = '/api/submit-evaluation/';
+
+const DB_NAME = 'banglaverse';
+const QUEUE = 'submissions';
+
+// Backoff between retries of one submission: 2s, 4s, 8s, ... up to 10 minutes,
+// each scaled by a random factor in [0.5, 1) so clients don't retry in step
+const BASE_DELAY = 2000;
+const MAX_DELAY = 10 * 60 * 1000;
+// Queued submissions sent per drain, one at a time
+const DRAIN_BATCH = 10;
+const SYNC_TAG = 'submission-queue';
+
+self.addEventListener('install', event => {
+    event.waitUntil(caches.open(CACHE).then(cache => cache.addAll([...PAGES, ...ASSETS])).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names.filter(name => name !== CACHE).map(name => caches.delete(name)));
+        await self.clients.claim();
+        await drainQueue();
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (event.request.method === 'POST' && url.pathname === SUBMIT_PATH) {
+        event.respondWith(submitOrQueue(event.request));
+    } else if (event.request.method !== 'GET') {
+        return;
+    } else if (url.pathname === BUNDLE_PATH) {
+        event.respondWith(networkFirst(event.request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(event.request));
+    } else if (event.request.mode === 'navigate' && PAGES.includes(url.pathname)) {
+        event.respondWith(networkFirst(event.request, url.pathname));
+    }
+});
+
+// Fired once the browser is online again, even with no page open. Failing
+// the event while the server is still unreachable makes the browser retry it
+// later with its own backoff.
+self.addEventListener('sync', event => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(drainQueue(true).then(unreachable => {
+            if (unreachable) {
+                throw new Error('Submission server unreachable');
+            }
+        }));
+    }
+});
+
+// Pages post {type: 'drain'} when the browser comes back online
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'drain') {
+        event.waitUntil(drainQueue(true));
+    }
+});
+
+async function networkFirst(request, cacheKey) {
+    const cache = await caches.open(CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(cacheKey || request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(cacheKey || request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function cacheFirst(request) {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+// A submitted session's bundle must not be handed out again
+async function forgetBundle(sessionId) {
+    const cache = await caches.open(CACHE);
+    for (const request of await cache.keys()) {
+        if (new URL(request.url).pathname !== BUNDLE_PATH) {
+            continue;
+        }
+        const response = await cache.match(request);
+        const bundle = await response.json().catch(() => null);
+        if (!bundle || bundle.session_id === sessionId) {
+            await cache.delete(request);
+        }
+    }
+}
+
+function retryable(status) {
+    return status === 408 || status === 429 || status >= 500;
+}
+
+function jsonResponse(payload, status) {
+    return new Response(JSON.stringify(payload), {status, headers: {'Content-Type': 'application/json'}});
+}
+
+async function submitOrQueue(request) {
+    const key = request.headers.get('Idempotency-Key');
+    const body = await request.clone().text();
+    let sessionId = null;
+    try {
+        sessionId = JSON.parse(body).session_id;
+    } catch (error) {
+        // Not JSON: the server rejects it and nothing is queued
+    }
+    let offline = true;
+    let retryAfter = null;
+    try {
+        const response = await fetch(request);
+        if (!key || !retryable(response.status)) {
+            if (response.ok) {
+                await forgetBundle(sessionId);
+            }
+            return response;
+        }
+        offline = false;
+        retryAfter = response.headers.get('Retry-After');
+    } catch (error) {
+        if (!key) {
+            throw error;
+        }
+    }
+    await reschedule({key, body, sessionId, attempts: 0, queuedAt: Date.now()}, offline, retryAfter);
+    await forgetBundle(sessionId);
+    if (self.registration.sync) {
+        await self.registration.sync.register(SYNC_TAG).catch(() => {});
+    }
+    await scheduleDrain();
+    return jsonResponse({
+        success: true,
+        queued: true,
+        message: 'Evaluation saved on this device; it will be sent when the connection is back.',
+        session_id: sessionId,
+    }, 202);
+}
+
+function backoff(attempts) {
+    return Math.min(MAX_DELAY, BASE_DELAY * 2 ** attempts) * (0.5 + Math.random() / 2);
+}
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(DB_NAME, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(QUEUE, {keyPath: 'key'});
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function withQueue(mode, operation) {
+    const db = await openQueue();
+    try {
+        return await new Promise((resolve, reject) => {
+            const transaction = db.transaction(QUEUE, mode);
+            const request = operation(transaction.objectStore(QUEUE));
+            transaction.oncomplete = () => resolve(request && request.result);
+            transaction.onerror = () => reject(transaction.error);
+        });
+    } finally {
+        db.close();
+    }
+}
+
+const enqueue = entry => withQueue('readwrite', store => store.put(entry));
+const dequeue = key => withQueue('readwrite', store => store.delete(key));
+const queuedEntries = () => withQueue('readonly', store => store.getAll());
+
+async function notify(message) {
+    for (const client of await self.clients.matchAll({includeUncontrolled: true})) {
+        client.postMessage(message);
+    }
+}
+
+let draining = null;
+
+// Send due submissions oldest first, one at a time; stops at the first one
+// that fails, since the rest would fail the same way. With online set (the
+// connection just came back), entries that failed for lack of a connection
+// are due at once; ones the server turned away keep their backoff.
+// Resolves to whether the server was unreachable.
+function drainQueue(online = false) {
+    if (!draining) {
+        draining = sendDue(online).finally(() => {
+            draining = null;
+        });
+    }
+    return draining;
+}
+
+async function sendDue(online) {
+    const now = Date.now();
+    const due = (await queuedEntries())
+        .filter(entry => entry.nextAttempt <= now || (online && entry.offline))
+        .sort((a, b) => a.queuedAt - b.queuedAt)
+        .slice(0, DRAIN_BATCH);
+    let unreachable = false;
+    for (const entry of due) {
+        let response;
+        try {
+            response = await fetch(SUBMIT_PATH, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json', 'Idempotency-Key': entry.key},
+                body: entry.body,
+            });
+        } catch (error) {
+            unreachable = true;
+            await reschedule(entry, true, null);
+            break;
+        }
+        if (retryable(response.status)) {
+            await reschedule(entry, false, response.headers.get('Retry-After'));
+            break;
+        }
+        await dequeue(entry.key);
+        const result = await response.json().catch(() => ({}));
+        await notify(response.ok
+            ? {type: 'submission-sent', sessionId: entry.sessionId}
+            : {type: 'submission-rejected', sessionId: entry.sessionId, error: result.error});
+    }
+    await scheduleDrain();
+    return unreachable;
+}
+
+async function reschedule(entry, offline, retryAfter) {
+    const serverDelay = (Number(retryAfter) || 0) * 1000;
+    entry.nextAttempt = Date.now() + Math.max(backoff(entry.attempts), serverDelay);
+    entry.attempts += 1;
+    entry.offline = offline;
+    await enqueue(entry);
+}
+
+let timer = null;
+
+// Wake up for the next due entry while the worker is alive; a worker that is
+// stopped in between picks the queue up again on activation, sync or an
+// online message from a page
+async function scheduleDrain() {
+    const entries = await queuedEntries();
+    clearTimeout(timer);
+    if (!entries.length) {
+        return;
+    }
+    const next = Math.min(...entries.map(entry => entry.nextAttempt));
+    timer = setTimeout(drainQueue, Math.max(0, next - Date.now()));
+}
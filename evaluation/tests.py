@@ -1,3 +1,2408 @@
-from django.test import TestCase
+"""
+Query budgets and scaling checks.
 
-# Create your tests here.
+QueryBudgetTests pins the number of queries of every URL in evaluation/urls.py
+and of every admin changelist, so an N+1 or an extra round trip shows up as
+a failing test. ScalingTests seeds the tables with recursive-CTE inserts and
+measures the same requests at a small and a large size: the query count must
+not change and latency may only grow by a constant factor. Performance bugs
+in this app show up as work proportional to the row count, and these are the
+tests that catch them.
+
+By default the large size is 2k items per item table and 20k ratings per
+evaluation table and only the query counts are compared, which keeps the
+suite quick and free of timing flakes. BANGLAVERSE_SCALE_TESTS=1 opts into
+the full run: 100k items and 1M ratings, and the latency checks as well.
+BANGLAVERSE_SCALE_ITEMS and BANGLAVERSE_SCALE_EVALUATIONS set the large size
+explicitly either way.
+"""
+import asyncio
+import base64
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipIf
+from unittest.mock import ANY
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Max
+from django.db.utils import ConnectionHandler
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+
+from . import analytics, bundles, exporters, importers, metrics, near_duplicates, search, snapshots, write_lock
+from .admission import CLIENT_COOKIE, buckets, in_flight
+from .analytics import data_version
+from .bundles import ITEMS_PER_SESSION, BundlePool
+from .journal import CLAIM_TIMEOUT, Journal
+from .page_cache import page_cache
+from .item_pool import dialect_pool, plausibility_pool
+from .item_stats import dialect_stats, plausibility_stats
+from .models import (
+    DialectData, PlausibilityData, Submission, DialectEvaluation, PlausibilityEvaluation, SearchDocument,
+    ItemSignature, ItemReservation,
+)
+from .scheduler import dialect_scheduler, release_expired
+from .signals import source_file_changed
+from .submission import (
+    DUPLICATE_EMAIL_ERROR, DUPLICATE_SESSION_ERROR, AlreadySubmitted, SubmissionError, save_submission,
+    save_submissions, validate_submission,
+)
+from .versioning import EVALUATIONS, ITEMS, bump_version, get_version
+
+SMALL_ITEMS = 100
+SMALL_EVALUATIONS = 1000
+SCALE_TESTS = os.environ.get('BANGLAVERSE_SCALE_TESTS') == '1'
+LARGE_ITEMS = int(os.environ.get('BANGLAVERSE_SCALE_ITEMS', 100_000 if SCALE_TESTS else 2_000))
+LARGE_EVALUATIONS = int(os.environ.get('BANGLAVERSE_SCALE_EVALUATIONS', 1_000_000 if SCALE_TESTS else 20_000))
+
+# Ratings per seeded submission
+RATINGS_PER_SUBMISSION = 10
+
+# Allowed growth from the small to the large dataset: factor * small + slack,
+# for the wall time and for the time spent in queries
+LATENCY_FACTOR = 3
+LATENCY_SLACK = 0.02
+DB_SLACK = 0.01
+
+REPEATS = 5
+
+_metrics_dir = tempfile.TemporaryDirectory()
+
+TEST_SETTINGS = {
+    # Bundles are built on request; the refill thread would race the test transaction
+    'EVALUATION_BUNDLE_POOL_SIZE': 0,
+    'EVALUATION_WRITE_BEHIND': False,
+    'EVALUATION_METRICS_PATH': os.path.join(_metrics_dir.name, 'metrics.sqlite3'),
+    'EVALUATION_SLOW_REQUEST_SECONDS': 60,
+    # AdmissionTests turns it on; the other tests make more requests than a client may
+    'EVALUATION_RATE_LIMIT': False,
+    'EVALUATION_RATE_LIMIT_PATH': os.path.join(_metrics_dir.name, 'rate_limits.sqlite3'),
+    # A builder thread has its own connection and can't see the test transaction
+    'EVALUATION_SNAPSHOT_BACKGROUND': False,
+    'EVALUATION_ANALYTICS_BACKGROUND': False,
+    # Cached reports of earlier runs in var/cache would match the fresh test database's versions
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    },
+    'EVALUATION_SNAPSHOT_DIR': os.path.join(_metrics_dir.name, 'snapshots'),
+    # Plain names: the tests don't run collectstatic (StaticAssetTests does, into a temporary directory)
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+}
+
+
+def _insert(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _max_id(model):
+    return model.objects.aggregate(Max('id'))['id__max'] or 0
+
+
+def seed(items, evaluations):
+    """
+    Add items rows to each item table and evaluations rows to each evaluation table,
+    one recursive-CTE INSERT per table. Ratings are spread evenly over the new items.
+    """
+    dialects = [name for name, _ in DialectData.DIALECT_CHOICES]
+    dialect_base = _max_id(DialectData)
+    plausibility_base = _max_id(PlausibilityData)
+    submission_base = _max_id(Submission)
+    submissions = -(-evaluations // RATINGS_PER_SUBMISSION)
+    dialect_case = ' '.join(f"WHEN {i} THEN '{name}'" for i, name in enumerate(dialects))
+    # Seeded rows are settled history
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now() - timedelta(days=1))
+
+    _insert(f"""
+        WITH RECURSIVE seq(n) AS (SELECT %s UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        INSERT INTO evaluation_dialectdata
+            (dialect_name, original_standard_text, ai_generated_dialect_text, content_hash,
+             created_at, assigned_count, completed_count)
+        SELECT CASE n %% {len(dialects)} {dialect_case} END, 'original ' || n, 'generated ' || n,
+               'seed-dialect-' || n, %s, 0, 0
+        FROM seq
+    """, [dialect_base + 1, dialect_base + items, created_at])
+    _insert("""
+        WITH RECURSIVE seq(n) AS (SELECT %s UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        INSERT INTO evaluation_plausibilitydata
+            (question, correct_answer, wrong_option_1, wrong_option_2, wrong_option_3, content_hash,
+             created_at, assigned_count, completed_count)
+        SELECT 'question ' || n, 'correct ' || n, 'wrong a ' || n, 'wrong b ' || n, 'wrong c ' || n,
+               'seed-plausibility-' || n, %s, 0, 0
+        FROM seq
+    """, [plausibility_base + 1, plausibility_base + items, created_at])
+    _insert("""
+        WITH RECURSIVE seq(n) AS (SELECT %s UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        INSERT INTO evaluation_submission (session_id, evaluator_name, evaluator_email, created_at)
+        SELECT 'seed-session-' || n, 'Evaluator ' || n, 'seed-' || n || '@example.com', %s
+        FROM seq
+    """, [submission_base + 1, submission_base + submissions, created_at])
+    _insert("""
+        WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        INSERT INTO evaluation_dialectevaluation
+            (dialect_data_id, submission_id, accuracy_rating, naturalness_rating, comments, created_at)
+        SELECT %s + n %% %s, %s + n / %s, 1 + n %% 5, 1 + n %% 3, '', %s
+        FROM seq
+    """, [evaluations - 1, dialect_base + 1, items, submission_base + 1, RATINGS_PER_SUBMISSION, created_at])
+    _insert("""
+        WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        INSERT INTO evaluation_plausibilityevaluation
+            (plausibility_data_id, submission_id, option_1_plausibility, option_2_plausibility,
+             option_3_plausibility, comments, created_at)
+        SELECT %s + n %% %s, %s + n / %s, 1 + n %% 5, 1 + n %% 4, 1 + n %% 3, '', %s
+        FROM seq
+    """, [evaluations - 1, plausibility_base + 1, items, submission_base + 1, RATINGS_PER_SUBMISSION, created_at])
+
+    dialect_stats.rebuild()
+    plausibility_stats.rebuild()
+    search.rebuild([SearchDocument.KIND_DIALECT, SearchDocument.KIND_PLAUSIBILITY])
+    bump_version(ITEMS)
+    bump_version(EVALUATIONS)
+
+
+# A Bangla item matched by SEARCH_QUERY at every dataset size
+SEARCH_ITEM = {
+    'dialect_name': 'sylheti',
+    'original_standard_text': 'আমি ভাত খাই',
+    'ai_generated_dialect_text': 'মুই ভাত খাইয়ুম',
+}
+SEARCH_QUERY = 'ভাত'
+
+
+def submit_request(client, number):
+    """
+    Start a session and return a callable that submits it.
+    """
+    bundle = client.get(reverse('evaluation:session_bundle'), {'dialect': 'sylheti'}).json()
+    body = json.dumps({
+        'session_id': bundle['session_id'],
+        'evaluator_email': f'budget-{number}@example.com',
+        'dialect_evaluations': [
+            {'dialect_data_id': item['id'], 'accuracy_rating': 4, 'naturalness_rating': 3}
+            for item in bundle['dialect_data']
+        ],
+        'plausibility_evaluations': [
+            {'plausibility_data_id': item['id'], 'option_1_plausibility': 2, 'option_2_plausibility': 3,
+             'option_3_plausibility': 4}
+            for item in bundle['plausibility_data']
+        ],
+    })
+    return lambda: client.post(reverse('evaluation:submit_evaluation'), body, content_type='application/json')
+
+
+def changelist_url(model):
+    return reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+
+
+ENDPOINTS = {
+    'home': ('evaluation:home', {}),
+    'get_dialect_data': ('evaluation:get_dialect_data', {'dialect': 'sylheti'}),
+    'get_plausibility_data': ('evaluation:get_plausibility_data', {}),
+    'session_bundle': ('evaluation:session_bundle', {'dialect': 'sylheti'}),
+    'thank_you': ('evaluation:thank_you', {}),
+    'service_worker': ('evaluation:service_worker', {}),
+    'export_page': ('evaluation:export_page', {}),
+    'export_json': ('evaluation:export_download', {'type': 'dialect_evaluations'}),
+    'export_ndjson': ('evaluation:export_download', {'type': 'all', 'format': 'ndjson'}),
+    'export_csv': ('evaluation:export_download', {'type': 'dialect_evaluations', 'format': 'csv'}),
+    'export_incremental': ('evaluation:export_incremental', {'type': 'dialect_evaluations', 'limit': 100}),
+    'analytics_report': ('evaluation:analytics_report', {}),
+    'metrics': ('evaluation:metrics', {}),
+    'search': ('evaluation:search', {'q': SEARCH_QUERY}),
+}
+
+
+# Full exports are proportional to the data by design and only get a query budget
+SCALED_ENDPOINTS = [name for name in ENDPOINTS if name not in ('export_json', 'export_ndjson', 'export_csv')]
+
+ADMIN_MODELS = [DialectData, PlausibilityData, Submission, DialectEvaluation, PlausibilityEvaluation]
+
+
+def admin_search_url(model):
+    return f'{changelist_url(model)}?q={SEARCH_QUERY}'
+
+
+def fetch(client, name):
+    url, params = ENDPOINTS[name]
+    response = client.get(reverse(url), params)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(prepare):
+    """
+    Time the request returned by prepare() REPEATS times after a warm-up.
+    Returns (distinct query counts, median seconds, median seconds spent in queries).
+    """
+    prepare()()
+    counts = set()
+    timings = []
+    db_timings = []
+    for _ in range(REPEATS):
+        request = prepare()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            request()
+            timings.append(time.perf_counter() - started)
+        counts.add(len(queries))
+        db_timings.append(sum(float(query['time']) for query in queries.captured_queries))
+    return counts, statistics.median(timings), statistics.median(db_timings)
+
+
+def reset_caches():
+    dialect_pool.clear()
+    plausibility_pool.clear()
+    page_cache.clear()
+    # The sweep of expired reservations runs at most once a minute; keep it out of the counts
+    release_expired(force=True)
+
+
+@override_settings(**TEST_SETTINGS)
+class QueryBudgetTests(TestCase):
+    """
+    Exact query counts per endpoint on a small dataset, with warm process caches.
+    Counts include the SAVEPOINT statements of the test transaction.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        DialectData.objects.create(**SEARCH_ITEM)
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+
+    def setUp(self):
+        reset_caches()
+        self.client.force_login(self.staff)
+
+    def assertBudget(self, name, budget):
+        fetch(self.client, name)
+        with self.assertNumQueries(budget):
+            response = fetch(self.client, name)
+        self.assertLess(response.status_code, 400, name)
+
+    def assertAdminBudget(self, model, budget, url=None):
+        url = url or changelist_url(model)
+        self.client.get(url)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        self.assertBudget('home', 0)
+
+    def test_thank_you(self):
+        self.assertBudget('thank_you', 0)
+
+    def test_service_worker(self):
+        self.assertBudget('service_worker', 0)
+
+    def test_get_dialect_data(self):
+        self.assertBudget('get_dialect_data', 7)
+
+    def test_get_plausibility_data(self):
+        self.assertBudget('get_plausibility_data', 7)
+
+    def test_session_bundle(self):
+        self.assertBudget('session_bundle', 14)
+
+    def test_submit_evaluation(self):
+        submit = submit_request(self.client, 0)
+        with self.assertNumQueries(38):
+            response = submit()
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_page(self):
+        self.assertBudget('export_page', 2)
+
+    def test_export_json(self):
+        self.assertBudget('export_json', 3)
+
+    def test_export_ndjson(self):
+        self.assertBudget('export_ndjson', 7)
+
+    def test_export_csv(self):
+        self.assertBudget('export_csv', 3)
+
+    def test_export_incremental(self):
+        self.assertBudget('export_incremental', 5)
+
+    def test_analytics_report(self):
+        self.assertBudget('analytics_report', 4)
+
+    def test_metrics(self):
+        self.assertBudget('metrics', 2)
+
+    def test_search(self):
+        self.assertBudget('search', 4)
+
+    def test_admin_dialect_data_search(self):
+        self.assertAdminBudget(DialectData, 4, admin_search_url(DialectData))
+
+    def test_admin_dialect_data(self):
+        self.assertAdminBudget(DialectData, 4)
+
+    def test_admin_plausibility_data(self):
+        self.assertAdminBudget(PlausibilityData, 4)
+
+    def test_admin_submissions(self):
+        self.assertAdminBudget(Submission, 4)
+
+    def test_admin_dialect_evaluations(self):
+        self.assertAdminBudget(DialectEvaluation, 4)
+
+    def test_admin_plausibility_evaluations(self):
+        self.assertAdminBudget(PlausibilityEvaluation, 4)
+
+    def test_admin_users_and_groups(self):
+        self.assertAdminBudget(User, 6)
+        self.assertAdminBudget(Group, 5)
+
+
+@override_settings(**TEST_SETTINGS)
+class ScalingTests(TestCase):
+    """
+    Every request is measured at SMALL and at LARGE size (seeded once for the class);
+    its query count must match and, with SCALE_TESTS, its latency must stay within
+    LATENCY_FACTOR.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+        cls.client_ = Client()
+        cls.client_.force_login(cls.staff)
+        cls.submissions = 0
+        DialectData.objects.create(**SEARCH_ITEM)
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        cls.small = cls.measure_all()
+        seed(LARGE_ITEMS - SMALL_ITEMS, LARGE_EVALUATIONS - SMALL_EVALUATIONS)
+        cls.large = cls.measure_all()
+
+    @classmethod
+    def measure_all(cls):
+        reset_caches()
+        client = cls.client_
+        results = {}
+        for name in SCALED_ENDPOINTS:
+            results[name] = measure(lambda: lambda: fetch(client, name))
+        results['submit_evaluation'] = measure(lambda: submit_request(client, cls._next_submission()))
+        for model in ADMIN_MODELS:
+            results[model._meta.model_name] = measure(lambda: lambda: client.get(changelist_url(model)))
+        results['dialectdata_search'] = measure(lambda: lambda: client.get(admin_search_url(DialectData)))
+        return results
+
+    @classmethod
+    def _next_submission(cls):
+        cls.submissions += 1
+        return cls.submissions
+
+    def assertFlat(self, name):
+        small_counts, small_seconds, small_db = self.small[name]
+        large_counts, large_seconds, large_db = self.large[name]
+        sizes = f'{SMALL_ITEMS} -> {LARGE_ITEMS} items, {SMALL_EVALUATIONS} -> {LARGE_EVALUATIONS} ratings'
+        self.assertEqual(len(small_counts), 1, f'{name}: query count varies between requests: {small_counts}')
+        self.assertEqual(large_counts, small_counts, f'{name}: query count grows with the data')
+        if not SCALE_TESTS:
+            return
+        self.assertLessEqual(
+            large_db, small_db * LATENCY_FACTOR + DB_SLACK,
+            f'{name}: query time {small_db * 1000:.1f} -> {large_db * 1000:.1f} ms ({sizes})',
+        )
+        self.assertLessEqual(
+            large_seconds, small_seconds * LATENCY_FACTOR + LATENCY_SLACK,
+            f'{name}: latency {small_seconds * 1000:.1f} -> {large_seconds * 1000:.1f} ms ({sizes})',
+        )
+
+    def test_home(self):
+        self.assertFlat('home')
+
+    def test_thank_you(self):
+        self.assertFlat('thank_you')
+
+    def test_service_worker(self):
+        self.assertFlat('service_worker')
+
+    def test_get_dialect_data(self):
+        self.assertFlat('get_dialect_data')
+
+    def test_get_plausibility_data(self):
+        self.assertFlat('get_plausibility_data')
+
+    def test_session_bundle(self):
+        self.assertFlat('session_bundle')
+
+    def test_submit_evaluation(self):
+        self.assertFlat('submit_evaluation')
+
+    def test_export_page(self):
+        self.assertFlat('export_page')
+
+    def test_export_incremental(self):
+        self.assertFlat('export_incremental')
+
+    def test_analytics_report(self):
+        self.assertFlat('analytics_report')
+
+    def test_metrics(self):
+        self.assertFlat('metrics')
+
+    def test_search(self):
+        self.assertFlat('search')
+
+    def test_admin_dialect_data(self):
+        self.assertFlat('dialectdata')
+
+    def test_admin_dialect_data_search(self):
+        self.assertFlat('dialectdata_search')
+
+    def test_admin_plausibility_data(self):
+        self.assertFlat('plausibilitydata')
+
+    def test_admin_submissions(self):
+        self.assertFlat('submission')
+
+    def test_admin_dialect_evaluations(self):
+        self.assertFlat('dialectevaluation')
+
+    def test_admin_plausibility_evaluations(self):
+        self.assertFlat('plausibilityevaluation')
+
+
+@override_settings(**TEST_SETTINGS)
+class ItemStatsTests(TestCase):
+    """
+    Running per-item rating stats of evaluation/item_stats.py stay equal to a recomputation.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+
+    def stats_rows(self, stats):
+        return sorted(stats.stats_model.objects.filter(rating_count__gt=0).values_list())
+
+    def assertStatsMatchRecomputation(self):
+        running = {stats: self.stats_rows(stats) for stats in (dialect_stats, plausibility_stats)}
+        for stats, rows in running.items():
+            stats.rebuild()
+            self.assertEqual(rows, self.stats_rows(stats))
+
+    def test_edited_rating(self):
+        evaluation = DialectEvaluation.objects.order_by('pk').first()
+        evaluation.accuracy_rating = 6 - evaluation.accuracy_rating
+        evaluation.save()
+        self.assertStatsMatchRecomputation()
+
+    def test_evaluation_moved_to_another_item(self):
+        evaluation = PlausibilityEvaluation.objects.order_by('pk').first()
+        evaluation.plausibility_data = PlausibilityData.objects.exclude(pk=evaluation.plausibility_data_id).first()
+        evaluation.option_2_plausibility = 5
+        evaluation.save()
+        self.assertStatsMatchRecomputation()
+
+    def test_unrelated_save(self):
+        evaluation = DialectEvaluation.objects.order_by('pk').first()
+        evaluation.comments = 'edited'
+        # The update, the version bump and the search index; the stats aren't read or written
+        with self.assertNumQueries(3):
+            evaluation.save(update_fields=['comments'])
+        self.assertStatsMatchRecomputation()
+
+    def test_admin_edit_add_and_delete(self):
+        self.client.force_login(self.staff)
+        evaluation = DialectEvaluation.objects.order_by('pk').first()
+        form = {
+            'dialect_data': evaluation.dialect_data_id, 'submission': evaluation.submission_id,
+            'accuracy_rating': 1 if evaluation.accuracy_rating != 1 else 2, 'naturalness_rating': 5, 'comments': '',
+        }
+        response = self.client.post(reverse('admin:evaluation_dialectevaluation_change', args=[evaluation.pk]), form)
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse('admin:evaluation_dialectevaluation_add'), form)
+        self.assertEqual(response.status_code, 302)
+        self.assertStatsMatchRecomputation()
+        evaluation.refresh_from_db()
+        evaluation.delete()
+        self.assertStatsMatchRecomputation()
+
+
+@override_settings(**TEST_SETTINGS)
+class ItemPoolTests(TestCase):
+    """
+    Sampling and reloading of the id pools of evaluation/item_pool.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        self.sylheti = set(DialectData.objects.filter(dialect_name='sylheti').values_list('pk', flat=True))
+
+    def test_sample_returns_distinct_rows_of_the_group(self):
+        rows = dialect_pool.sample(ITEMS_PER_SESSION, 'sylheti')
+        ids = [row['id'] for row in rows]
+        self.assertEqual(len(ids), ITEMS_PER_SESSION)
+        self.assertEqual(len(set(ids)), ITEMS_PER_SESSION)
+        self.assertTrue(set(ids) <= self.sylheti)
+        stored = {row['id']: row for row in DialectData.objects.filter(id__in=ids).values(*dialect_pool.fields)}
+        self.assertEqual(rows, [stored[pk] for pk in ids])
+
+        # More than the group holds: every item once
+        rows = dialect_pool.sample(SMALL_ITEMS, 'sylheti')
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(self.sylheti))
+        self.assertEqual(dialect_pool.sample(ITEMS_PER_SESSION, 'unknown'), [])
+
+        ids = [row['id'] for row in plausibility_pool.sample(ITEMS_PER_SESSION)]
+        self.assertEqual(len(set(ids)), ITEMS_PER_SESSION)
+        self.assertEqual(PlausibilityData.objects.filter(id__in=ids).count(), ITEMS_PER_SESSION)
+
+    def test_fetch_keeps_order_and_skips_missing_rows(self):
+        ids = sorted(self.sylheti)[:3][::-1]
+        rows = dialect_pool.fetch(ids + [_max_id(DialectData) + 1])
+        self.assertEqual([row['id'] for row in rows], ids)
+        self.assertEqual(set(rows[0]), set(dialect_pool.fields))
+
+    def test_ids_are_cached_until_items_change(self):
+        dialect_pool.ids('sylheti')
+        # Only the version stamp is read
+        with self.assertNumQueries(1):
+            self.assertEqual(set(dialect_pool.ids('sylheti')), self.sylheti)
+
+    def test_saved_deleted_and_imported_items_reload_the_pool(self):
+        self.assertEqual(set(dialect_pool.ids('sylheti')), self.sylheti)
+        deleted = min(self.sylheti)
+        DialectData.objects.get(pk=deleted).delete()
+        self.assertNotIn(deleted, dialect_pool.ids('sylheti'))
+        # Never served once deleted
+        served = {row['id'] for row in dialect_pool.sample(SMALL_ITEMS, 'sylheti')}
+        self.assertEqual(served, self.sylheti - {deleted})
+
+        moved = DialectData.objects.get(pk=max(self.sylheti))
+        moved.dialect_name = 'noakhali'
+        moved.save()
+        self.assertNotIn(moved.pk, dialect_pool.ids('sylheti'))
+        self.assertIn(moved.pk, dialect_pool.ids('noakhali'))
+
+        created = DialectData.objects.create(**SEARCH_ITEM)
+        self.assertIn(created.pk, dialect_pool.ids('sylheti'))
+
+        importers.import_records('dialect', enumerate([
+            {**SEARCH_ITEM, 'ai_generated_dialect_text': 'আমি ভাত খাইয়ুম না'},
+        ], start=1))
+        imported = DialectData.objects.get(ai_generated_dialect_text='আমি ভাত খাইয়ুম না')
+        self.assertIn(imported.pk, dialect_pool.ids('sylheti'))
+
+
+@override_settings(**TEST_SETTINGS)
+class SchedulerTests(TestCase):
+    """
+    Coverage-balanced hand-out, expiry and settlement of evaluation/scheduler.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        self.items = DialectData.objects.filter(dialect_name='sylheti')
+        self.items.update(assigned_count=3)
+
+    def counts(self, ids):
+        return dict(DialectData.objects.filter(id__in=ids).values_list('id', 'assigned_count'))
+
+    def test_least_assigned_items_come_first(self):
+        ids = list(self.items.order_by('pk').values_list('pk', flat=True))
+        # Seven unassigned items, five assigned once and the rest three times
+        fresh, once = ids[:7], ids[7:12]
+        DialectData.objects.filter(id__in=fresh).update(assigned_count=0)
+        DialectData.objects.filter(id__in=once).update(assigned_count=1)
+
+        chosen = [row['id'] for row in dialect_scheduler.assign(ITEMS_PER_SESSION, 'session-a', 'sylheti')]
+        self.assertEqual(len(chosen), ITEMS_PER_SESSION)
+        # All seven unassigned items, then three of the five ties at one
+        self.assertTrue(set(fresh) <= set(chosen))
+        self.assertTrue(set(chosen) - set(fresh) <= set(once))
+        self.assertEqual(sorted(self.counts(chosen).values()), [1] * 7 + [2] * 3)
+        self.assertEqual(
+            set(ItemReservation.objects.filter(session_id='session-a').values_list('item_id', flat=True)), set(chosen),
+        )
+        self.assertFalse(DialectData.objects.filter(id__in=chosen).exclude(dialect_name='sylheti').exists())
+
+    def test_expired_reservations_are_released(self):
+        chosen = [row['id'] for row in dialect_scheduler.assign(ITEMS_PER_SESSION, 'session-b', 'sylheti')]
+        self.assertEqual(set(self.counts(chosen).values()), {4})
+        # Not yet expired
+        self.assertEqual(release_expired(force=True), 0)
+
+        ItemReservation.objects.filter(session_id='session-b').update(expires_at=timezone.now() - timedelta(seconds=1))
+        # Swept at most once per RELEASE_INTERVAL unless forced
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(release_expired(force=True), ITEMS_PER_SESSION)
+        self.assertEqual(set(self.counts(chosen).values()), {3})
+        self.assertFalse(ItemReservation.objects.filter(session_id='session-b').exists())
+
+    def test_complete_settles_reservations(self):
+        chosen = [row['id'] for row in dialect_scheduler.assign(ITEMS_PER_SESSION, 'session-c', 'sylheti')]
+        unreserved = self.items.exclude(id__in=chosen).order_by('pk').values_list('pk', flat=True).first()
+        rated = chosen[:7]
+        completed = dict(DialectData.objects.values_list('id', 'completed_count'))
+
+        dialect_scheduler.complete('session-c', rated + [unreserved])
+        rows = DialectData.objects.in_bulk(chosen + [unreserved])
+        for pk in rated:
+            self.assertEqual((rows[pk].assigned_count, rows[pk].completed_count), (4, completed[pk] + 1))
+        # Handed out but not rated: back to the queue
+        for pk in chosen[7:]:
+            self.assertEqual((rows[pk].assigned_count, rows[pk].completed_count), (3, completed[pk]))
+        # Rated without a reservation: counts as an assignment too
+        self.assertEqual(
+            (rows[unreserved].assigned_count, rows[unreserved].completed_count), (4, completed[unreserved] + 1),
+        )
+        self.assertFalse(ItemReservation.objects.filter(session_id='session-c').exists())
+
+
+@override_settings(**{**TEST_SETTINGS, 'EVALUATION_BUNDLE_POOL_SIZE': 2})
+class BundlePoolTests(TestCase):
+    """
+    Pooled session bundles of evaluation/bundles.py: reservation, expiry and refilling.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        self.pool = BundlePool()
+        # No refill thread: it would race the test transaction
+        patcher = mock.patch.object(self.pool, '_start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.pool.clear)
+
+    def pooled(self, dialect):
+        return [entry[2]['session_id'] for entry in self.pool._bundles.get(dialect, ())]
+
+    def reserved(self, session_id):
+        return set(ItemReservation.objects.filter(session_id=session_id).values_list('kind', 'item_id'))
+
+    def test_served_bundle_items_are_reserved(self):
+        self.assertEqual(self.pool.refill(), 2 * len(DialectData.DIALECT_CHOICES))
+        first = self.pooled('sylheti')[0]
+        ItemReservation.objects.filter(session_id=first).update(expires_at=timezone.now())
+
+        bundle = self.pool.take('sylheti')
+        self.assertEqual(bundle['session_id'], first)
+        self.assertEqual(self.reserved(first), {
+            *(('dialect', item['id']) for item in bundle['dialect_data']),
+            *(('plausibility', item['id']) for item in bundle['plausibility_data']),
+        })
+        self.assertEqual(len(bundle['dialect_data']), ITEMS_PER_SESSION)
+        self.assertFalse(
+            DialectData.objects.filter(id__in=[item['id'] for item in bundle['dialect_data']])
+            .exclude(dialect_name='sylheti').exists()
+        )
+        # The reservation clock restarts when the bundle is handed out
+        expires = ItemReservation.objects.filter(session_id=first).values_list('expires_at', flat=True)
+        self.assertTrue(all(at > timezone.now() + timedelta(hours=1) for at in expires))
+
+    def test_expired_bundle_is_discarded(self):
+        self.pool.refill()
+        expired, fresh = self.pooled('sylheti')
+        reserved = [item_id for kind, item_id in self.reserved(expired) if kind == 'dialect']
+        assigned = dict(DialectData.objects.filter(id__in=reserved).values_list('id', 'assigned_count'))
+        created, version, bundle = self.pool._bundles['sylheti'][0]
+        self.pool._bundles['sylheti'][0] = (created - bundles.MAX_BUNDLE_AGE, version, bundle)
+
+        # Skipped for the next one in line
+        self.assertEqual(self.pool.take('sylheti')['session_id'], fresh)
+        self.assertEqual(self.pooled('sylheti'), [])
+        # Its reservations are released
+        self.assertEqual(self.reserved(expired), set())
+        self.assertEqual(
+            dict(DialectData.objects.filter(id__in=reserved).values_list('id', 'assigned_count')),
+            {pk: count - 1 for pk, count in assigned.items()},
+        )
+
+    def test_bundles_built_before_items_changed_are_discarded(self):
+        self.pool.refill()
+        pooled = self.pooled('sylheti')
+        DialectData.objects.create(**SEARCH_ITEM)
+        served = self.pool.take('sylheti')
+        self.assertNotIn(served['session_id'], pooled)
+        self.assertEqual(self.pooled('sylheti'), [])
+        for session_id in pooled:
+            self.assertEqual(self.reserved(session_id), set())
+
+    def test_pool_refills_after_being_drained(self):
+        self.pool.refill()
+        pooled = self.pooled('noakhali')
+        served = [self.pool.take('noakhali')['session_id'] for _ in range(3)]
+        self.assertEqual(served[:2], pooled)
+        # Drained: the third is built on request
+        self.assertNotIn(served[2], pooled)
+        self.assertEqual(self.pooled('noakhali'), [])
+
+        self.assertEqual(self.pool.refill(), 2)
+        refilled = self.pooled('noakhali')
+        self.assertEqual(len(refilled), 2)
+        self.assertFalse(set(refilled) & set(served))
+        self.assertEqual(self.pool.take('noakhali')['session_id'], refilled[0])
+
+
+@override_settings(**TEST_SETTINGS)
+class SubmissionTests(TestCase):
+    """
+    All-or-nothing writes of evaluation/submission.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        self.dialect_items = list(DialectData.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        self.plausibility_item = PlausibilityData.objects.order_by('pk').values_list('pk', flat=True).first()
+
+    def payload(self, dialect_ids, **extra):
+        return {
+            'dialect_evaluations': [
+                {'dialect_data_id': pk, 'accuracy_rating': 5, 'naturalness_rating': 5} for pk in dialect_ids
+            ],
+            'plausibility_evaluations': [{
+                'plausibility_data_id': self.plausibility_item, 'option_1_plausibility': 5,
+                'option_2_plausibility': 5, 'option_3_plausibility': 5,
+            }],
+            **extra,
+        }
+
+    def state(self):
+        return (
+            Submission.objects.count(), DialectEvaluation.objects.count(), PlausibilityEvaluation.objects.count(),
+            list(dialect_stats.stats_model.objects.order_by('pk').values_list()),
+            list(plausibility_stats.stats_model.objects.order_by('pk').values_list()),
+            data_version(),
+        )
+
+    def test_unknown_item_mid_payload_writes_nothing(self):
+        before = self.state()
+        first, _, last = self.dialect_items
+        payload = self.payload([first, _max_id(DialectData) + 1, last], evaluator_email='partial@example.com')
+        with self.assertRaisesMessage(SubmissionError, 'Unknown dialect_data_id'):
+            save_submission(validate_submission(payload))
+        self.assertEqual(self.state(), before)
+
+        response = self.client.post(
+            reverse('evaluation:submit_evaluation'), json.dumps(payload), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.state(), before)
+        # A failure after the rows and the dialect stats are written rolls them back too
+        with mock.patch.object(plausibility_stats, 'apply', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            save_submission(validate_submission(self.payload(self.dialect_items, evaluator_email='partial@example.com')))
+        self.assertEqual(self.state(), before)
+        # The email wasn't used up by the failed attempt
+        self.assertEqual(save_submission(validate_submission(self.payload(self.dialect_items, **{
+            'evaluator_email': 'partial@example.com', 'session_id': 'after-failure',
+        }))), 'after-failure')
+
+    def test_email_is_unique_regardless_of_case(self):
+        save_submission(validate_submission(self.payload(self.dialect_items, evaluator_email='Once@Example.com')))
+        before = self.state()
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_EMAIL_ERROR):
+            save_submission(validate_submission(self.payload(self.dialect_items, evaluator_email=' once@example.COM')))
+        self.assertEqual(self.state(), before)
+        # Without an email any number of submissions is fine
+        save_submission(validate_submission(self.payload(self.dialect_items)))
+        save_submission(validate_submission(self.payload(self.dialect_items, evaluator_email='')))
+
+    def test_session_is_submitted_once(self):
+        save_submission(validate_submission(self.payload(self.dialect_items, session_id='once')))
+        before = self.state()
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_SESSION_ERROR):
+            save_submission(validate_submission(self.payload(self.dialect_items, session_id='once')))
+        self.assertEqual(self.state(), before)
+
+    def test_idempotency_key_answers_with_the_first_session(self):
+        session_id = save_submission(validate_submission(self.payload(self.dialect_items), 'retry-key'))
+        before = self.state()
+        # A retry is recognised by its key even with a different email or session
+        with self.assertRaises(AlreadySubmitted) as raised:
+            save_submission(validate_submission(
+                self.payload(self.dialect_items, evaluator_email='retry@example.com'), 'retry-key',
+            ))
+        self.assertEqual(raised.exception.session_id, session_id)
+        self.assertEqual(self.state(), before)
+
+    def test_failing_submission_is_isolated_in_its_batch(self):
+        submissions = Submission.objects.count()
+        batch = [
+            validate_submission(self.payload(self.dialect_items, session_id='batch-1')),
+            validate_submission(self.payload([_max_id(DialectData) + 1], session_id='batch-2')),
+            validate_submission(self.payload(self.dialect_items, session_id='batch-3')),
+        ]
+        errors = save_submissions(batch)
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], SubmissionError)
+        self.assertIsNone(errors[2])
+        self.assertEqual(Submission.objects.count(), submissions + 2)
+        self.assertFalse(Submission.objects.filter(session_id='batch-2').exists())
+        self.assertEqual(DialectEvaluation.objects.filter(submission__session_id='batch-3').count(), 3)
+        # The stats hold the two written submissions only
+        for stats in (dialect_stats, plausibility_stats):
+            running = sorted(stats.stats_model.objects.values_list())
+            stats.rebuild()
+            self.assertEqual(running, sorted(stats.stats_model.objects.values_list()))
+
+
+class SubmissionMigrationTests(TransactionTestCase):
+    """
+    0004_submission moves evaluator details onto one Submission per session,
+    merging sessions that share an email.
+    """
+    migrate_from = ('evaluation', '0003_item_coverage')
+    migrate_to = ('evaluation', '0004_submission')
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.latest = executor.loader.graph.leaf_nodes('evaluation')
+        executor.migrate([self.migrate_from])
+        self.old_apps = executor.loader.project_state([self.migrate_from]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.latest)
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([self.migrate_to])
+        return executor.loader.project_state([self.migrate_to]).apps
+
+    def test_sessions_become_submissions(self):
+        item = self.old_apps.get_model('evaluation', 'DialectData').objects.create(
+            dialect_name='sylheti', original_standard_text='original', ai_generated_dialect_text='generated',
+        )
+        question = self.old_apps.get_model('evaluation', 'PlausibilityData').objects.create(
+            question='question', correct_answer='a', wrong_option_1='b', wrong_option_2='c', wrong_option_3='d',
+        )
+        OldDialectEvaluation = self.old_apps.get_model('evaluation', 'DialectEvaluation')
+        OldPlausibilityEvaluation = self.old_apps.get_model('evaluation', 'PlausibilityEvaluation')
+        start = timezone.now() - timedelta(days=10)
+        sessions = [
+            # session, name, email, days after start
+            ('first', 'Rahim', 'Rahim@Example.com', 0),
+            ('same-email-other-case', None, ' rahim@example.com', 1),
+            ('same-email-again', 'Rahim U.', 'RAHIM@example.com', 2),
+            ('blank', 'Karim', '', 3),
+            ('no-email', None, None, 4),
+            ('other', 'Salma', 'salma@example.com', 5),
+        ]
+        for session_id, name, email, days in sessions:
+            evaluation = OldDialectEvaluation.objects.create(
+                dialect_data=item, session_id=session_id, evaluator_name=name, evaluator_email=email,
+                accuracy_rating=4, naturalness_rating=3,
+            )
+            OldDialectEvaluation.objects.filter(pk=evaluation.pk).update(created_at=start + timedelta(days=days))
+        # The MCQ half of a session without the evaluator details
+        OldPlausibilityEvaluation.objects.create(
+            plausibility_data=question, session_id='other', option_1_plausibility=1, option_2_plausibility=2,
+            option_3_plausibility=3,
+        )
+
+        apps = self.migrate()
+        NewSubmission = apps.get_model('evaluation', 'Submission')
+        NewDialectEvaluation = apps.get_model('evaluation', 'DialectEvaluation')
+        rows = {
+            row.session_id: row for row in NewSubmission.objects.all()
+        }
+        self.assertEqual(set(rows), {'first', 'blank', 'no-email', 'other'})
+        # Emails differing only in case or spaces are one evaluator, kept on their first session
+        merged = rows['first']
+        self.assertEqual((merged.evaluator_name, merged.evaluator_email), ('Rahim', 'rahim@example.com'))
+        self.assertEqual(merged.created_at, start)
+        self.assertEqual(NewDialectEvaluation.objects.filter(submission=merged).count(), 3)
+        # Blank and missing emails are never merged
+        self.assertEqual((rows['blank'].evaluator_name, rows['blank'].evaluator_email), ('Karim', None))
+        self.assertIsNone(rows['no-email'].evaluator_email)
+        self.assertEqual(rows['other'].evaluator_email, 'salma@example.com')
+        self.assertEqual(rows['other'].plausibility_evaluations.count(), 1)
+        self.assertFalse(NewDialectEvaluation.objects.filter(submission__isnull=True).exists())
+
+
+@override_settings(**TEST_SETTINGS)
+class AdminPaginationTests(TestCase):
+    """
+    Every page of a large changelist is reachable and none past the end is empty.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def changelist(self, **params):
+        response = self.client.get(changelist_url(DialectEvaluation), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_filter_matching_more_than_the_count_limit(self):
+        matching = DialectEvaluation.objects.filter(naturalness_rating=1).count()
+        with mock.patch('evaluation.admin.COUNT_LIMIT', 150):
+            cl = self.changelist(naturalness_rating__exact=1, p=3)
+            self.assertEqual(len(cl.result_list), 100)
+            self.assertGreater(cl.paginator.num_pages, 3)
+            cl = self.changelist(naturalness_rating__exact=1, p=4)
+        self.assertEqual(len(cl.result_list), matching - 300)
+        self.assertEqual(cl.result_count, matching)
+
+    def test_plausibility_rating_filters(self):
+        url = changelist_url(PlausibilityEvaluation)
+        response = self.client.get(url)
+        for option in (1, 2, 3):
+            self.assertContains(response, f'?option_{option}_plausibility__exact=2')
+        response = self.client.get(url, {'option_2_plausibility__exact': 3, 'p': 2})
+        cl = response.context['cl']
+        self.assertEqual(cl.result_count, PlausibilityEvaluation.objects.filter(option_2_plausibility=3).count())
+        self.assertEqual({evaluation.option_2_plausibility for evaluation in cl.result_list}, {3})
+        # The page is read off the option's index, newest first, not filtered out of a scan
+        self.assertIn('plausibilityeval_option_2_idx', cl.queryset.explain())
+
+    def test_deleted_rows_leave_no_empty_pages(self):
+        deleted = DialectEvaluation.objects.order_by('pk').values_list('pk', flat=True)[300:450]
+        DialectEvaluation.objects.filter(pk__in=list(deleted)).delete()
+        remaining = DialectEvaluation.objects.count()
+        cl = self.changelist(p=10)
+        self.assertEqual(cl.page_num, 9)
+        self.assertEqual(len(cl.result_list), remaining - 800)
+        self.assertEqual(cl.result_count, remaining)
+        self.assertEqual(cl.paginator.num_pages, 9)
+
+
+@override_settings(**TEST_SETTINGS)
+class ExportTests(TestCase):
+    """
+    Content of the streamed CSV and NDJSON exports of evaluation/exporters.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+        # Needs quoting in CSV and escaping in JSON
+        evaluation = DialectEvaluation.objects.order_by('pk').first()
+        evaluation.comments = 'ভালো, "খুব"\nভালো'
+        evaluation.save()
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def download(self, **params):
+        response = self.client.get(reverse('evaluation:export_download'), params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        if params.get('gzip') == '1':
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            content = gzip.decompress(content)
+        return response, content.decode('utf-8')
+
+    def test_csv(self):
+        response, content = self.download(type='dialect_evaluations', format='csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="dialect_evaluations.csv"')
+        header, *rows = csv.reader(io.StringIO(content))
+        self.assertEqual(header, [
+            'id', 'dialect_data_id', 'dialect_name', 'submission_id', 'session_id', 'evaluator_name',
+            'evaluator_email', 'accuracy_rating', 'naturalness_rating', 'comments', 'created_at',
+        ])
+        evaluations = DialectEvaluation.objects.select_related('dialect_data', 'submission').order_by('pk')
+        self.assertEqual(rows, [[str(value) for value in (
+            evaluation.pk, evaluation.dialect_data_id, evaluation.dialect_data.dialect_name,
+            evaluation.submission_id, evaluation.submission.session_id, evaluation.submission.evaluator_name,
+            evaluation.submission.evaluator_email, evaluation.accuracy_rating, evaluation.naturalness_rating,
+            evaluation.comments, evaluation.created_at,
+        )] for evaluation in evaluations])
+
+    def test_gzipped_ndjson_of_every_table(self):
+        response, content = self.download(type='all', format='ndjson', gzip='1')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="all_evaluation_data.ndjson.gz"')
+        lines = [json.loads(line) for line in content.splitlines()]
+        tables = {}
+        for line in lines:
+            tables.setdefault(line.pop('table'), []).append(line)
+        self.assertEqual(list(tables), list(exporters.EXPORTS))
+        for export_type, (model, _) in exporters.EXPORTS.items():
+            self.assertEqual([row['id'] for row in tables[export_type]],
+                             list(model.objects.order_by('pk').values_list('pk', flat=True)))
+
+        evaluations = PlausibilityEvaluation.objects.select_related('submission').in_bulk()
+        for row in tables['plausibility_evaluations']:
+            evaluation = evaluations[row['id']]
+            self.assertEqual(row, {
+                'id': evaluation.pk,
+                'plausibility_data_id': evaluation.plausibility_data_id,
+                'submission_id': evaluation.submission_id,
+                'session_id': evaluation.submission.session_id,
+                'evaluator_name': evaluation.submission.evaluator_name,
+                'evaluator_email': evaluation.submission.evaluator_email,
+                'option_1_plausibility': evaluation.option_1_plausibility,
+                'option_2_plausibility': evaluation.option_2_plausibility,
+                'option_3_plausibility': evaluation.option_3_plausibility,
+                'comments': evaluation.comments,
+                'created_at': DjangoJSONEncoder().default(evaluation.created_at),
+            })
+        first = DialectEvaluation.objects.order_by('pk').first()
+        self.assertEqual(tables['dialect_evaluations'][0]['comments'], first.comments)
+        self.assertEqual(tables['dialect_evaluations'][0]['dialect_name'], first.dialect_data.dialect_name)
+
+    def test_async_stream_matches_sync_stream(self):
+        async def collect(*args):
+            return b''.join([chunk async for chunk in exporters.astream_export(*args)])
+
+        for export_types, output_format in [(['dialect_evaluations'], 'csv'), (list(exporters.EXPORTS), 'ndjson')]:
+            expected = b''.join(exporters.stream_export(export_types, output_format))
+            # Larger than one flush: the chunking is exercised
+            self.assertGreater(len(expected), exporters.FLUSH_SIZE)
+            self.assertEqual(async_to_sync(collect)(export_types, output_format), expected)
+            self.assertEqual(gzip.decompress(async_to_sync(collect)(export_types, output_format, True)), expected)
+
+    def test_invalid_requests(self):
+        url = reverse('evaluation:export_download')
+        self.assertEqual(self.client.get(url, {'type': 'all', 'format': 'csv'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'type': 'items', 'format': 'ndjson'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(url, {'type': 'submissions', 'format': 'csv'}).status_code, 302)
+
+
+@override_settings(**TEST_SETTINGS)
+class IncrementalExportTests(TestCase):
+    """
+    Keyset cursors and the settle window of the incremental export.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        cls.staff = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.url = reverse('evaluation:export_incremental')
+
+    def page(self, since=None, limit=30, **params):
+        params = {'type': 'submissions', 'limit': limit, **params}
+        if since:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def read_all(self, limit=30):
+        """
+        Follow the cursors to the end. Returns the ids read and the last cursor.
+        """
+        ids, cursor = [], None
+        while True:
+            page = self.page(cursor, limit)
+            ids += [row['id'] for row in page['data']]
+            cursor = page['next_cursor']
+            if not page['has_more']:
+                return ids, cursor
+
+    def submission(self, number, age=None):
+        submission = Submission.objects.create(session_id=f'incremental-{number}', evaluator_name=f'New {number}')
+        if age is not None:
+            Submission.objects.filter(pk=submission.pk).update(created_at=timezone.now() - age)
+        return submission.pk
+
+    def test_pages_resume_from_the_cursor(self):
+        ids, cursor = self.read_all()
+        self.assertEqual(ids, list(Submission.objects.order_by('pk').values_list('pk', flat=True)))
+        # Nothing new: an empty page with the same cursor
+        page = self.page(cursor)
+        self.assertEqual((page['data'], page['next_cursor'], page['has_more']), ([], cursor, False))
+
+        settled = self.submission(1, age=timedelta(minutes=1))
+        page = self.page(cursor)
+        self.assertEqual([row['id'] for row in page['data']], [settled])
+        self.assertEqual(self.page(page['next_cursor'])['data'], [])
+
+    def test_rows_inside_the_settle_window_hold_back_later_ones(self):
+        _, cursor = self.read_all()
+        recent = self.submission(1)
+        # A later id that is already settled must wait too, or the cursor would pass recent
+        later = self.submission(2, age=timedelta(minutes=1))
+        page = self.page(cursor)
+        self.assertEqual((page['data'], page['next_cursor']), ([], cursor))
+
+        with mock.patch.object(exporters, 'SETTLE_SECONDS', 0):
+            page = self.page(cursor)
+        self.assertEqual([row['id'] for row in page['data']], [recent, later])
+
+    def test_equal_created_at_across_a_page_boundary(self):
+        Submission.objects.update(created_at=timezone.now() - timedelta(days=1))
+        expected = list(Submission.objects.order_by('pk').values_list('pk', flat=True))
+        for limit in (7, len(expected) - 1, len(expected)):
+            self.assertEqual(self.read_all(limit)[0], expected)
+
+    def test_ndjson_page(self):
+        first = self.page(limit=5)
+        response = self.client.get(self.url, {'type': 'submissions', 'limit': 5, 'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, first['data'])
+        self.assertEqual(response['X-Next-Cursor'], first['next_cursor'])
+        self.assertEqual(response['X-Has-More'], 'true')
+
+    def test_malformed_or_mismatched_cursor(self):
+        cursor = self.page()['next_cursor']
+        not_json = base64.urlsafe_b64encode(b'{"t": ').decode()
+        no_id = base64.urlsafe_b64encode(json.dumps({'t': 'submissions'}).encode()).decode()
+        for params in [
+            {'type': 'submissions', 'since': 'not a cursor!'},
+            {'type': 'submissions', 'since': not_json},
+            {'type': 'submissions', 'since': no_id},
+            {'type': 'dialect_evaluations', 'since': cursor},
+            {'type': 'submissions', 'limit': 'ten'},
+            {'type': 'items'},
+            {},
+        ]:
+            with self.subTest(**params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+@override_settings(**TEST_SETTINGS)
+class MetricsTests(TestCase):
+    """
+    Access to and recording of the request metrics (evaluation/metrics.py).
+    """
+
+    def setUp(self):
+        self.url = reverse('evaluation:metrics')
+
+    def test_local_scraper(self):
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='127.0.0.1').status_code, 200)
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    def test_requests_through_a_proxy_are_not_local(self):
+        proxied = {'X-Forwarded-For': '203.0.113.5'}
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='127.0.0.1', headers=proxied).status_code, 403)
+        with self.settings(EVALUATION_TRUSTED_PROXIES=1):
+            self.assertEqual(self.client.get(self.url, REMOTE_ADDR='127.0.0.1', headers=proxied).status_code, 403)
+            # A spoofed entry comes before the one the proxy appends
+            spoofed = {'X-Forwarded-For': '127.0.0.1, 203.0.113.5'}
+            self.assertEqual(self.client.get(self.url, REMOTE_ADDR='127.0.0.1', headers=spoofed).status_code, 403)
+            self.assertEqual(self.client.get(self.url, REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'password'))
+        response = self.client.get(self.url, REMOTE_ADDR='203.0.113.5', headers={'X-Forwarded-For': '203.0.113.5'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_flush_runs_off_the_event_loop(self):
+        on_loop = []
+
+        def flush():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                on_loop.append(False)
+            else:
+                on_loop.append(True)
+
+        with mock.patch('evaluation.metrics.FLUSH_INTERVAL', 0), mock.patch.object(metrics.registry, 'flush', flush):
+            async_to_sync(self.async_client.get)(reverse('evaluation:thank_you'))
+            self.client.get(reverse('evaluation:thank_you'))
+        self.assertEqual(on_loop, [False, False])
+
+
+# Reliability data of Krippendorff (2011), "Computing Krippendorff's Alpha-Reliability":
+# four coders (rows) rate twelve units (columns), None where a coder skipped a unit.
+# The paper gives alpha = 0.849 for the interval metric.
+KRIPPENDORFF_EXAMPLE = [
+    [1, 2, 3, 3, 2, 1, 4, 1, 2, None, None, None],
+    [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, None, 3],
+    [None, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, None],
+    [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, None],
+]
+
+
+@override_settings(**TEST_SETTINGS)
+class AnalyticsTests(TestCase):
+    """
+    Agreement statistics of evaluation/analytics.py and how the report is served.
+    """
+
+    def setUp(self):
+        caches[analytics.CACHE_ALIAS].clear()
+
+    def metric(self, units, values, n_boot=1000, seed=0):
+        return analytics.analyse_metric(('metric', np.array(units), np.array(values, dtype=float), n_boot, seed))
+
+    def test_alpha_matches_the_reference_value(self):
+        units, values = [], []
+        for coder in KRIPPENDORFF_EXAMPLE:
+            for unit, value in enumerate(coder):
+                if value is not None:
+                    units.append(unit)
+                    values.append(value)
+        result = self.metric(units, values)
+        self.assertAlmostEqual(result['alpha'], 0.849, places=3)
+        self.assertEqual(result['ratings'], 41)
+        self.assertEqual(result['items'], 12)
+
+    def test_perfect_and_absent_variation(self):
+        self.assertEqual(self.metric([0, 0, 1, 1, 2, 2], [1, 1, 3, 3, 5, 5])['alpha'], 1.0)
+        # Every rating the same: no expected disagreement, alpha is undefined
+        self.assertIsNone(self.metric([0, 0, 1, 1], [4, 4, 4, 4])['alpha'])
+
+    def test_bootstrap_interval(self):
+        rng = np.random.default_rng(1)
+        n_units, per_unit = 400, 4
+        units = np.repeat(np.arange(n_units), per_unit)
+        values = (rng.integers(1, 6, n_units)[units] + rng.integers(-1, 2, len(units))).astype(float)
+        result = self.metric(units, values, n_boot=2000)
+
+        low, high = result['mean_ci']
+        self.assertLess(low, result['mean'])
+        self.assertGreater(high, result['mean'])
+        # Resampling units: with equal counts per unit the interval is that of the mean of unit means
+        unit_means = values.reshape(n_units, per_unit).mean(axis=1)
+        half_width = 1.96 * unit_means.std(ddof=1) / np.sqrt(n_units)
+        self.assertAlmostEqual((high - low) / 2, half_width, delta=half_width * 0.1)
+
+        low, high = result['alpha_ci']
+        self.assertLess(low, result['alpha'])
+        self.assertGreater(high, result['alpha'])
+        self.assertEqual(self.metric(units, values, n_boot=2000)['alpha_ci'], (low, high))
+
+    def test_resamples_without_pairable_units(self):
+        # One unit rated twice among singletons: most resamples hold no pairs at all
+        units = [0, 0] + list(range(1, 200))
+        values = [1, 5] + [3] * 199
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            result = self.metric(units, values, n_boot=500)
+        self.assertEqual(result['alpha'], 0.0)
+        self.assertIsNotNone(result['alpha_ci'][0])
+
+    def test_resample_totals(self):
+        columns = np.stack([np.ones(50), np.arange(50.0)], axis=1)
+        with mock.patch.object(analytics, 'BOOTSTRAP_BLOCK_CELLS', 500):
+            # Blocks of 10 resamples, the last one short
+            totals = analytics.resample_totals(np.random.default_rng(0), columns, 25)
+        self.assertEqual(totals.shape, (25, 2))
+        # Every resample draws as many units as there are
+        self.assertTrue((totals[:, 0] == 50).all())
+        self.assertTrue(((totals[:, 1] >= 0) & (totals[:, 1] <= 49 * 50)).all())
+        self.assertGreater(len(np.unique(totals[:, 1])), 1)
+
+    def test_stale_report_is_served_while_recomputing(self):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        first = analytics.get_report(n_boot=10)
+        self.assertNotIn('stale', first)
+        bump_version(EVALUATIONS)
+
+        with self.settings(EVALUATION_ANALYTICS_BACKGROUND=True), \
+                mock.patch.object(analytics.report_builder, 'start') as start:
+            # Only the data version is read
+            with self.assertNumQueries(2):
+                report = analytics.get_report(n_boot=10)
+            self.assertEqual(report['version'], first['version'])
+            self.assertTrue(report['stale'])
+            # Computed moments ago: no recomputation yet
+            start.assert_not_called()
+
+            with mock.patch.object(analytics, 'REBUILD_INTERVAL', 0):
+                analytics.get_report(n_boot=10)
+            start.assert_called_once_with(1, 10)
+
+            # What the builder thread does
+            analytics.store_report(analytics.compute_report(n_boot=10))
+            report = analytics.get_report(n_boot=10)
+        self.assertEqual(report['version'], data_version())
+        self.assertNotIn('stale', report)
+
+    def test_older_report_does_not_replace_the_latest(self):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        older = analytics.compute_report(n_boot=10)
+        bump_version(EVALUATIONS)
+        newer = analytics.compute_report(n_boot=10)
+        analytics.store_report(newer)
+        analytics.store_report(older)
+        self.assertEqual(caches[analytics.CACHE_ALIAS].get(analytics.LATEST_KEY)['version'], newer['version'])
+
+
+@override_settings(**TEST_SETTINGS)
+class SearchTests(TestCase):
+    """
+    Bangla normalization and index maintenance of evaluation/search.py.
+    """
+
+    def test_normalization(self):
+        normalize = search.normalize_search_text
+        # Split vowel sign o, with a non-joiner typed between its halves
+        self.assertEqual(normalize('কে‌া'), 'কো')
+        self.assertEqual(normalize('কো'), 'কো')
+        # Khanda ta in the old ZWJ encoding
+        self.assertEqual(normalize('উত্‍সব'), 'উৎসব')
+        # Long and short vowel spellings
+        self.assertEqual(normalize('বাড়ী'), normalize('বাড়ি'))
+        self.assertEqual(normalize('  Dhaka\n  ঢাকা '), 'dhaka ঢাকা')
+
+    def test_migration_indexes_like_the_app(self):
+        migration = importlib.import_module('evaluation.migrations.0010_search_index')
+        self.assertEqual(migration.FTS_TABLE, search.FTS_TABLE)
+        for text in ('কে‌া', 'উত্‍সব', 'বাড়ী', '  Dhaka\n  ঢাকা ', 'Ａ\u200bb'):
+            self.assertEqual(migration.normalize_search_text(text), search.normalize_search_text(text))
+
+    def test_index_follows_edits_and_deletes(self):
+        item = DialectData.objects.create(**SEARCH_ITEM)
+        self.assertEqual(search.search(SEARCH_QUERY), [('dialect', item.pk, ANY)])
+        item.original_standard_text = 'আমি রুটি খাই'
+        item.ai_generated_dialect_text = 'মুই রুটি খাইয়ুম'
+        item.save()
+        self.assertEqual(search.search(SEARCH_QUERY), [])
+        self.assertEqual([result[1] for result in search.search('রুটী')], [item.pk])
+        item.delete()
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_bulk_writes_are_indexed(self):
+        importers.import_records('dialect', enumerate([
+            {'dialect': 'sylheti', 'original': 'তুমি কোথায় যাও', 'generated': 'তুই খুনাই যাছ'},
+        ]))
+        item = DialectData.objects.get()
+        response = self.client.post(reverse('evaluation:submit_evaluation'), json.dumps({
+            'dialect_evaluations': [
+                {'dialect_data_id': item.pk, 'accuracy_rating': 4, 'naturalness_rating': 3,
+                 'comments': 'অনুবাদটি স্বাভাবিক'},
+            ],
+            'plausibility_evaluations': [],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        evaluation = DialectEvaluation.objects.get()
+        self.assertEqual(
+            [(kind, object_id) for kind, object_id, _ in search.search('কো‌থায়')], [('dialect', item.pk)],
+        )
+        self.assertEqual(
+            [(kind, object_id) for kind, object_id, _ in search.search('স্বাভাবিক')],
+            [('dialect_comment', evaluation.pk)],
+        )
+
+    def test_ranking_and_short_terms(self):
+        strong = DialectData.objects.create(
+            dialect_name='sylheti', original_standard_text='ভাত ভাত ভাত', ai_generated_dialect_text='ভাত',
+        )
+        weak = DialectData.objects.create(**SEARCH_ITEM)
+        DialectData.objects.create(
+            dialect_name='noakhali', original_standard_text='আমি রুটি খাই', ai_generated_dialect_text='আঁই রুটি খাই',
+        )
+        self.assertEqual([result[1] for result in search.search(SEARCH_QUERY)], [strong.pk, weak.pk])
+        # A two-letter term narrows the trigram match with LIKE
+        self.assertEqual([result[1] for result in search.search('ভাত মু')], [weak.pk])
+
+    def test_search_endpoint(self):
+        item = DialectData.objects.create(**SEARCH_ITEM)
+        client = Client()
+        self.assertEqual(client.get(reverse('evaluation:search'), {'q': SEARCH_QUERY}).status_code, 403)
+        client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'password'))
+        self.assertEqual(client.get(reverse('evaluation:search')).status_code, 400)
+        self.assertEqual(client.get(reverse('evaluation:search'), {'q': 'x', 'kind': 'nope'}).status_code, 400)
+        data = client.get(reverse('evaluation:search'), {'q': SEARCH_QUERY, 'kind': 'dialect'}).json()
+        self.assertEqual([result['id'] for result in data['results']], [item.pk])
+        self.assertEqual(data['results'][0]['admin_url'], reverse('admin:evaluation_dialectdata_change', args=[item.pk]))
+
+
+NEAR_DUPLICATES = [
+    {'question': 'বাংলাদেশের রাজধানী কোথায়?', 'correct': 'ঢাকা',
+     'wrong_1': 'চট্টগ্রাম', 'wrong_2': 'সিলেট', 'wrong_3': 'রাজশাহী'},
+    # Same question with one distractor spelled differently
+    {'question': 'বাংলাদেশের রাজধানী কোথায়?', 'correct': 'ঢাকা',
+     'wrong_1': 'চট্টগ্রাম', 'wrong_2': 'সিলেট', 'wrong_3': 'রাজশাহি'},
+    {'question': 'পদ্মা সেতুর দৈর্ঘ্য কত কিলোমিটার?', 'correct': '৬.১৫',
+     'wrong_1': '৫.৮', 'wrong_2': '৭.২', 'wrong_3': '৪.৯'},
+]
+
+
+@override_settings(**TEST_SETTINGS)
+class ImportTests(TransactionTestCase):
+    """
+    The import_dataset command and the write path of evaluation/importers.py. Runs
+    without the test transaction so the batches take the write lock as they would live.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_import(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_dataset', str(path), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def jsonl(self, records):
+        return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+    def test_dry_run_writes_nothing(self):
+        importers.import_records('plausibility', enumerate(NEAR_DUPLICATES[2:], start=1))
+        tables = (PlausibilityData, SearchDocument, ItemSignature)
+        counts = [model.objects.count() for model in tables]
+        version = get_version(ITEMS)
+
+        records = NEAR_DUPLICATES + [NEAR_DUPLICATES[0], {'question': 'প্রশ্ন?'}]
+        out, err = self.run_import('items.jsonl', self.jsonl(records), '--kind', 'plausibility', '--dry-run')
+        # Lines 1 and 2 are new (2 nearly duplicates 1), 3 is stored, 4 repeats 1 and 5 is invalid
+        self.assertIn('Would create 2 plausibility items', out)
+        self.assertIn('(2 duplicates, 1 near-duplicates, 1 invalid', out)
+        self.assertIn('line 5: missing correct_answer', err)
+        self.assertIn('line 2: near-duplicate of line 1', err)
+        self.assertEqual([model.objects.count() for model in tables], counts)
+        self.assertEqual(get_version(ITEMS), version)
+
+    def test_csv_input(self):
+        content = (
+            'dialect,original,generated\n'
+            'Sylheti,আমি ভাত খাই,"মুই ভাত খাইয়ুম, ভাই"\n'
+            'martian,আমি ভাত খাই,মুই ভাত খাইয়ুম\n'
+            'noakhali,"সে বলল ""না""",হেতে কইল না\n'
+        )
+        out, err = self.run_import('items.csv', content, '--kind', 'dialect')
+        self.assertIn('Created 2 dialect items', out)
+        # Line numbers count the header
+        self.assertIn("line 3: unknown dialect 'martian'", err)
+        self.assertEqual(
+            sorted(DialectData.objects.values_list('dialect_name', 'original_standard_text', 'ai_generated_dialect_text')),
+            [('noakhali', 'সে বলল "না"', 'হেতে কইল না'), ('sylheti', 'আমি ভাত খাই', 'মুই ভাত খাইয়ুম, ভাই')],
+        )
+        self.assertEqual(ItemSignature.objects.filter(kind='dialect').count(), 2)
+        # Imported again: all duplicates
+        out, _ = self.run_import('items.csv', content, '--kind', 'dialect')
+        self.assertIn('Created 0 dialect items', out)
+        self.assertIn('(2 duplicates', out)
+
+    def test_batches_take_the_write_lock(self):
+        records = [{**NEAR_DUPLICATES[2], 'question': f'প্রশ্ন {number}?'} for number in range(5)]
+        with mock.patch.object(write_lock, 'write_lock', wraps=write_lock.write_lock) as lock:
+            stats = importers.import_records(
+                'plausibility', enumerate(records, start=1), batch_size=2, near_duplicate_mode='off',
+            )
+        self.assertEqual(stats.created, 5)
+        self.assertEqual(lock.call_count, 3)
+
+
+def locked_error():
+    return OperationalError('database is locked')
+
+
+@override_settings(**TEST_SETTINGS)
+class WriteLockTests(TransactionTestCase):
+    """
+    Queueing and retries of evaluation/write_lock.py, and the SQLite production profile.
+    Runs without the test transaction: locked_write runs nested calls directly.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(write_lock.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def locked(self, *outcomes):
+        """
+        A locked_write function that raises or returns each of outcomes in turn.
+        """
+        func = mock.Mock(side_effect=outcomes)
+        return write_lock.locked_write(func), func
+
+    def test_locked_database_is_retried_with_backoff(self):
+        wrapped, func = self.locked(locked_error(), locked_error(), 'done')
+        self.assertEqual(wrapped(1, key='value'), 'done')
+        self.assertEqual(func.call_args_list, [mock.call(1, key='value')] * 3)
+        first, second = [call.args[0] for call in self.sleep.call_args_list]
+        self.assertTrue(write_lock.BACKOFF <= first <= 2 * write_lock.BACKOFF)
+        self.assertTrue(2 * write_lock.BACKOFF <= second <= 4 * write_lock.BACKOFF)
+
+    def test_retries_run_out(self):
+        wrapped, func = self.locked(*[locked_error()] * write_lock.RETRIES)
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            wrapped()
+        self.assertEqual(func.call_count, write_lock.RETRIES)
+
+    def test_other_errors_are_not_retried(self):
+        wrapped, func = self.locked(OperationalError('no such table: evaluation_item'))
+        with self.assertRaises(OperationalError):
+            wrapped()
+        self.assertEqual(func.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_nested_and_disabled_calls_run_directly(self):
+        with mock.patch.object(write_lock, 'write_lock', wraps=write_lock.write_lock) as lock:
+            wrapped, func = self.locked(locked_error())
+            # Only the outermost transaction can be retried
+            with transaction.atomic(), self.assertRaises(OperationalError):
+                wrapped()
+            with self.settings(EVALUATION_WRITE_LOCK=False):
+                wrapped, func = self.locked(locked_error())
+                with self.assertRaises(OperationalError):
+                    wrapped()
+        self.assertEqual(func.call_count, 1)
+        lock.assert_not_called()
+
+    @skipIf(write_lock.fcntl is None, 'no flock on this platform')
+    def test_writers_queue_on_the_lock_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'locks', 'write.lock')
+        ran = threading.Event()
+        writer = threading.Thread(target=write_lock.locked_write(ran.set))
+
+        with self.settings(EVALUATION_WRITE_LOCK_PATH=path), mock.patch.object(write_lock, '_lock_file', None):
+            os.makedirs(os.path.dirname(path))
+            # Another process holding the lock
+            with open(path, 'a+b') as other:
+                write_lock.fcntl.flock(other, write_lock.fcntl.LOCK_EX)
+                writer.start()
+                self.assertFalse(ran.wait(0.2))
+                write_lock.fcntl.flock(other, write_lock.fcntl.LOCK_UN)
+                writer.join(5)
+            self.assertTrue(ran.is_set())
+            write_lock._lock_file.close()
+
+    def load_settings(self, **environ):
+        spec = importlib.util.spec_from_file_location(
+            'profile_settings', Path(__file__).resolve().parent.parent / 'banglaverse_project' / 'settings.py',
+        )
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, environ):
+            spec.loader.exec_module(module)
+        return module.DATABASES['default']
+
+    def test_production_profile(self):
+        self.assertNotIn('OPTIONS', self.load_settings(BANGLAVERSE_SQLITE_PROFILE='basic'))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database = self.load_settings(
+            BANGLAVERSE_SQLITE_PROFILE='production', BANGLAVERSE_DB_PATH=os.path.join(directory.name, 'db.sqlite3'),
+        )
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL;', database['OPTIONS']['init_command'])
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+
+        # What a connection made with it gets
+        profile = ConnectionHandler({'default': database})['default']
+        self.addCleanup(profile.close)
+        with profile.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone(), (20000,))
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (1,))
+        self.assertEqual(profile.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(**TEST_SETTINGS)
+class NearDuplicateTests(TestCase):
+    """
+    MinHash signatures, the import-time check and cluster listing of evaluation/near_duplicates.py.
+    """
+
+    def import_items(self, records, mode='flag'):
+        return importers.import_records('plausibility', enumerate(records, start=1), near_duplicate_mode=mode)
+
+    def test_signatures_estimate_similarity(self):
+        sigs = near_duplicates.signatures([
+            'আমি ভাত খাই, তুমি কোথায় যাও?', 'আমি ভাত খাই, তুমি কোথায় যাও', 'সে বই পড়ছে',
+        ])
+        self.assertEqual(sigs.shape, (3, near_duplicates.NUM_PERM))
+        self.assertTrue((near_duplicates.signatures(['সে বই পড়ছে']) == sigs[2]).all())
+        self.assertGreater(near_duplicates.similarity(sigs[0], sigs[1]), 0.8)
+        self.assertLess(near_duplicates.similarity(sigs[0], sigs[2]), 0.2)
+
+    def test_migration_signs_like_the_app(self):
+        migration = importlib.import_module('evaluation.migrations.0011_near_duplicate_index')
+        texts = ['আমি ভাত খাই', 'আমি ভাত খাইয়ুম', 'x', 'বাড়ী যাব\n' * 40]
+        expected = near_duplicates.signatures(search.normalize_search_text(text) for text in texts)
+        sigs = migration.signatures(migration.normalize_search_text(text) for text in texts)
+        np.testing.assert_array_equal(sigs, expected)
+        np.testing.assert_array_equal(migration.bucket_keys(sigs), near_duplicates.bucket_keys(expected))
+
+    def test_migration_buckets_dialects_like_the_app(self):
+        migration = importlib.import_module('evaluation.migrations.0013_partition_dialect_buckets')
+        sigs = near_duplicates.signatures(['আমি ভাত খাই', 'আমি ভাত খাইয়ুম'])
+        dialects = ['sylheti', 'noakhali']
+        np.testing.assert_array_equal(migration.bucket_keys(sigs), near_duplicates.bucket_keys(sigs))
+        np.testing.assert_array_equal(
+            migration.bucket_keys(sigs, dialects), near_duplicates.bucket_keys(sigs, dialects),
+        )
+
+    def test_dialects_are_not_near_duplicates_of_each_other(self):
+        def record(dialect, text):
+            return {'dialect_name': dialect, 'original_standard_text': 'আমি ভাত খাই', 'ai_generated_dialect_text': text}
+
+        stats = importers.import_records('dialect', enumerate([
+            record('sylheti', 'আমি ভাত খাই'),
+            record('noakhali', 'আমি ভাত খাই'),
+        ], start=1))
+        self.assertEqual(stats.created, 2)
+        self.assertEqual(stats.near_duplicates, [])
+        stats = importers.import_records('dialect', enumerate([record('noakhali', 'আমি ভাত খাই।')], start=1))
+        noakhali = DialectData.objects.get(dialect_name='noakhali', ai_generated_dialect_text='আমি ভাত খাই')
+        self.assertEqual([(line, match) for line, match, _ in stats.near_duplicates], [(1, f'item #{noakhali.pk}')])
+
+        index = near_duplicates.dialect_near_duplicates
+        sylheti = DialectData.objects.get(dialect_name='sylheti')
+        self.assertEqual(index.clusters([sylheti.pk]), [])
+        # Moving an item to another dialect moves its buckets
+        variant = DialectData.objects.get(ai_generated_dialect_text='আমি ভাত খাই।')
+        variant.dialect_name = 'sylheti'
+        variant.save(update_fields=['dialect_name'])
+        self.assertEqual([cluster['item_ids'] for cluster in index.clusters([sylheti.pk])],
+                         [sorted([sylheti.pk, variant.pk])])
+
+    def test_import_flags_near_duplicates(self):
+        stats = self.import_items(NEAR_DUPLICATES[:1])
+        first = PlausibilityData.objects.get()
+        stats = self.import_items(NEAR_DUPLICATES[1:])
+        self.assertEqual(stats.created, 2)
+        self.assertEqual([(line, match) for line, match, _ in stats.near_duplicates], [(1, f'item #{first.pk}')])
+        self.assertEqual(ItemSignature.objects.count(), 3)
+
+    def test_import_skips_near_duplicates(self):
+        stats = self.import_items(NEAR_DUPLICATES, mode='skip')
+        self.assertEqual(stats.created, 2)
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual([(line, match) for line, match, _ in stats.near_duplicates], [(2, 'line 1')])
+        self.assertEqual(PlausibilityData.objects.filter(wrong_option_3='রাজশাহি').count(), 0)
+
+    def test_rows_written_concurrently_are_not_counted(self):
+        check = importers._check_near_duplicates
+
+        def concurrent_import(*args, **kwargs):
+            # Another import writes the last record between the duplicate check and the insert
+            PlausibilityData.objects.create(
+                question='পদ্মা সেতুর দৈর্ঘ্য কত কিলোমিটার?', correct_answer='৬.১৫',
+                wrong_option_1='৫.৮', wrong_option_2='৭.২', wrong_option_3='৪.৯',
+            )
+            return check(*args, **kwargs)
+
+        with mock.patch.object(importers, '_check_near_duplicates', side_effect=concurrent_import):
+            stats = self.import_items(NEAR_DUPLICATES)
+        self.assertEqual(stats.created, 2)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertEqual(PlausibilityData.objects.filter(correct_answer='৬.১৫').count(), 1)
+        self.assertEqual(ItemSignature.objects.filter(kind='plausibility').count(), 3)
+
+    def test_clusters_follow_edits(self):
+        self.import_items(NEAR_DUPLICATES, mode='off')
+        index = near_duplicates.plausibility_near_duplicates
+        original, variant, other = PlausibilityData.objects.order_by('pk')
+        self.assertEqual([cluster['item_ids'] for cluster in index.clusters()], [[original.pk, variant.pk]])
+        self.assertEqual(index.clusters([other.pk]), [])
+        variant.question = 'বাংলাদেশের বৃহত্তম সমুদ্রবন্দর কোনটি?'
+        variant.save()
+        self.assertEqual(index.clusters(), [])
+        other.delete()
+        self.assertEqual(ItemSignature.objects.filter(item_id=other.pk, kind='plausibility').count(), 0)
+
+    def test_admin_action(self):
+        self.import_items(NEAR_DUPLICATES)
+        self.client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'password'))
+        response = self.client.post(changelist_url(PlausibilityData), {
+            'action': 'find_near_duplicates',
+            '_selected_action': list(PlausibilityData.objects.values_list('pk', flat=True)),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '2 items, up to')
+
+
+@override_settings(**TEST_SETTINGS)
+class IdempotencyTests(TestCase):
+    """
+    Retried submissions carrying the same Idempotency-Key.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        self.submissions = Submission.objects.count()
+
+    def payload(self, **extra):
+        item = DialectData.objects.order_by('pk').first()
+        return {
+            'dialect_evaluations': [{'dialect_data_id': item.pk, 'accuracy_rating': 4, 'naturalness_rating': 3}],
+            'plausibility_evaluations': [],
+            **extra,
+        }
+
+    def post(self, payload, key):
+        return self.client.post(
+            reverse('evaluation:submit_evaluation'), json.dumps(payload), content_type='application/json',
+            headers={'Idempotency-Key': key},
+        )
+
+    def test_replay_returns_original_response(self):
+        # No session id or email: without the key a retry would be stored twice
+        payload = self.payload()
+        first = self.post(payload, 'key-1')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(1):
+            retry = self.post(payload, 'key-1')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Submission.objects.count(), self.submissions + 1)
+        self.assertEqual(Submission.objects.get(idempotency_key='key-1').session_id, first.json()['session_id'])
+
+    def test_replay_with_email(self):
+        payload = self.payload(evaluator_email='retry@example.com')
+        first = self.post(payload, 'key-2')
+        self.assertEqual(self.post(payload, 'key-2').json(), first.json())
+        # A new key is a new submission, and the email rule still applies to it
+        self.assertEqual(self.post(payload, 'key-3').status_code, 400)
+
+    def test_concurrent_posts_share_one_submission(self):
+        # Both posts pass the replay lookup; the unique index settles the race
+        session_id = save_submission(validate_submission(self.payload(), 'key-4'))
+        with self.assertRaises(AlreadySubmitted) as raised:
+            save_submission(validate_submission(self.payload(), 'key-4'))
+        self.assertEqual(raised.exception.session_id, session_id)
+        self.assertEqual(Submission.objects.count(), self.submissions + 1)
+
+    def test_invalid_key(self):
+        self.assertEqual(self.post(self.payload(), 'k' * 101).status_code, 400)
+        self.assertEqual(Submission.objects.count(), self.submissions)
+
+    def test_write_behind_replay(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('evaluation.views.journal', Journal(os.path.join(directory, 'journal.sqlite3'))) as queue, \
+                mock.patch.object(Journal, '_start'), \
+                self.settings(EVALUATION_WRITE_BEHIND=True):
+            first = self.post(self.payload(), 'key-5')
+            self.assertEqual(self.post(self.payload(), 'key-5').json(), first.json())
+            self.assertEqual(queue.counts(), {'pending': 1})
+            self.assertEqual(queue.flush(), (1, 0))
+            self.assertEqual(self.post(self.payload(), 'key-5').json(), first.json())
+            self.assertEqual(queue.counts(), {})
+        self.assertEqual(Submission.objects.get(idempotency_key='key-5').session_id, first.json()['session_id'])
+
+    def test_service_worker(self):
+        response = self.client.get(reverse('evaluation:service_worker'))
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertContains(response, 'Idempotency-Key')
+
+
+@override_settings(**TEST_SETTINGS)
+class JournalTests(TestCase):
+    """
+    Write-behind journal of evaluation/journal.py: crash recovery, rejected entries and uniqueness.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = Journal(os.path.join(directory.name, 'journal.sqlite3'))
+        starter = mock.patch.object(Journal, '_start')
+        starter.start()
+        self.addCleanup(starter.stop)
+
+    def cleaned(self, item=None, idempotency_key=None, **extra):
+        item = item or DialectData.objects.order_by('pk').first()
+        return validate_submission({
+            'dialect_evaluations': [{'dialect_data_id': item.pk, 'accuracy_rating': 4, 'naturalness_rating': 3}],
+            'plausibility_evaluations': [],
+            **extra,
+        }, idempotency_key)
+
+    def expire_claims(self):
+        self.journal._connect().execute(
+            'UPDATE journal SET claimed_at = ? WHERE claimed_at IS NOT NULL', (time.time() - CLAIM_TIMEOUT - 1,)
+        )
+
+    def test_unsettled_claim_is_flushed_again(self):
+        session_id = self.journal.append(self.cleaned())
+        # A flusher claimed the entry and died before writing it
+        self.journal._claim(10)
+        self.assertEqual(self.journal.flush(), (0, 0))
+        self.assertEqual(self.journal.counts(), {'pending': 1})
+        self.expire_claims()
+        self.assertEqual(self.journal.flush(), (1, 0))
+        self.assertEqual(self.journal.counts(), {})
+        self.assertTrue(Submission.objects.filter(session_id=session_id).exists())
+
+    def test_entry_written_before_a_crash_is_not_stored_twice(self):
+        cleaned = self.cleaned()
+        self.journal.append(cleaned)
+        # The flusher committed the batch and died before removing the entry
+        self.journal._claim(10)
+        save_submissions([cleaned])
+        self.expire_claims()
+        self.assertEqual(self.journal.flush(), (0, 0))
+        self.assertEqual(self.journal.counts(), {})
+        self.assertEqual(Submission.objects.filter(session_id=cleaned['session_id']).count(), 1)
+
+    def test_rejected_entry_fails_alone(self):
+        doomed = DialectData.objects.create(
+            dialect_name='sylheti', original_standard_text='doomed', ai_generated_dialect_text='doomed',
+        )
+        first = self.journal.append(self.cleaned())
+        rejected = self.journal.append(self.cleaned(doomed))
+        last = self.journal.append(self.cleaned())
+        doomed.delete()
+
+        with self.assertLogs('evaluation.journal', 'ERROR'):
+            self.assertEqual(self.journal.flush(), (2, 1))
+        self.assertEqual(self.journal.counts(), {'failed': 1})
+        (_, session_id, _, error), = self.journal.failed_entries()
+        self.assertEqual(session_id, rejected)
+        self.assertIn('Unknown dialect_data_id', error)
+        self.assertEqual(set(Submission.objects.filter(session_id__in=[first, rejected, last]).values_list(
+            'session_id', flat=True)), {first, last})
+        self.assertEqual(self.journal.requeue_failed(), 1)
+        self.assertEqual(self.journal.counts(), {'pending': 1})
+
+    def test_email_and_session_are_unique_while_queued(self):
+        queued = self.cleaned(evaluator_email='Queued@example.com')
+        self.journal.append(queued)
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_EMAIL_ERROR):
+            self.journal.append(self.cleaned(evaluator_email='queued@example.com'))
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_SESSION_ERROR):
+            self.journal.append(self.cleaned(session_id=queued['session_id']))
+        self.assertEqual(self.journal.counts(), {'pending': 1})
+
+    def fail(self, **extra):
+        """
+        Queue an entry that fails to write. Returns its cleaned submission.
+        """
+        doomed = DialectData.objects.create(
+            dialect_name='sylheti', original_standard_text='doomed', ai_generated_dialect_text='doomed',
+        )
+        cleaned = self.cleaned(doomed, **extra)
+        self.journal.append(cleaned)
+        doomed.delete()
+        with self.assertLogs('evaluation.journal', 'ERROR'):
+            self.assertEqual(self.journal.flush(), (0, 1))
+        return cleaned
+
+    def test_failed_entry_does_not_block_a_new_submission(self):
+        failed = self.fail(evaluator_email='failed@example.com', idempotency_key='retry-key')
+        self.assertEqual(self.journal.failed_entries()[0][1], failed['session_id'])
+        # The key no longer answers for the failed entry
+        self.assertIsNone(self.journal.replayed_session('retry-key'))
+        retry = self.cleaned(
+            evaluator_email='Failed@example.com', session_id=failed['session_id'], idempotency_key='retry-key',
+        )
+        self.assertEqual(self.journal.append(retry), failed['session_id'])
+        self.assertEqual(self.journal.queued_session('retry-key'), failed['session_id'])
+        self.assertEqual(self.journal.counts(), {'failed': 1, 'pending': 1})
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_EMAIL_ERROR):
+            self.journal.append(self.cleaned(evaluator_email='failed@example.com'))
+
+        # Superseded by the new entry: stays failed instead of breaking uniqueness
+        self.assertEqual(self.journal.requeue_failed(), 0)
+        self.assertEqual(self.journal.flush(), (1, 0))
+        self.assertEqual(self.journal.counts(), {'failed': 1})
+        self.assertEqual(Submission.objects.get(session_id=failed['session_id']).evaluator_email, 'failed@example.com')
+
+    def test_journal_with_unique_columns_is_upgraded(self):
+        db = sqlite3.connect(self.journal.path, isolation_level=None)
+        db.executescript("""
+            CREATE TABLE journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL UNIQUE,
+                email TEXT UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                created_at REAL NOT NULL,
+                claimed_at REAL
+            );
+            INSERT INTO journal (session_id, email, payload, status, error, created_at)
+                VALUES ('failed-session', 'failed@example.com', '{}', 'failed', 'Unknown dialect_data_id', 0);
+        """)
+        db.close()
+        self.assertEqual(self.journal.counts(), {'failed': 1})
+        self.journal.append(self.cleaned(evaluator_email='failed@example.com', session_id='failed-session'))
+        self.assertEqual(self.journal.counts(), {'failed': 1, 'pending': 1})
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_EMAIL_ERROR):
+            self.journal.append(self.cleaned(evaluator_email='failed@example.com'))
+
+    def test_email_already_in_the_database_is_not_queued(self):
+        save_submission(self.cleaned(evaluator_email='stored@example.com'))
+        with self.assertRaisesMessage(SubmissionError, DUPLICATE_EMAIL_ERROR):
+            self.journal.append(self.cleaned(evaluator_email='stored@example.com'))
+        self.assertEqual(self.journal.counts(), {})
+
+
+@override_settings(**TEST_SETTINGS)
+class StaticAssetTests(TestCase):
+    """
+    collectstatic output and serving of evaluation/static_assets.py.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.built = override_settings(
+            STATIC_ROOT=cls.static_root.name,
+            STORAGES={**TEST_SETTINGS['STORAGES'], 'staticfiles': {
+                'BACKEND': 'evaluation.static_assets.CompressedManifestStaticFilesStorage',
+            }},
+        )
+        cls.built.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        # Pages cached by other tests link to the plain names
+        page_cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.built.disable()
+        page_cache.clear()
+        cls.static_root.cleanup()
+        super().tearDownClass()
+
+    def asset_url(self, extension):
+        page = self.client.get(reverse('evaluation:home')).content.decode()
+        url = next(part for part in page.split('"') if part.startswith('/static/') and part.endswith(extension))
+        self.assertRegex(url, r'\.[0-9a-f]{12}\.' + extension.lstrip('.') + '$')
+        return url
+
+    def test_hashed_assets_are_precompressed_and_immutable(self):
+        url = self.asset_url('.css')
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        compressed = b''.join(response.streaming_content)
+
+        plain = self.client.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(compressed), b''.join(plain.streaming_content))
+        self.assertLess(len(compressed), int(plain['Content-Length']))
+
+        not_modified = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unhashed_names_are_revalidated(self):
+        response = self.client.get('/static/evaluation/js/home.js')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+        self.assertEqual(self.client.get('/static/evaluation/js/missing.js').status_code, 404)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_service_worker_precaches_hashed_assets(self):
+        response = self.client.get(reverse('evaluation:service_worker'))
+        self.assertContains(response, self.asset_url('.js'))
+
+    def test_async_serving(self):
+        url = self.asset_url('.css')
+        response = async_to_sync(self.async_client.get)(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        plain = self.client.get(url)
+        self.assertEqual(gzip.decompress(response.content), b''.join(plain.streaming_content))
+
+    def test_no_middleware_is_adapted_under_asgi(self):
+        # An adapted middleware makes every ASGI request hold a thread. Django
+        # only logs the adaptations with DEBUG on.
+        with self.settings(DEBUG=True), self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('middleware loaded')
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+
+
+@override_settings(**TEST_SETTINGS)
+class PageCacheTests(TestCase):
+    """
+    Rendered-page cache and conditional GETs of evaluation/page_cache.py.
+    """
+
+    def setUp(self):
+        page_cache.clear()
+
+    def test_pages_are_rendered_once(self):
+        url = reverse('evaluation:home')
+        with mock.patch('evaluation.page_cache.render_to_string', wraps=render_to_string) as render:
+            first = self.client.get(url)
+            second = self.client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(render.call_count, 1)
+        self.assertContains(first, 'sylheti')
+        self.assertEqual(gzip.decompress(second.content), first.content)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(first['Vary'], 'Accept-Encoding')
+        self.assertEqual(first['Cache-Control'], 'no-cache')
+
+    def test_conditional_get(self):
+        url = reverse('evaluation:thank_you')
+        etag = self.client.get(url, headers={'Accept-Encoding': 'gzip'})['ETag']
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # The identity representation has another tag
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_template_change_clears_cache(self):
+        self.client.get(reverse('evaluation:home'))
+        with mock.patch('evaluation.page_cache.render_to_string', wraps=render_to_string) as render:
+            source_file_changed(None, file_path=Path('evaluation/templates/evaluation/home.html'))
+            self.client.get(reverse('evaluation:home'))
+        self.assertEqual(render.call_count, 1)
+
+    def test_export_page_is_private(self):
+        url = reverse('evaluation:export_page')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'password'))
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+
+@override_settings(**{**TEST_SETTINGS, 'EVALUATION_RATE_LIMIT': True, 'EVALUATION_RATE_LIMITS': {'items': (3, 60)}})
+class AdmissionTests(TestCase):
+    """
+    Rate limiting and load shedding of evaluation/admission.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+
+    def setUp(self):
+        reset_caches()
+        buckets.clear()
+        self.url = reverse('evaluation:get_dialect_data')
+        # Like a browser, open the page (and get a client id) before calling the API
+        self.client.get(reverse('evaluation:home'))
+
+    def get(self, address='10.0.0.1'):
+        return self.client.get(self.url, {'dialect': 'sylheti'}, REMOTE_ADDR=address)
+
+    def test_rate_limit(self):
+        for _ in range(3):
+            self.assertEqual(self.get().status_code, 200)
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(response.json()['success'])
+        # Buckets are per client
+        self.assertEqual(self.get('10.0.0.2').status_code, 200)
+        self.assertEqual(in_flight.count, 0)
+
+    def test_async_rate_limit(self):
+        take = buckets.take
+        on_loop = []
+
+        def checked_take(*args):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                on_loop.append(False)
+            else:
+                on_loop.append(True)
+            return take(*args)
+
+        get = async_to_sync(self.async_client.get)
+        get(reverse('evaluation:home'))
+        with mock.patch.object(buckets, 'take', checked_take):
+            statuses = [get(self.url, {'dialect': 'sylheti'}).status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        # The client's bucket, then the address's
+        self.assertEqual(on_loop, [False] * 7)
+        self.assertEqual(in_flight.count, 0)
+
+    def test_browsers_behind_one_address_have_own_buckets(self):
+        # A classroom behind one NAT address: every browser opens the page, then starts at once
+        browsers = [Client() for _ in range(30)]
+        for browser in browsers:
+            response = browser.get(reverse('evaluation:home'), REMOTE_ADDR='10.0.0.1')
+            self.assertTrue(response.cookies[CLIENT_COOKIE]['httponly'])
+        for _ in range(3):
+            for browser in browsers:
+                response = browser.get(self.url, {'dialect': 'sylheti'}, REMOTE_ADDR='10.0.0.1')
+                self.assertEqual(response.status_code, 200)
+        # Each browser still has its own limit
+        self.assertEqual(browsers[0].get(self.url, {'dialect': 'sylheti'}, REMOTE_ADDR='10.0.0.1').status_code, 429)
+
+    def test_made_up_client_ids_are_capped_per_address(self):
+        with self.settings(EVALUATION_RATE_LIMIT_CLIENTS_PER_IP=2):
+            statuses = []
+            for _ in range(7):
+                self.client.cookies[CLIENT_COOKIE] = uuid.uuid4().hex
+                statuses.append(self.get().status_code)
+        self.assertEqual(statuses, [200] * 6 + [429])
+
+    def test_requests_without_client_id_share_the_address(self):
+        statuses = []
+        for _ in range(4):
+            self.client.cookies.clear()
+            statuses.append(self.get().status_code)
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    def test_refill(self):
+        for _ in range(4):
+            self.get()
+        with mock.patch('evaluation.admission.time.time', return_value=time.time() + 1):
+            self.assertEqual(self.get().status_code, 200)
+
+    def test_logged_in_users_have_own_bucket(self):
+        for _ in range(4):
+            self.get()
+        self.client.force_login(User.objects.create_user('evaluator', password='password'))
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_trusted_proxy(self):
+        for _ in range(4):
+            self.get()
+        with self.settings(EVALUATION_TRUSTED_PROXIES=1):
+            response = self.client.get(
+                self.url, {'dialect': 'sylheti'}, REMOTE_ADDR='10.0.0.1',
+                headers={'X-Forwarded-For': '203.0.113.5, 198.51.100.7'},
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_scopes(self):
+        for _ in range(4):
+            self.get()
+        # The item views share a bucket
+        response = self.client.get(reverse('evaluation:session_bundle'), {'dialect': 'sylheti'}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        # Scopes without a configured limit aren't limited
+        for _ in range(5):
+            response = self.client.post(
+                reverse('evaluation:submit_evaluation'), 'not json', content_type='application/json',
+                REMOTE_ADDR='10.0.0.1',
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_store_failure_lets_requests_through(self):
+        with mock.patch.object(buckets, 'take', side_effect=sqlite3.OperationalError('database is locked')), \
+                self.assertLogs('evaluation.admission', 'ERROR'):
+            for _ in range(5):
+                self.assertEqual(self.get().status_code, 200)
+
+    def test_shedding(self):
+        with self.settings(EVALUATION_MAX_IN_FLIGHT=1):
+            self.assertTrue(in_flight.acquire(1))
+            try:
+                response = self.get()
+            finally:
+                in_flight.release()
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '2')
+            self.assertEqual(self.get().status_code, 200)
+        # Pages aren't subject to admission control
+        self.assertEqual(self.client.get(reverse('evaluation:home')).status_code, 200)
+
+    def test_rejections_are_counted(self):
+        for _ in range(4):
+            self.get()
+        response = self.client.get(reverse('evaluation:metrics'))
+        self.assertContains(
+            response,
+            'banglaverse_admission_rejected_total{view="evaluation:get_dialect_data",reason="rate_limited"}',
+        )
+
+
+@override_settings(**TEST_SETTINGS)
+class SnapshotTests(TransactionTestCase):
+    """
+    SQLite snapshot downloads of evaluation/snapshots.py. The backup API can't
+    copy a database with a write transaction open on the same connection,
+    so these tests (and the query budget of export_snapshot) run without the
+    test transaction.
+    """
+    # seed() expects ids to continue from the highest one left in each table
+    reset_sequences = True
+
+    def setUp(self):
+        # The flush between tests resets the data versions; keep each test's snapshots apart
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = self.settings(EVALUATION_SNAPSHOT_DIR=directory.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        seed(SMALL_ITEMS, SMALL_EVALUATIONS)
+        reset_caches()
+        self.client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'password'))
+        self.url = reverse('evaluation:export_snapshot')
+
+    def open_snapshot(self, response):
+        self.assertEqual(response.status_code, 200)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'snapshot.sqlite3')
+        with open(path, 'wb') as f:
+            f.write(gzip.decompress(response.getvalue()))
+        db = sqlite3.connect(path)
+        self.addCleanup(db.close)
+        return db
+
+    def columns(self, db, table):
+        return [row[1] for row in db.execute(f'PRAGMA table_info("{table}")')]
+
+    def test_query_budget(self):
+        self.client.get(self.url)
+        # Session, user and the two data versions
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_snapshot(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        db = self.open_snapshot(response)
+        tables = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        self.assertEqual(tables, sorted(snapshots.EXPORTS))
+        self.assertEqual(
+            db.execute('SELECT COUNT(*) FROM dialect_evaluations').fetchone()[0], DialectEvaluation.objects.count(),
+        )
+        self.assertNotIn('evaluator_email', self.columns(db, 'submissions'))
+        self.assertIn('evaluator_email', self.columns(self.open_snapshot(self.client.get(self.url, {'pii': '1'})), 'submissions'))
+
+    def test_columns(self):
+        response = self.client.get(self.url, {'columns': 'dialect_evaluations.accuracy_rating,dialect_evaluations.dialect_data_id'})
+        db = self.open_snapshot(response)
+        self.assertEqual(self.columns(db, 'dialect_evaluations'), ['id', 'dialect_data_id', 'accuracy_rating'])
+        self.assertIn('comments', self.columns(db, 'plausibility_evaluations'))
+        self.assertEqual(self.client.get(self.url, {'columns': 'submissions.password'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'columns': 'auth_user.password'}).status_code, 400)
+
+    def test_ranges(self):
+        full = self.client.get(self.url)
+        content, etag = full.getvalue(), full['ETag']
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.getvalue(), content[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(content)}')
+        response = self.client.get(self.url, headers={'Range': 'bytes=-5', 'If-Range': etag})
+        self.assertEqual(response.getvalue(), content[-5:])
+        response = self.client.get(self.url, headers={'Range': 'bytes=10-'})
+        self.assertEqual(response.getvalue(), content[10:])
+        # A range of an older snapshot gets the whole current one
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"outdated"'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, headers={'Range': f'bytes={len(content)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(content)}')
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_cached_until_data_changes(self):
+        with mock.patch('evaluation.snapshots.build', wraps=snapshots.build) as build:
+            first = self.client.get(self.url)
+            self.client.get(self.url)
+            self.assertEqual(build.call_count, 1)
+            # Deleting a submission's email must not leave it in the served snapshot
+            submission = Submission.objects.exclude(evaluator_email=None).first()
+            submission.evaluator_email = None
+            submission.save()
+            second = self.client.get(self.url)
+            self.assertEqual(build.call_count, 2)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['X-Snapshot-Version'], data_version())
+        self.assertNotEqual(first['X-Snapshot-Version'], second['X-Snapshot-Version'])
+        # The older snapshot is gone
+        self.assertEqual(len(os.listdir(snapshots.snapshot_dir())), 1)
+
+    def test_version_is_read_from_the_copy(self):
+        # The data moved on between the version check and the backup
+        with mock.patch('evaluation.snapshots.data_version', return_value='0.0'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Snapshot-Version'], data_version())
+
+    def test_newer_snapshots_are_kept(self):
+        path = snapshots.build(snapshots.projection())
+        items, evaluations = snapshots.parse_version(snapshots.snapshot_version(path))
+        digest = snapshots.projection_digest(snapshots.projection())
+        # A build of later data that finished first
+        newer = os.path.join(snapshots.snapshot_dir(), snapshots.snapshot_name(digest, f'{items}.{evaluations + 1}'))
+        older = os.path.join(snapshots.snapshot_dir(), snapshots.snapshot_name(digest, f'{items}.{evaluations - 1}'))
+        for other in (newer, older):
+            shutil.copy(path, other)
+        snapshots.remove_outdated(path)
+        self.assertEqual(sorted(snapshots.snapshots_of(digest).values()), sorted([path, newer]))
+        self.assertEqual(snapshots.latest_snapshot(digest), newer)
+
+    def test_background_build(self):
+        params = {'columns': 'submissions.created_at'}
+        with self.settings(EVALUATION_SNAPSHOT_BACKGROUND=True), \
+                mock.patch.object(snapshots.snapshot_builder, '_start') as start:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response['Retry-After'], str(snapshots.BUILD_RETRY_AFTER))
+            self.assertEqual(self.client.get(self.url, params).status_code, 202)
+        self.assertEqual(start.call_count, 1)
+        snapshots.snapshot_builder._run(*start.call_args.args)
+        self.assertEqual(snapshots.snapshot_builder.building(), set())
+        self.assertEqual(self.client.get(self.url, params).status_code, 200)
+
+    def test_outdated_snapshot_is_served_while_rebuilding(self):
+        first = self.client.get(self.url)
+        bump_version(EVALUATIONS)
+        with self.settings(EVALUATION_SNAPSHOT_BACKGROUND=True), \
+                mock.patch.object(snapshots.snapshot_builder, '_start') as start:
+            # A fresh snapshot isn't rebuilt for every submission
+            response = self.client.get(self.url)
+            self.assertEqual(start.call_count, 0)
+            with mock.patch.object(snapshots, 'REBUILD_INTERVAL', 0):
+                response = self.client.get(self.url)
+                self.client.get(self.url)
+            self.assertEqual(start.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Snapshot-Version'], first['X-Snapshot-Version'])
+        snapshots.snapshot_builder._run(*start.call_args.args)
+        self.assertEqual(self.client.get(self.url)['X-Snapshot-Version'], data_version())
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
@@ -1,14 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the API and export views run natively async
+api = async_views if getattr(settings, 'EVALUATION_ASYNC_VIEWS', False) else views
 
 app_name = 'evaluation'
 
 urlpatterns = [
     path('', views.home, name='home'),
-    path('api/get-dialect-data/', views.get_dialect_data, name='get_dialect_data'),
-    path('api/get-plausibility-data/', views.get_plausibility_data, name='get_plausibility_data'),
-    path('api/submit-evaluation/', views.submit_evaluation, name='submit_evaluation'),
+    path('api/get-dialect-data/', api.get_dialect_data, name='get_dialect_data'),
+    path('api/get-plausibility-data/', api.get_plausibility_data, name='get_plausibility_data'),
+    path('api/session-bundle/', api.session_bundle, name='session_bundle'),
+    path('api/submit-evaluation/', api.submit_evaluation, name='submit_evaluation'),
     path('thank-you/', views.thank_you, name='thank_you'),
+    path('sw.js', views.service_worker, name='service_worker'),
     path('export/', views.export_page, name='export_page'),
-    path('export/download/', views.export_data, name='export_download'),
+    path('export/download/', api.export_data, name='export_download'),
+    path('export/incremental/', api.export_incremental, name='export_incremental'),
+    path('export/snapshot/', views.export_snapshot, name='export_snapshot'),
+    path('report/', views.analytics_report, name='analytics_report'),
+    path('search/', views.search_endpoint, name='search'),
+    path('metrics', views.metrics_endpoint, name='metrics'),
 ]
@@ -0,0 +1,33 @@
+"""
+Cheap cross-process version stamps.
+
+Per-process caches (item pools, reports) store the version they were built
+from and compare it against the database on use. Any gunicorn worker that
+changes the underlying rows bumps the stamp, so every other worker notices
+on its next request without any shared memory.
+"""
+from django.db.models import F
+
+from .models import DataVersion
+
+ITEMS = 'items'
+EVALUATIONS = 'evaluations'
+
+
+def get_version(key):
+    """
+    Return the current version for key (0 if it was never bumped).
+    """
+    version = DataVersion.objects.filter(key=key).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_version(key):
+    """
+    Increment the version for key.
+    """
+    updated = DataVersion.objects.filter(key=key).update(version=F('version') + 1)
+    if not updated:
+        _, created = DataVersion.objects.get_or_create(key=key, defaults={'version': 1})
+        if not created:
+            DataVersion.objects.filter(key=key).update(version=F('version') + 1)
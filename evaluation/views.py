@@ -1,69 +1,181 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core import serializers
+import hashlib
 import json
-import random
+import os
 import uuid
-from .models import DialectData, PlausibilityData, DialectEvaluation, PlausibilityEvaluation
+from .models import DialectData, PlausibilityData, Submission, DialectEvaluation, PlausibilityEvaluation
+from .bundles import BundleError, bundle_pool
+from .item_pool import dialect_pool, plausibility_pool
+from .scheduler import dialect_scheduler, plausibility_scheduler, use_balanced_selection
+from .journal import journal, write_behind_enabled
+from .submission import (
+    AlreadySubmitted, SubmissionError, clean_idempotency_key, replayed_session, save_submission,
+    validate_submission,
+)
+from . import analytics, metrics, search, snapshots
+from .admission import client_ip
+from .page_cache import cached_page_response
+from .exporters import (
+    EXPORTS, FORMATS, MAX_PAGE_SIZE, CursorError, decode_cursor, encode_cursor, incremental_page,
+    iter_rows, stream_export,
+)
 
 
 def home(request):
     """
     Homepage that displays the evaluation form.
+    The page is the same for everyone and is served from the page cache.
     """
     dialects = DialectData.DIALECT_CHOICES
-    return render(request, 'evaluation/home.html', {
+    return cached_page_response(request, 'evaluation/home.html', {
         'dialects': dialects,
     })
 
 
-@require_http_methods(["GET"])
-def get_dialect_data(request):
+def dialect_items(dialect, session_id):
     """
-    API endpoint to get 10 random dialect data items for the selected dialect.
+    Pick 10 dialect items for session_id. Returns (payload, status).
     """
-    dialect = request.GET.get('dialect')
-    
     if not dialect:
-        return JsonResponse({'error': 'No dialect specified'}, status=400)
+        return {'error': 'No dialect specified'}, 400
     
-    # Get all items for this dialect
-    all_items = list(DialectData.objects.filter(dialect_name=dialect).values(
-        'id', 'original_standard_text', 'ai_generated_dialect_text'
-    ))
+    available = len(dialect_pool.ids(dialect))
+    if available < 10:
+        return {
+            'error': f'Not enough data for {dialect}. Found {available} items, need at least 10.'
+        }, 400
     
-    if len(all_items) < 10:
-        return JsonResponse({
-            'error': f'Not enough data for {dialect}. Found {len(all_items)} items, need at least 10.'
-        }, status=400)
+    if use_balanced_selection():
+        selected_items = dialect_scheduler.assign(10, session_id, dialect)
+    else:
+        selected_items = dialect_pool.sample(10, dialect)
     
-    # Randomly select 10 items
-    selected_items = random.sample(all_items, 10)
+    return {'data': selected_items, 'session_id': session_id}, 200
+
+
+def plausibility_items(session_id):
+    """
+    Pick up to 10 MCQ items for session_id. Returns (payload, status).
+    """
+    if len(plausibility_pool.ids()) == 0:
+        return {'error': 'No plausibility data available'}, 400
     
-    return JsonResponse({'data': selected_items})
+    # Select 10 items or all if less than 10
+    if use_balanced_selection():
+        selected_items = plausibility_scheduler.assign(10, session_id)
+    else:
+        selected_items = plausibility_pool.sample(10)
+    
+    return {'data': selected_items, 'session_id': session_id}, 200
 
 
-@require_http_methods(["GET"])
-def get_plausibility_data(request):
+def take_bundle(dialect):
     """
-    API endpoint to get random plausibility data for MCQ evaluation.
+    Hand out a session bundle for dialect. Returns (payload, status).
     """
-    # Get all plausibility items
-    all_items = list(PlausibilityData.objects.all().values(
-        'id', 'question', 'correct_answer', 
-        'wrong_option_1', 'wrong_option_2', 'wrong_option_3'
-    ))
+    if not dialect:
+        return {'error': 'No dialect specified'}, 400
     
-    if len(all_items) == 0:
-        return JsonResponse({'error': 'No plausibility data available'}, status=400)
+    try:
+        return bundle_pool.take(dialect), 200
+    except BundleError as e:
+        return {'error': str(e)}, 400
+
+
+def submitted(session_id):
+    return {
+        'success': True,
+        'message': 'Evaluation submitted successfully!',
+        'session_id': session_id
+    }, 200
+
+
+def submit_payload(body, idempotency_key=None):
+    """
+    Decode, validate and save a submission body. Returns (payload, status).
+    In write-behind mode the submission is queued in the journal instead.
+    A post repeating the idempotency key of an accepted submission gets that
+    submission's response back after one index lookup, without being decoded.
+    """
+    try:
+        idempotency_key = clean_idempotency_key(idempotency_key)
+        if write_behind_enabled():
+            session_id = journal.replayed_session(idempotency_key)
+        else:
+            session_id = replayed_session(idempotency_key)
+    except SubmissionError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    if session_id:
+        return submitted(session_id)
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {
+            'success': False,
+            'error': 'Request body must be valid JSON.'
+        }, 400
     
-    # Select 10 random items or all if less than 10
-    num_items = min(10, len(all_items))
-    selected_items = random.sample(all_items, num_items)
+    try:
+        cleaned = validate_submission(data, idempotency_key)
+        if write_behind_enabled():
+            session_id = journal.append(cleaned)
+        else:
+            session_id = save_submission(cleaned)
+    except AlreadySubmitted as e:
+        # Lost the race against a concurrent post with the same key
+        return submitted(e.session_id)
+    except SubmissionError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
     
-    return JsonResponse({'data': selected_items})
+    return submitted(session_id)
+
+
+# Bundles carry Bangla text, so send it unescaped and without padding
+COMPACT_JSON = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+@require_http_methods(["GET"])
+def get_dialect_data(request):
+    """
+    API endpoint to get 10 dialect data items for the selected dialect.
+    Items with the fewest ratings are handed out first and reserved for the session.
+    """
+    payload, status = dialect_items(request.GET.get('dialect'), request.GET.get('session_id') or str(uuid.uuid4()))
+    return JsonResponse(payload, status=status)
+
+
+@require_http_methods(["GET"])
+def get_plausibility_data(request):
+    """
+    API endpoint to get plausibility data for MCQ evaluation.
+    Items with the fewest ratings are handed out first and reserved for the session.
+    """
+    payload, status = plausibility_items(request.GET.get('session_id') or str(uuid.uuid4()))
+    return JsonResponse(payload, status=status)
+
+
+@require_http_methods(["GET"])
+def session_bundle(request):
+    """
+    API endpoint to start a session in one round trip: a server-issued session id
+    plus the dialect and MCQ items, served from the pre-generated bundle pool.
+    """
+    payload, status = take_bundle(request.GET.get('dialect'))
+    return JsonResponse(payload, status=status, json_dumps_params=COMPACT_JSON)
 
 
 @require_http_methods(["POST"])
@@ -71,85 +183,75 @@ def get_plausibility_data(request):
 def submit_evaluation(request):
     """
     API endpoint to submit evaluation responses.
+    The whole submission is validated first and written in one transaction.
+    Clients retrying a post send the same Idempotency-Key header each time.
     """
-    try:
-        data = json.loads(request.body)
-        session_id = data.get('session_id', str(uuid.uuid4()))
-        evaluator_name = data.get('evaluator_name', '')
-        evaluator_email = data.get('evaluator_email', '')
-        
-        # Check if this email has already submitted
-        if evaluator_email:
-            existing_dialect = DialectEvaluation.objects.filter(evaluator_email=evaluator_email).exists()
-            existing_plaus = PlausibilityEvaluation.objects.filter(evaluator_email=evaluator_email).exists()
-            if existing_dialect or existing_plaus:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'This email has already submitted an evaluation. Only one submission per email is allowed.'
-                }, status=400)
-        
-        # Save dialect evaluations
-        dialect_evaluations = data.get('dialect_evaluations', [])
-        for eval_data in dialect_evaluations:
-            DialectEvaluation.objects.create(
-                dialect_data_id=eval_data['dialect_data_id'],
-                evaluator_name=evaluator_name,
-                evaluator_email=evaluator_email,
-                accuracy_rating=eval_data['accuracy_rating'],
-                naturalness_rating=eval_data['naturalness_rating'],
-                comments=eval_data.get('comments', ''),
-                session_id=session_id
-            )
-        
-        # Save plausibility evaluations
-        plausibility_evaluations = data.get('plausibility_evaluations', [])
-        for eval_data in plausibility_evaluations:
-            PlausibilityEvaluation.objects.create(
-                plausibility_data_id=eval_data['plausibility_data_id'],
-                evaluator_name=evaluator_name,
-                evaluator_email=evaluator_email,
-                option_1_plausibility=eval_data['option_1_plausibility'],
-                option_2_plausibility=eval_data['option_2_plausibility'],
-                option_3_plausibility=eval_data['option_3_plausibility'],
-                comments=eval_data.get('comments', ''),
-                session_id=session_id
-            )
-        
-        return JsonResponse({
-            'success': True,
-            'message': 'Evaluation submitted successfully!',
-            'session_id': session_id
-        })
-        
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'error': str(e)
-        }, status=400)
+    payload, status = submit_payload(request.body, request.headers.get('Idempotency-Key'))
+    return JsonResponse(payload, status=status)
+
+
+# Precached by the service worker, so the form opens offline
+SERVICE_WORKER_ASSETS = ('evaluation/css/base.css', 'evaluation/js/home.js')
+
+
+def service_worker(request):
+    """
+    The service worker script. Served from the site root rather than /static/,
+    since a worker only controls pages under its own path. It names the
+    content-hashed assets, so every deploy that changes one installs a new worker.
+    """
+    assets = [static(name) for name in SERVICE_WORKER_ASSETS]
+    response = render(request, 'evaluation/service_worker.js', {
+        'assets': json.dumps(assets),
+        'version': hashlib.sha256(' '.join(assets).encode()).hexdigest()[:12],
+    }, content_type='text/javascript')
+    # Browsers check for a new worker on navigation; don't let caches hide it
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 def thank_you(request):
     """
     Thank you page after successful submission.
     """
-    return render(request, 'evaluation/thank_you.html')
+    return cached_page_response(request, 'evaluation/thank_you.html')
 
 
 def export_data(request):
     """
     Export evaluation data as JSON file for download.
+    With format=ndjson or format=csv the export is streamed row by row instead
+    (optionally gzipped with gzip=1).
     """
     if not request.user.is_staff:
-        return redirect('home')
+        return redirect('evaluation:home')
     
     export_type = request.GET.get('type', 'all')
+    output_format = request.GET.get('format', 'json')
+    
+    if output_format in FORMATS:
+        return streaming_export(request, export_type, output_format)
     
+    data, filename = json_export(export_type)
+    
+    response = HttpResponse(data, content_type='application/json')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def json_export(export_type):
+    """
+    Serialize the export as one JSON document. Returns (data, filename).
+    """
     if export_type == 'dialect_data':
         data = serializers.serialize('json', DialectData.objects.all(), indent=2)
         filename = 'dialect_data.json'
     elif export_type == 'plausibility_data':
         data = serializers.serialize('json', PlausibilityData.objects.all(), indent=2)
         filename = 'plausibility_data.json'
+    elif export_type == 'submissions':
+        data = serializers.serialize('json', Submission.objects.all(), indent=2)
+        filename = 'submissions.json'
     elif export_type == 'dialect_evaluations':
         data = serializers.serialize('json', DialectEvaluation.objects.all(), indent=2)
         filename = 'dialect_evaluations.json'
@@ -160,22 +262,237 @@ def export_data(request):
         all_data = {
             'dialect_data': json.loads(serializers.serialize('json', DialectData.objects.all())),
             'plausibility_data': json.loads(serializers.serialize('json', PlausibilityData.objects.all())),
+            'submissions': json.loads(serializers.serialize('json', Submission.objects.all())),
             'dialect_evaluations': json.loads(serializers.serialize('json', DialectEvaluation.objects.all())),
             'plausibility_evaluations': json.loads(serializers.serialize('json', PlausibilityEvaluation.objects.all())),
         }
         data = json.dumps(all_data, indent=2)
         filename = 'all_evaluation_data.json'
+    return data, filename
+
+
+def streaming_params(request, export_type, output_format):
+    """
+    Resolve a streaming export request into (export_types, filename, content_type, compress),
+    or return an error response.
+    """
+    if export_type == 'all':
+        export_types = list(EXPORTS)
+    elif export_type in EXPORTS:
+        export_types = [export_type]
+    else:
+        return JsonResponse({'error': f'Unknown export type: {export_type}'}, status=400)
     
-    response = HttpResponse(data, content_type='application/json')
+    if output_format == 'csv' and len(export_types) > 1:
+        return JsonResponse({'error': 'CSV exports hold a single table; choose a type.'}, status=400)
+    
+    compress = request.GET.get('gzip') == '1'
+    filename = f'{"all_evaluation_data" if export_type == "all" else export_type}.{output_format}'
+    content_type = FORMATS[output_format]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    return export_types, filename, content_type, compress
+
+
+def streaming_export(request, export_type, output_format):
+    """
+    Stream one table (or, for NDJSON, all tables) without building the export in memory.
+    """
+    params = streaming_params(request, export_type, output_format)
+    if isinstance(params, HttpResponse):
+        return params
+    export_types, filename, content_type, compress = params
+    
+    response = StreamingHttpResponse(stream_export(export_types, output_format, compress), content_type=content_type)
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
+def incremental_params(request):
+    """
+    Parse an incremental export request into (export_type, since_id, limit), or return an error response.
+    """
+    export_type = request.GET.get('type')
+    if export_type not in EXPORTS:
+        return JsonResponse({'error': f'Choose a type: {", ".join(EXPORTS)}'}, status=400)
+    
+    try:
+        since_id = decode_cursor(request.GET.get('since'), export_type)
+        limit = min(max(int(request.GET.get('limit', 1000)), 1), MAX_PAGE_SIZE)
+    except CursorError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    return export_type, since_id, limit
+
+
+def incremental_headers(response, export_type, last_id, has_more):
+    response['X-Next-Cursor'] = encode_cursor(export_type, last_id)
+    response['X-Has-More'] = 'true' if has_more else 'false'
+    return response
+
+
+@require_http_methods(["GET"])
+def export_incremental(request):
+    """
+    Incremental export of one table using keyset pagination.
+    Pass the next_cursor of the previous page as since to get only rows added after it.
+    With format=ndjson the page is streamed and the cursor is sent in the X-Next-Cursor header.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    
+    params = incremental_params(request)
+    if isinstance(params, HttpResponse):
+        return params
+    export_type, since_id, limit = params
+    
+    queryset, last_id, has_more = incremental_page(export_type, since_id, limit)
+    
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(
+            stream_export([export_type], 'ndjson', querysets={export_type: queryset}),
+            content_type=FORMATS['ndjson'],
+        )
+        return incremental_headers(response, export_type, last_id, has_more)
+    
+    return JsonResponse({
+        'type': export_type,
+        'data': list(iter_rows(export_type, queryset)),
+        'next_cursor': encode_cursor(export_type, last_id),
+        'has_more': has_more,
+    })
+
+
+def export_snapshot(request):
+    """
+    The evaluation tables as a gzipped SQLite database (see evaluation/snapshots.py).
+    columns=table.column,... keeps only those columns of the listed tables;
+    pii=1 keeps the evaluator emails. Answers 202 while the snapshot is built.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    
+    try:
+        tables = snapshots.projection(request.GET.get('columns'), include_pii=request.GET.get('pii') == '1')
+        path = snapshots.snapshot_builder.get(tables)
+    except snapshots.SnapshotError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if path is None:
+        response = JsonResponse({'status': 'building', 'message': 'The snapshot is being built. Try again shortly.'}, status=202)
+        response['Retry-After'] = str(snapshots.BUILD_RETRY_AFTER)
+        return response
+    return snapshots.snapshot_response(request, path, f'banglaverse_{os.path.basename(path)}')
+
+
 def export_page(request):
     """
     Export page with download buttons.
     """
     if not request.user.is_staff:
-        return redirect('home')
+        return redirect('evaluation:home')
+    
+    # Staff only: browsers may keep it, shared caches may not
+    return cached_page_response(request, 'evaluation/export.html', cache_control='private, no-cache')
+
+
+def analytics_report(request):
+    """
+    Staff report with inter-annotator agreement, bootstrap intervals and distractor rankings.
+    Served from the cache; after new ratings the previous report is shown while the
+    current one is computed in the background. refresh=1 recomputes it in the request.
+    """
+    if not request.user.is_staff:
+        return redirect('evaluation:home')
+    
+    report = analytics.get_report(refresh=request.GET.get('refresh') == '1')
+    return render(request, 'evaluation/report.html', {'report': report})
+
+
+MAX_SEARCH_RESULTS = 100
+PREVIEW_LENGTH = 200
+
+
+def search_results(results):
+    """
+    Attach a preview and an admin link to (kind, object_id, score) search results,
+    loading the rows of each kind with one query.
+    """
+    rows = {}
+    for kind in {kind for kind, _, _ in results}:
+        model, fields = search.SOURCES[kind]
+        ids = [object_id for result_kind, object_id, _ in results if result_kind == kind]
+        rows[kind] = model.objects.only('pk', *fields).in_bulk(ids)
+    data = []
+    for kind, object_id, score in results:
+        obj = rows[kind].get(object_id)
+        if obj is None:  # deleted since it was indexed
+            continue
+        model, fields = search.SOURCES[kind]
+        text = ' / '.join(getattr(obj, field) for field in fields if getattr(obj, field))
+        data.append({
+            'kind': kind,
+            'id': object_id,
+            'score': score,
+            'preview': text[:PREVIEW_LENGTH],
+            'admin_url': reverse(f'admin:evaluation_{model._meta.model_name}_change', args=[object_id]),
+        })
+    return data
+
+
+@require_http_methods(["GET"])
+def search_endpoint(request):
+    """
+    Ranked full-text search over item texts and evaluation comments for staff.
+    q is the query; kind (repeatable) limits the search to SearchDocument kinds.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'q is required'}, status=400)
+    kinds = request.GET.getlist('kind')
+    unknown = set(kinds) - set(search.SOURCES)
+    if unknown:
+        return JsonResponse({'error': f'Unknown kinds: {", ".join(sorted(unknown))}'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), MAX_SEARCH_RESULTS)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    results = search.search(query, kinds, limit)
+    return JsonResponse({'query': query, 'results': search_results(results)})
+
+
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+# Headers a reverse proxy adds; a request carrying them wasn't made on this machine
+PROXY_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+
+
+def local_request(request):
+    """
+    Whether request comes from this machine. Behind a reverse proxy every
+    request arrives from 127.0.0.1, so the client address is taken from
+    EVALUATION_TRUSTED_PROXIES, and a proxied request is never local when
+    no proxies are configured.
+    """
+    if client_ip(request) not in LOCAL_ADDRESSES:
+        return False
+    if not getattr(settings, 'EVALUATION_TRUSTED_PROXIES', 0):
+        return not any(header in request.headers for header in PROXY_HEADERS)
+    return True
+
+
+def metrics_endpoint(request):
+    """
+    Request metrics of all worker processes in Prometheus text format.
+    Open to staff and to scrapers on the same machine.
+    """
+    if not (request.user.is_staff or local_request(request)):
+        return HttpResponse(status=403)
     
-    return render(request, 'evaluation/export.html')
+    return HttpResponse(metrics.collect(), content_type='text/plain; version=0.0.4; charset=utf-8')
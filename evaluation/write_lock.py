@@ -0,0 +1,88 @@
+"""
+Write serialization for SQLite.
+
+SQLite has one writer at a time. When several gunicorn workers write at
+once, the losers either spin in SQLite's busy handler or, with deferred
+transactions, fail straight away with "database is locked". locked_write
+makes them queue instead: each write transaction first takes an exclusive
+lock on a small lock file (shared by every process on the machine), and a
+write that still hits a locked database is retried with backoff.
+
+On other databases, or with EVALUATION_WRITE_LOCK off, the wrapped function
+runs unchanged.
+"""
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the retry loop alone
+    fcntl = None
+
+RETRIES = 5
+BACKOFF = 0.05
+
+_thread_lock = threading.Lock()
+_lock_file = None
+
+
+def lock_enabled():
+    return connection.vendor == 'sqlite' and getattr(settings, 'EVALUATION_WRITE_LOCK', True)
+
+
+def _file():
+    global _lock_file
+    if _lock_file is None:
+        path = str(getattr(settings, 'EVALUATION_WRITE_LOCK_PATH', settings.BASE_DIR / 'var' / 'sqlite-write.lock'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _lock_file = open(path, 'a+b')
+    return _lock_file
+
+
+@contextmanager
+def write_lock():
+    """
+    Hold the process-wide write lock: a thread lock, then an flock on the lock file.
+    """
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        lock_file = _file()
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_locked_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def locked_write(func):
+    """
+    Run func (which opens its own transaction) under the write lock, retrying on "database is locked".
+    Calls nested in an outer transaction run directly: only the outermost one can be retried.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not lock_enabled() or connection.in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(RETRIES):
+            try:
+                with write_lock():
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_locked_error(e) or attempt == RETRIES - 1:
+                    raise
+            time.sleep(BACKOFF * 2 ** attempt * (1 + random.random()))
+    return wrapper
@@ -1,8 +1,11 @@
 """
 Sample script to load data into the database.
 Modify this script with your actual data and run: python manage.py shell < load_sample_data.py
+For large datasets use the import command instead:
+    python manage.py import_dataset items.jsonl --kind dialect
 """
 
+from evaluation.importers import import_records
 from evaluation.models import DialectData, PlausibilityData
 
 # Sample Dialect Data
@@ -57,13 +60,10 @@ dialect_samples = {
 # Load dialect data
 print("Loading dialect data...")
 for dialect_name, samples in dialect_samples.items():
-    for sample in samples:
-        DialectData.objects.get_or_create(
-            dialect_name=dialect_name,
-            original_standard_text=sample['original'],
-            ai_generated_dialect_text=sample['generated']
-        )
-    print(f"Loaded {len(samples)} samples for {dialect_name}")
+    stats = import_records('dialect', enumerate(
+        ({'dialect': dialect_name, **sample} for sample in samples), start=1
+    ))
+    print(f"Loaded {stats.created} new samples for {dialect_name} ({stats.duplicates} already present)")
 
 # Sample Plausibility Data
 # Replace with your actual data
@@ -95,15 +95,8 @@ plausibility_samples = [
 
 # Load plausibility data
 print("\nLoading plausibility data...")
-for sample in plausibility_samples:
-    PlausibilityData.objects.get_or_create(
-        question=sample['question'],
-        correct_answer=sample['correct'],
-        wrong_option_1=sample['wrong_1'],
-        wrong_option_2=sample['wrong_2'],
-        wrong_option_3=sample['wrong_3']
-    )
-print(f"Loaded {len(plausibility_samples)} plausibility questions")
+stats = import_records('plausibility', enumerate(plausibility_samples, start=1))
+print(f"Loaded {stats.created} new plausibility questions ({stats.duplicates} already present)")
 
 print("\n✅ Data loading complete!")
 print(f"Total Dialect Data: {DialectData.objects.count()}")